@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Author:
+        Maximilia F. S. Degenhardt <frazaodesouzam2@nih.gov>
+        Hermann F. Degenhardt <degenhardthf@nih.gov>
+"""
+import os, sys
+sys.path.append("../src")
+from hornet.input import follow_inputs
+from hornet.arguments import pop_arg
+
+
+def help():
+    return """
+follow_inputs.py: Prepare the inputs for HORNET approaches while the dynamic fitting is running.
+USAGE:
+    python follow_inputs.py <input-directory> [<base-pairs>] [<base-stacking>] [-p <prefix>]
+                            [-i <interval>] [-n <iterations>] [-m <model-location> -r <residues>] [-h]
+
+SYNOPSIS:
+    Periodically appends the new records of the running CafeMol time series to
+    <input-directory>/Live_Trajectory.csv, which can be used as a Full_Trajectory file.
+
+Positional Arguments:
+    <input-directory>           Type [String]: Input and output directory.
+                                Example: 'data'
+    <base-pairs>                Type [Int]: Average number of base-pairing.
+                                Example: 88
+    <base-stacking>             Type [Int]: Average number of base-stacking.
+                                Example: 192
+
+Options:
+    [-p, --prefix]              Type [String]: Prefix of the time series files being written.
+                                Default: 'output_k'
+    [-i, --interval]            Type [Int]: Seconds between updates.
+                                Default: 60
+    [-n, --iterations]          Type [Int]: Number of updates, 0 to follow until interrupted.
+                                Default: 0
+    [-m, --model-location]      Type [String]: Directory where the model is stored. If passed,
+                                the predictions are refreshed after each update.
+    [-r, --residues]            Type [Int]: Number of residues, required with the model.
+    [-h, --help]                Displays usage and help information for the script.
+
+Example:
+python follow_inputs.py ../data/myproject -i 300
+
+Requirements:
+    python = 3.9
+"""
+
+def args(argslist):
+    """
+    Parses a list of arguments and returns the necessary values for further processing.
+
+    Parameters:
+        argslist (list): A list of arguments to parse.
+
+    Returns:
+        tuple: A tuple containing the following values:
+            - path (str): The project directory.
+            - base_pairing (int): The number of base-pairing.
+            - base_stacking (int): The number of base-stacking.
+            - prefix (str): The prefix of the time series files.
+            - interval (int): The seconds between updates.
+            - iterations (int): The number of updates, or None.
+            - model_location (str): The location of the model, or None.
+            - n_residues (int): The number of residues.
+    """
+
+    # Input list of arguments to parse
+    print(" - Checking arguments...")
+    user_args = argslist[1:]
+
+    if '-h' in user_args or '--help' in user_args:
+        print(help())
+        sys.exit(0)
+
+    base_pairing = -1
+    base_stacking = -1
+    n_residues = -1
+
+    # Options
+    prefix, user_args = pop_arg(user_args, ['-p', '--prefix'])
+    if prefix is None:
+        prefix = 'output_k'
+    interval, user_args = pop_arg(user_args, ['-i', '--interval'])
+    if interval is None:
+        interval = 60
+    elif interval.isnumeric():
+        interval = int(interval)
+    else:
+        raise ValueError("Expecting an integer for the interval")
+    iterations, user_args = pop_arg(user_args, ['-n', '--iterations'])
+    if iterations is None or iterations == '0':
+        iterations = None
+    elif iterations.isnumeric():
+        iterations = int(iterations)
+    else:
+        raise ValueError("Expecting an integer for the number of iterations")
+    model_location, user_args = pop_arg(user_args, ['-m', '--model-location'])
+    residues, user_args = pop_arg(user_args, ['-r', '--residues'])
+    if model_location is not None:
+        if residues is None or not residues.isnumeric():
+            raise ValueError("Expecting an integer for the number of residues")
+        model_location = os.path.abspath(model_location)
+        n_residues = int(residues)
+
+    if len(user_args) == 0:
+        print(help())
+        print("ERROR: Required argument not found: input directory.")
+        sys.exit(1)
+    path = os.path.abspath(user_args[0])
+
+    if len(user_args) > 1:
+        if len(user_args) == 3:
+            base_pairing = int(user_args[1])
+            base_stacking = int(user_args[2])
+        else:
+            print(help())
+            print("ERROR: Since you provided an argument for base-pairs it is expected one for base-stacking as well.")
+            sys.exit(1)
+
+    return path, base_pairing, base_stacking, prefix, interval, iterations, model_location, n_residues
+
+def main():
+    # Get user arguments
+    path, base_pairing, base_stacking, prefix, interval, iterations, model_location, n_residues = args(sys.argv)
+
+    # Refresh the predictions after each update
+    callback = None
+    if model_location is not None:
+        from hornet.model import predict
+        callback = lambda dataset: predict(f"{path}/live_prediction", model_location, dataset, n_residues)
+
+    # Follow files
+    follow_inputs(path, base_pairing, base_stacking, prefix, interval=interval, iterations=iterations, callback=callback)
+
+if __name__ == '__main__':
+    main()
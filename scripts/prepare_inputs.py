@@ -8,17 +8,22 @@ Author:
 import os, sys
 import pandas as pd
 sys.path.append("../src")
-from hornet.input import prepare_inputs
+from hornet.input import prepare_inputs, prepare_batch, parse_size
+from hornet.arguments import pop_arg
 
 
 def help():
     return """
 prepare_inputs.py: Prepare the inputs for HORNET approaches (UML and DNN).
 USAGE:
-    python input_prep.py <input-directory> [<base-pairs>] [<base-stacking>] [-h]
+    python input_prep.py <input-directory> [<base-pairs>] [<base-stacking>] [-w <workers>]
+                           [-f <format>] [-c] [-s] [-d] [-m <max-memory>] [-i] [-h]
+    python input_prep.py -b <directories> [<base-pairs>] [<base-stacking>] [-w <workers>] ...
 
 Positional Arguments:
-    <input-directory>           Type [String]: Input and output directory.
+    <input-directory>           Type [String]: Input and output directory. It can also be the
+                                root of a kappa scan, whose k<kappa>/output/*.ts files are read
+                                in place (listed in <input-directory>/kappa_scan.json).
                                 Example: 'data'
     <base-pairs>                Type [Int]: Average number of base-pairing.
                                 Example: 88
@@ -26,6 +31,29 @@ Positional Arguments:
                                 Example: 192
 
 Options:
+    [-b, --batch]               Type [String]: Prepares several projects instead of <input-directory>,
+                                given as a comma-separated list of directories or glob patterns.
+                                The kappas of all of the projects are read by the same workers,
+                                and each project gets its own output files.
+                                Example: '../data/P*'
+    [-w, --workers]             Type [Int]: Number of processes reading the kappa files
+                                in parallel.
+                                Default: 1
+    [-f, --format]              Type [String]: Format of the Full_Trajectory file, either
+                                'csv', 'parquet' or 'feather'.
+                                Default: 'csv'
+    [-c, --cache]               Keeps the parsed kappa files in <input-directory>/.hornet_cache,
+                                so that the next runs only parse new or modified files.
+    [-s, --compact]             Stores the energy terms as float32 and the counters as integers,
+                                reducing the memory used by the next steps.
+    [-d, --drop-unused]         Drops the columns not used by the UML and DNN approaches,
+                                such as 'velet' and 'tempk'.
+    [-m, --max-memory]          Type [String]: Memory budget, e.g. '8G'. The files are then read,
+                                filtered and written in chunks that fit in the budget, instead
+                                of being fully loaded. Workers and cache are not used in this mode.
+    [-i, --index]               Saves the byte offset of each frame beside each time series
+                                (<file>.frames.npy), so frames can be fetched without reading
+                                the whole file (hornet.input.fetch_frames).
     [-h, --help]                Displays usage and help information for the script.
                                 
 Example:
@@ -37,13 +65,16 @@ Requirements:
 
 def args(argslist):
     """
-    Parses a list of arguments and returns a tuple containing the path, base pairing, and base stacking values.
+    Parses a list of arguments and returns a tuple containing the path, base pairing, base stacking,
+    workers, format, cache, compact, drop unused, maximum memory and frame index values.
 
     Parameters:
         argslist (list): A list of arguments to parse.
 
     Returns:
-        tuple: A tuple containing the path (str), base pairing (int), and base stacking (int) values.
+        tuple: A tuple containing the path (str, or list of str in batch mode), base pairing (int), base stacking (int),
+            workers (int), output format (str), cache (bool), compact (bool), drop unused (bool)
+            maximum memory (str, or None) and frame index (bool) values.
     """
 
     # Input list of arguments to parse
@@ -57,7 +88,50 @@ def args(argslist):
     path = None
     base_pairing = -1
     base_stacking = -1
-    if len(user_args) == 0:
+    workers = 1
+    fmt = 'csv'
+    cache = False
+    compact = False
+    drop_unused = False
+    max_memory = None
+    frame_index = False
+
+    # Options
+    value, user_args = pop_arg(user_args, ['-w', '--workers'])
+    if value is not None:
+        if not value.isnumeric() or int(value) < 1:
+            raise ValueError("Expecting a positive integer for the number of workers")
+        workers = int(value)
+    value, user_args = pop_arg(user_args, ['-f', '--format'])
+    if value is not None:
+        if value not in ['csv', 'parquet', 'feather']:
+            raise ValueError(f"Invalid output format: {value}")
+        fmt = value
+    batch, user_args = pop_arg(user_args, ['-b', '--batch'])
+    value, user_args = pop_arg(user_args, ['-m', '--max-memory'])
+    if value is not None:
+        parse_size(value)
+        max_memory = value
+    if '-c' in user_args or '--cache' in user_args:
+        cache = True
+        user_args = [a for a in user_args if a not in ['-c', '--cache']]
+    if '-s' in user_args or '--compact' in user_args:
+        compact = True
+        user_args = [a for a in user_args if a not in ['-s', '--compact']]
+    if '-d' in user_args or '--drop-unused' in user_args:
+        drop_unused = True
+        user_args = [a for a in user_args if a not in ['-d', '--drop-unused']]
+    if '-i' in user_args or '--index' in user_args:
+        frame_index = True
+        user_args = [a for a in user_args if a not in ['-i', '--index']]
+
+    # In batch mode, the projects replace the input directory
+    if batch is not None:
+        if max_memory is not None:
+            raise ValueError("The batch mode does not support a memory budget")
+        path = [os.path.abspath(p) for p in batch.split(',') if p != '']
+        user_args = [None] + user_args
+    elif len(user_args) == 0:
         print(help())
         print("ERROR: Required argument not found: input file.")
         sys.exit(1)
@@ -73,14 +147,31 @@ def args(argslist):
             print("ERROR: Since you provided an argument for base-pairs it is expected one for base-stacking as well.")
             sys.exit(1)
 
-    return path, base_pairing, base_stacking
+    print(f"   > Workers: {workers}")
+    print(f"   > Format: {fmt}")
+    print(f"   > Cache: {cache}")
+    print(f"   > Compact: {compact}")
+    print(f"   > Drop unused: {drop_unused}")
+    if max_memory is not None:
+        print(f"   > Max memory: {max_memory}")
+    print(f"   > Frame index: {frame_index}")
+
+    return path, base_pairing, base_stacking, workers, fmt, cache, compact, drop_unused, max_memory, frame_index
 
 def main():
     # Get user arguments
-    path, base_pairing, base_stacking = args(sys.argv)
+    path, base_pairing, base_stacking, workers, fmt, cache, compact, drop_unused, max_memory, frame_index = args(sys.argv)
 
     # Read files
-    prepare_inputs(path, base_pairing, base_stacking)
+    if isinstance(path, list):
+        failed = prepare_batch(path, base_pairing, base_stacking, workers, fmt, cache,
+                               compact=compact, drop_unused=drop_unused, frame_index=frame_index)
+        if len(failed) > 0:
+            print(f"ERROR: {len(failed)} projects failed: {', '.join(failed)}")
+            sys.exit(1)
+        return
+    prepare_inputs(path, base_pairing, base_stacking, workers, fmt, cache,
+                   compact=compact, drop_unused=drop_unused, max_memory=max_memory, frame_index=frame_index)
 
 if __name__ == '__main__':
     main()
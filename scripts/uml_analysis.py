@@ -9,23 +9,63 @@ Author:
 import os, sys, math
 
 sys.path.append("../src")
-from hornet.uml import uml_analysis
+from hornet.uml import uml_analysis, uml_apply, VARIANCE, ELBOW_METHODS
+from hornet.storage import parse_size
+from hornet.arguments import pop_arg
 
 def help():
     return """
 uml.py: Run the UML approach from HORNET to select top cohort of structures.
 USAGE:
-    python uml.py <full-trajectory-file> [-h]
+    python uml.py <full-trajectory-file> [-a] [-n <components>] [-c <clusters>] [-v <variance>]
+                  [-e <elbow-method>] [-s <sample>] [-w <workers>] [-m <max-memory>] [-k] [-h]
+    python uml.py <new-trajectory-file> -p <model-file> [-m <max-memory>]
 
 Positional Arguments:
     <full-trajectory-file>      Type [String]: Input file (Full trajectory).
                                 Example: 'data/Full_Trajectory.csv'
-                                
+
 Options:
+    [-a, --auto]                Runs without showing the plots and asking for input. The number of
+                                components is chosen from the explained variance and the number of
+                                clusters at the knee of the WCSS curve, unless they are passed.
+    [-n, --components]          Type [Int]: Number of PCA components.
+    [-c, --clusters]            Type [Int]: Number of KMeans clusters.
+    [-v, --variance]            Type [Float]: Fraction of the explained variance covered by the
+                                components chosen with --auto.
+                                Default: 0.8
+    [-e, --elbow]               Type [String]: Method computing the WCSS curve used to choose the
+                                number of clusters: 'full' (a KMeans fit for each number of clusters),
+                                'bisecting' (a single bisecting pass) or 'minibatch' (repeated
+                                MiniBatchKMeans fits, plotted with their standard deviation).
+                                Default: 'full'
+    [-s, --sample]              Type [Int]: Number of rows used to compute the WCSS curve. The final
+                                clustering always uses all of the rows.
+                                Default: all rows
+    [-w, --workers]             Type [Int]: Number of processes fitting the WCSS curve concurrently.
+                                The cores are split among them.
+                                Default: 1
+    [-m, --max-memory]          Type [String]: Memory budget, e.g. '8G'. The trajectory is then read
+                                in chunks that fit in the budget: the PCA is fitted incrementally,
+                                the clusters are found by MiniBatchKMeans and the outputs are written
+                                chunk by chunk. The WCSS curve uses a sample of 200000 rows by default.
+    [-k, --cache]               Keeps the result of each stage (energy filter, standardization, PCA
+                                fits and WCSS curve) in <input-directory>/.hornet_cache, keyed by the
+                                content of the input file and the stage parameters. A rerun changing
+                                only the number of clusters then goes straight to the final KMeans.
+    [-p, --apply]               Type [String]: UML model saved by a previous run (UML_model.npz). The
+                                trajectory is classified with its filter thresholds, PCA and clusters
+                                in a single pass, without refitting. The outputs are named after the
+                                input file (e.g. Extra_Trajectory_Final_Cohort.csv).
     [-h, --help]                Displays usage and help information for the script.
 
 Example:
 python uml.py ../data/Full_Trajectory.csv
+python uml.py ../data/Full_Trajectory.csv -a -c 4
+python uml.py ../data/Full_Trajectory.csv -a -e bisecting -s 200000
+python uml.py ../data/Full_Trajectory.parquet -a -m 8G
+python uml.py ../data/Full_Trajectory.csv -a -n 8 -c 4 -k
+python uml.py ../data/Extra_Trajectory.csv -p ../data/UML_model.npz
 
 Requirements:
     python = 3.9
@@ -33,13 +73,24 @@ Requirements:
 
 def args(argslist):
     """
-    Parse a list of arguments and return the input file to be used. 
-    
+    Parse a list of arguments and return the input file and the UML options to be used.
+
     Parameters:
         argslist (list): A list of arguments to parse.
-        
+
     Returns:
-        str: The input file to be used.
+        tuple: A tuple containing the following values:
+            - input_file (str): The input file to be used.
+            - n_components (int): The number of PCA components, or None.
+            - n_clusters (int): The number of KMeans clusters, or None.
+            - variance (float): The fraction of the explained variance.
+            - headless (bool): Whether to run without asking for input.
+            - elbow (str): The method computing the WCSS curve.
+            - sample (int): The number of rows used for the WCSS curve, or None.
+            - workers (int): The number of processes fitting the WCSS curve.
+            - max_memory (str): The memory budget of the chunked mode, or None.
+            - model_file (str): The UML model to be applied, or None.
+            - cache (bool): Whether to cache the results of the stages.
     """
 
     # Input list of arguments to parse
@@ -50,6 +101,57 @@ def args(argslist):
         print(help())
         sys.exit(0)
 
+    # Options
+    headless = False
+    if '-a' in user_args or '--auto' in user_args:
+        headless = True
+        user_args = [a for a in user_args if a not in ['-a', '--auto']]
+    cache = False
+    if '-k' in user_args or '--cache' in user_args:
+        cache = True
+        user_args = [a for a in user_args if a not in ['-k', '--cache']]
+    n_components, user_args = pop_arg(user_args, ['-n', '--components'])
+    if n_components is not None:
+        if not n_components.isnumeric():
+            raise ValueError("Expecting an integer for the number of components")
+        n_components = int(n_components)
+    n_clusters, user_args = pop_arg(user_args, ['-c', '--clusters'])
+    if n_clusters is not None:
+        if not n_clusters.isnumeric():
+            raise ValueError("Expecting an integer for the number of clusters")
+        n_clusters = int(n_clusters)
+    variance, user_args = pop_arg(user_args, ['-v', '--variance'])
+    if variance is None:
+        variance = VARIANCE
+    else:
+        try:
+            variance = float(variance)
+        except ValueError:
+            raise ValueError("Expecting a number for the variance")
+        if not 0 < variance <= 1:
+            raise ValueError("Expecting a variance between 0 and 1")
+    elbow, user_args = pop_arg(user_args, ['-e', '--elbow'])
+    if elbow is None:
+        elbow = 'full'
+    elif elbow not in ELBOW_METHODS:
+        raise ValueError(f"Expecting one of {ELBOW_METHODS} for the elbow method")
+    sample, user_args = pop_arg(user_args, ['-s', '--sample'])
+    if sample is not None:
+        if not sample.isnumeric() or int(sample) == 0:
+            raise ValueError("Expecting a positive integer for the sample")
+        sample = int(sample)
+    workers, user_args = pop_arg(user_args, ['-w', '--workers'])
+    if workers is None:
+        workers = 1
+    elif workers.isnumeric() and int(workers) > 0:
+        workers = int(workers)
+    else:
+        raise ValueError("Expecting a positive integer for the number of workers")
+    max_memory, user_args = pop_arg(user_args, ['-m', '--max-memory'])
+    if max_memory is not None:
+        parse_size(max_memory)
+    model_file, user_args = pop_arg(user_args, ['-p', '--apply'])
+
     if len(user_args) > 0:
         input_file = user_args[0]
     else:
@@ -57,14 +159,22 @@ def args(argslist):
         print("ERROR: Required argument not found: input file")
         sys.exit(1)
 
-    return input_file
+    return input_file, n_components, n_clusters, variance, headless, elbow, sample, workers, max_memory, model_file, cache
 
 def main():
     # Get user arguments
-    input_file = args(sys.argv)
+    input_file, n_components, n_clusters, variance, headless, elbow, sample, workers, max_memory, model_file, cache = args(sys.argv)
+    if model_file is not None:
+        uml_apply(input_file, model_file, max_memory=max_memory)
+        return
+    if headless:
+        # No display is needed to save the plots
+        import matplotlib
+        matplotlib.use('Agg')
 
     # Call function
-    uml_analysis(input_file)
+    uml_analysis(input_file, n_components=n_components, n_clusters=n_clusters, variance=variance, headless=headless,
+                 elbow=elbow, sample=sample, workers=workers, max_memory=max_memory, cache=cache)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Author:
+        Maximilia F. S. Degenhardt <frazaodesouzam2@nih.gov>
+        Hermann F. Degenhardt <degenhardthf@nih.gov>
+"""
+
+import os, sys
+
+sys.path.append("../src")
+from hornet.uml import uml_sweep, DEFAULT_COMPONENTS, DEFAULT_CLUSTERS
+from hornet.arguments import pop_arg
+
+def help():
+    return """
+uml_sweep.py: Run the UML approach from HORNET over a grid of settings and summarize the cohorts.
+USAGE:
+    python uml_sweep.py <full-trajectory-file> [-n <components>] [-c <clusters>] [-e <energy-sigmas>]
+                        [-k <cohort-sigmas>] [-w <workers>] [-h]
+
+SYNOPSIS:
+    Every combination of the numbers of components, the numbers of clusters and the factors of
+    the standard deviations of the energy filter and of the cohort filter is run. The trajectory
+    is read once, filtered once per energy factor and projected once per number of components,
+    and the cohorts of all of the cohort factors come from the same clustering. The results are saved
+    in UML_sweep.csv (sizes and means of the selected cluster and of the cohort of each setting,
+    and their overlap with the cohort of the default setting) and UML_sweep_overlap.csv (overlaps
+    between the cohorts of each pair of settings), beside the input file.
+
+Positional Arguments:
+    <full-trajectory-file>      Type [String]: Input file (Full trajectory).
+                                Example: 'data/Full_Trajectory.csv'
+
+Options:
+    [-n, --components]          Type [Int list]: Numbers of PCA components, separated by commas.
+                                Default: 8
+    [-c, --clusters]            Type [Int list]: Numbers of KMeans clusters, separated by commas.
+                                Default: 3
+    [-e, --energy-sigmas]       Type [Float list]: Factors of the numbers of standard deviations used
+                                by the energy filter, separated by commas. 1 gives the default filter.
+                                Default: 1
+    [-k, --cohort-sigmas]       Type [Float list]: Factors of the numbers of standard deviations used
+                                by the cohort filter, separated by commas. 1 gives the default filter.
+                                Default: 1
+    [-w, --workers]             Type [Int]: Number of processes running the settings concurrently.
+                                The cores are split among them.
+                                Default: 1
+    [-h, --help]                Displays usage and help information for the script.
+
+Example:
+python uml_sweep.py ../data/Full_Trajectory.csv -n 6,8,10 -c 2,3,4,5 -e 0.8,1,1.2 -k 0.8,1,1.2 -w 4
+
+Requirements:
+    python = 3.9
+"""
+
+def parse_list(value, kind, name):
+    """
+    Parses a list of values separated by commas.
+
+    Parameters:
+        value (str): The values separated by commas.
+        kind (type): The type of the values (int or float).
+        name (str): The name of the values, used in the error message.
+
+    Returns:
+        list: The values.
+    """
+    try:
+        values = [kind(v) for v in value.split(',') if v != '']
+    except ValueError:
+        raise ValueError(f"Expecting a list of numbers separated by commas for the {name}")
+    if len(values) == 0 or any(v <= 0 for v in values):
+        raise ValueError(f"Expecting a list of positive numbers for the {name}")
+    return values
+
+def args(argslist):
+    """
+    Parse a list of arguments and return the input file and the grid to be run.
+
+    Parameters:
+        argslist (list): A list of arguments to parse.
+
+    Returns:
+        tuple: A tuple containing the following values:
+            - input_file (str): The input file to be used.
+            - components (list): The numbers of PCA components.
+            - clusters (list): The numbers of KMeans clusters.
+            - energy_sigmas (list): The factors of the standard deviations of the energy filter.
+            - cohort_sigmas (list): The factors of the standard deviations of the cohort filter.
+            - workers (int): The number of processes running the settings.
+    """
+
+    # Input list of arguments to parse
+    print(" - Checking arguments...")
+    user_args = argslist[1:]
+
+    if '-h' in user_args or '--help' in user_args:
+        print(help())
+        sys.exit(0)
+
+    # Options
+    components, user_args = pop_arg(user_args, ['-n', '--components'])
+    components = [DEFAULT_COMPONENTS] if components is None else parse_list(components, int, "numbers of components")
+    clusters, user_args = pop_arg(user_args, ['-c', '--clusters'])
+    clusters = [DEFAULT_CLUSTERS] if clusters is None else parse_list(clusters, int, "numbers of clusters")
+    energy_sigmas, user_args = pop_arg(user_args, ['-e', '--energy-sigmas'])
+    energy_sigmas = [1.] if energy_sigmas is None else parse_list(energy_sigmas, float, "energy sigmas")
+    cohort_sigmas, user_args = pop_arg(user_args, ['-k', '--cohort-sigmas'])
+    cohort_sigmas = [1.] if cohort_sigmas is None else parse_list(cohort_sigmas, float, "cohort sigmas")
+    workers, user_args = pop_arg(user_args, ['-w', '--workers'])
+    if workers is None:
+        workers = 1
+    elif workers.isnumeric() and int(workers) > 0:
+        workers = int(workers)
+    else:
+        raise ValueError("Expecting a positive integer for the number of workers")
+
+    if len(user_args) > 0:
+        input_file = user_args[0]
+    else:
+        print(help())
+        print("ERROR: Required argument not found: input file")
+        sys.exit(1)
+
+    return input_file, components, clusters, energy_sigmas, cohort_sigmas, workers
+
+def main():
+    # Get user arguments
+    input_file, components, clusters, energy_sigmas, cohort_sigmas, workers = args(sys.argv)
+
+    # Call function
+    uml_sweep(input_file, components=components, clusters=clusters, energy_sigmas=energy_sigmas,
+              cohort_sigmas=cohort_sigmas, workers=workers)
+
+if __name__ == '__main__':
+    main()
@@ -10,5 +10,8 @@ setup(
     install_requires=[
         "numpy == 1.22.3", "pandas == 1.5.3", "scikit-learn == 1.2.1",
         "scipy == 1.9.1", "seaborn == 0.12.2", "tensorflow == 2.13",
-        "pytest == 7.4.2"],
+        "pytest == 7.4.2", "threadpoolctl == 3.1.0"],
+    extras_require={
+        "columnar": ["pyarrow == 14.0.2"],
+        "zstd": ["zstandard == 0.25.0"]},
 )
\ No newline at end of file
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Author:
+        Maximilia F. S. Degenhardt <frazaodesouzam2@nih.gov>
+        Hermann F. Degenhardt <degenhardthf@nih.gov>
+"""
+
+def pop_arg(args, option):
+    """
+        Removes an option and its value from the arguments of a script.
+        Parameters
+        ----------
+        args : list(String)
+            The arguments
+        option : list(String)
+            The names of the option, e.g. ['-w', '--workers']
+
+        Returns
+        ----------
+        value : String
+            The value of the option, or None if it is not passed
+        args : list(String)
+            The remaining arguments
+    """
+    for i in range(len(args)):
+        if args[i] in option:
+            if i + 1 >= len(args):
+                raise ValueError(f"Expecting a value for the option {args[i]}")
+            return args[i+1], args[:i] + args[i+2:]
+    return None, args
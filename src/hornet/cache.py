@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Author:
+        Maximilia F. S. Degenhardt <frazaodesouzam2@nih.gov>
+        Hermann F. Degenhardt <degenhardthf@nih.gov>
+"""
+import os, json, hashlib
+import numpy as np
+import pandas as pd
+
+# Folder, inside the project directory, where the parsed kappas and the
+# results of the UML stages are stored
+CACHE_DIR = '.hornet_cache'
+INDEX = 'index.json'
+HASHES = 'hashes.json'
+VERSION = 1
+HASH_BLOCK = 16*1024*1024
+
+# Total size of the arrays stored by the UML stages and of the binary copies
+# of the tables, above which the least recently used ones are removed
+CACHE_SIZE = 4*1024*1024*1024
+ARRAYS = ('stage_', 'table_')
+
+def hash_file(filename):
+    """
+        Returns the hash of the content of a file.
+        Parameters
+        ----------
+        filename : String
+            File to be hashed
+
+        Returns
+        ----------
+        digest : String
+            Hexadecimal BLAKE2 digest
+    """
+    h = hashlib.blake2b(digest_size=20)
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def fingerprint(filename):
+    """
+        Returns the path, size, modification time and content hash of a file.
+        Parameters
+        ----------
+        filename : String
+            File to be identified
+
+        Returns
+        ----------
+        fp : dictionary
+            The fingerprint of the file
+    """
+    st = os.stat(filename)
+    return {
+        'file': os.path.abspath(filename), 'size': st.st_size,
+        'mtime': st.st_mtime_ns, 'hash': hash_file(filename)}
+
+def same_file(fp, filename):
+    """
+        Returns whether a file still matches its fingerprint. The content is
+        only hashed when the modification time changed but not the size.
+        Parameters
+        ----------
+        fp : dictionary
+            Fingerprint of the file, as returned by fingerprint. Its
+            modification time is updated if only the file time changed.
+        filename : String
+            File to be checked
+
+        Returns
+        ----------
+        same : Bool
+            True if the content of the file did not change
+    """
+    if not os.path.exists(filename):
+        return False
+    st = os.stat(filename)
+    if fp['file'] != os.path.abspath(filename) or fp['size'] != st.st_size:
+        return False
+    if fp['mtime'] == st.st_mtime_ns:
+        return True
+    if fp['hash'] != hash_file(filename):
+        return False
+    fp['mtime'] = st.st_mtime_ns
+    return True
+
+def load_index(path):
+    """
+        Returns the index of the cache of a project.
+        Parameters
+        ----------
+        path : String
+            Project directory
+
+        Returns
+        ----------
+        index : dictionary
+            The cache entries, by time series file
+    """
+    filename = f"{path}/{CACHE_DIR}/{INDEX}"
+    if not os.path.exists(filename):
+        return {}
+    with open(filename, 'r') as f:
+        index = json.load(f)
+    if index.get('version') != VERSION:
+        return {}
+    return index['entries']
+
+def save_index(path, index):
+    """
+        Saves the index of the cache of a project and removes the shards that
+        are no longer referenced.
+        Parameters
+        ----------
+        path : String
+            Project directory
+        index : dictionary
+            The cache entries, by time series file
+    """
+    folder = f"{path}/{CACHE_DIR}"
+    os.makedirs(folder, exist_ok=True)
+    tmp = f"{folder}/{INDEX}.{os.getpid()}"
+    with open(tmp, 'w') as f:
+        json.dump({'version': VERSION, 'entries': index}, f)
+    os.replace(tmp, f"{folder}/{INDEX}")
+
+    shards = set(e['shard'] for e in index.values())
+    for file in os.listdir(folder):
+        if file.endswith('.pkl') and file not in shards:
+            os.remove(f"{folder}/{file}")
+
+def evict_arrays(folder, keep=None, max_size=None):
+    """
+        Removes the least recently used stage arrays and table copies of a
+        cache folder, until they fit in the cache size. Loading a file marks
+        it as used.
+        Parameters
+        ----------
+        folder : String
+            Cache folder
+        keep : String
+            File that is never removed, usually the one just stored
+        max_size : Int
+            Maximum size in bytes, or None to use CACHE_SIZE
+    """
+    max_size = CACHE_SIZE if max_size is None else max_size
+    # The processes reading kappas in parallel may remove the same files
+    files = []
+    for file in os.listdir(folder):
+        if file.startswith(ARRAYS) and file.endswith('.npz'):
+            try:
+                st = os.stat(f"{folder}/{file}")
+            except FileNotFoundError:
+                continue
+            files.append((st.st_mtime_ns, st.st_size, file))
+    total = sum(size for _, size, _ in files)
+    for _, size, file in sorted(files):
+        if total <= max_size:
+            break
+        if file != keep:
+            try:
+                os.remove(f"{folder}/{file}")
+            except FileNotFoundError:
+                pass
+            total -= size
+
+def load_shard(path, index, files, params):
+    """
+        Returns the cached data of a time series, if it is still valid.
+        Parameters
+        ----------
+        path : String
+            Project directory
+        index : dictionary
+            The cache entries, by time series file
+        files : list(String)
+            The time series file, followed by the other files it depends on
+        params : list
+            The parameters used to build the data
+
+        Returns
+        ----------
+        df : DataFrame
+            The cached data, or None if it must be parsed again
+    """
+    entry = index.get(os.path.abspath(files[0]))
+    if entry is None or entry['params'] != list(params) or len(entry['files']) != len(files):
+        return None
+    if not all(same_file(fp, f) for fp, f in zip(entry['files'], files)):
+        return None
+    shard = f"{path}/{CACHE_DIR}/{entry['shard']}"
+    if not os.path.exists(shard):
+        return None
+    return pd.read_pickle(shard)
+
+def save_shard(path, index, files, params, df):
+    """
+        Stores the data of a time series in the cache.
+        Parameters
+        ----------
+        path : String
+            Project directory
+        index : dictionary
+            The cache entries, by time series file. It is updated with the
+            new entry.
+        files : list(String)
+            The time series file, followed by the other files it depends on
+        params : list
+            The parameters used to build the data
+        df : DataFrame
+            The data to be cached
+    """
+    folder = f"{path}/{CACHE_DIR}"
+    os.makedirs(folder, exist_ok=True)
+    key = os.path.abspath(files[0])
+    shard = hashlib.blake2b(key.encode(), digest_size=8).hexdigest() + '.pkl'
+    tmp = f"{folder}/{shard}.{os.getpid()}"
+    df.to_pickle(tmp)
+    os.replace(tmp, f"{folder}/{shard}")
+    index[key] = {
+        'files': [fingerprint(f) for f in files],
+        'params': list(params), 'shard': shard}
+
+def table_name(filename):
+    """
+        Returns the name of the binary copy of a table in the cache.
+        Parameters
+        ----------
+        filename : String
+            Table file
+
+        Returns
+        ----------
+        name : String
+            Name of the .npz file in the cache folder
+    """
+    key = os.path.abspath(filename)
+    return 'table_' + hashlib.blake2b(key.encode(), digest_size=8).hexdigest() + '.npz'
+
+def load_table(path, filename):
+    """
+        Returns the binary copy of a numeric table, if the file did not change.
+        Parameters
+        ----------
+        path : String
+            Project directory
+        filename : String
+            Table file
+
+        Returns
+        ----------
+        df : DataFrame
+            The cached table, or None if it must be read again
+    """
+    cached = f"{path}/{CACHE_DIR}/{table_name(filename)}"
+    if not os.path.exists(cached):
+        return None
+    with np.load(cached, allow_pickle=False) as data:
+        if not same_file(json.loads(str(data['fingerprint'])), filename):
+            return None
+        columns = json.loads(str(data['columns']))
+        df = pd.DataFrame({c: data[f"column{i}"] for i, c in enumerate(columns)})
+    os.utime(cached)
+    return df
+
+def save_table(path, filename, df):
+    """
+        Stores a binary copy of a table in the cache. Tables with non-numeric
+        columns are not stored. The least recently used arrays are removed
+        beyond CACHE_SIZE (see evict_arrays).
+        Parameters
+        ----------
+        path : String
+            Project directory
+        filename : String
+            Table file
+        df : DataFrame
+            The content of the file
+    """
+    if not all(t.kind in 'biuf' for t in df.dtypes):
+        return
+    folder = f"{path}/{CACHE_DIR}"
+    os.makedirs(folder, exist_ok=True)
+    cached = f"{folder}/{table_name(filename)}"
+    tmp = f"{cached}.{os.getpid()}"
+    arrays = {f"column{i}": df[c].to_numpy() for i, c in enumerate(df.columns)}
+    with open(tmp, 'wb') as f:
+        np.savez(f, fingerprint=json.dumps(fingerprint(filename)), columns=json.dumps(list(df.columns)), **arrays)
+    os.replace(tmp, cached)
+    evict_arrays(folder, keep=table_name(filename))
+
+def file_hash(path, filename):
+    """
+        Returns the content hash of a file, only computed again when the file
+        changed since the last call.
+        Parameters
+        ----------
+        path : String
+            Project directory
+        filename : String
+            File to be hashed
+
+        Returns
+        ----------
+        digest : String
+            Hexadecimal BLAKE2 digest
+    """
+    folder = f"{path}/{CACHE_DIR}"
+    hashes_file = f"{folder}/{HASHES}"
+    hashes = {}
+    if os.path.exists(hashes_file):
+        with open(hashes_file, 'r') as f:
+            hashes = json.load(f)
+    key = os.path.abspath(filename)
+    fp = hashes.get(key)
+    if fp is None or not same_file(fp, filename):
+        fp = fingerprint(filename)
+    hashes[key] = fp
+    os.makedirs(folder, exist_ok=True)
+    tmp = f"{hashes_file}.{os.getpid()}"
+    with open(tmp, 'w') as f:
+        json.dump(hashes, f)
+    os.replace(tmp, hashes_file)
+    return fp['hash']
+
+def open_stages(path, filename):
+    """
+        Returns the cache of the stages of an analysis of a file. Each stage
+        is stored under the hash of the content of the file, of the stages
+        before it and of its parameters.
+        Parameters
+        ----------
+        path : String
+            Project directory
+        filename : String
+            Analysed file
+
+        Returns
+        ----------
+        stages : dictionary
+            The cache, to be passed to load_stage and save_stage
+    """
+    return {'path': path, 'key': file_hash(path, filename)}
+
+def stage_key(stages, name, params):
+    """
+        Returns the key of a stage.
+        Parameters
+        ----------
+        stages : dictionary
+            The cache returned by open_stages
+        name : String
+            Stage name
+        params : list
+            The parameters of the stage
+
+        Returns
+        ----------
+        key : String
+            Hexadecimal BLAKE2 digest
+    """
+    content = json.dumps([VERSION, stages['key'], name, params], default=str)
+    return hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+
+def next_stages(stages, name, params):
+    """
+        Returns the cache of the stages that follow a stage, which depend on
+        its parameters.
+        Parameters
+        ----------
+        stages : dictionary
+            The cache returned by open_stages, or None
+        name : String
+            Stage name
+        params : list
+            The parameters of the stage
+
+        Returns
+        ----------
+        stages : dictionary
+            The cache of the following stages, or None
+    """
+    if stages is None:
+        return None
+    return {**stages, 'key': stage_key(stages, name, params)}
+
+def load_stage(stages, name, params):
+    """
+        Returns the arrays stored by a stage, if it already ran.
+        Parameters
+        ----------
+        stages : dictionary
+            The cache returned by open_stages, or None
+        name : String
+            Stage name
+        params : list
+            The parameters of the stage
+
+        Returns
+        ----------
+        arrays : dictionary
+            The stored arrays, or None if the stage must run
+    """
+    if stages is None:
+        return None
+    filename = f"{stages['path']}/{CACHE_DIR}/stage_{stage_key(stages, name, params)}.npz"
+    if not os.path.exists(filename):
+        return None
+    with np.load(filename, allow_pickle=False) as data:
+        arrays = dict(data)
+    os.utime(filename)
+    return arrays
+
+def save_stage(stages, name, params, arrays):
+    """
+        Stores the arrays computed by a stage. The least recently used arrays
+        are removed beyond CACHE_SIZE (see evict_arrays).
+        Parameters
+        ----------
+        stages : dictionary
+            The cache returned by open_stages, or None to store nothing
+        name : String
+            Stage name
+        params : list
+            The parameters of the stage
+        arrays : dictionary
+            The arrays to be stored
+    """
+    if stages is None:
+        return
+    folder = f"{stages['path']}/{CACHE_DIR}"
+    os.makedirs(folder, exist_ok=True)
+    filename = f"{folder}/stage_{stage_key(stages, name, params)}.npz"
+    tmp = f"{filename}.{os.getpid()}"
+    with open(tmp, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, filename)
+    evict_arrays(folder, keep=os.path.basename(filename))
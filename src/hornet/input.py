@@ -5,9 +5,31 @@ Author:
         Maximilia F. S. Degenhardt <frazaodesouzam2@nih.gov>
         Hermann F. Degenhardt <degenhardthf@nih.gov>
 """
-import os, sys
+import os, sys, json, time, glob, tempfile
+import numpy as np
 import pandas as pd
-from hornet.uml import filter_data
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from hornet.uml import filter_data, data_cuts
+from hornet.parser import BLOCK_SIZE, COMPRESSED, OPERATORS, is_compressed, is_ts, iter_ts, read_ts, read_new_records, \
+    index_ts, read_frames, open_ts, read_header
+from hornet.storage import FORMATS, UNUSED, check_format, compact_table, write_table, open_table, append_table, close_table, \
+    append_csv, parse_size
+from hornet.stats import moments, merge_moments, save_moments
+from hornet.cache import load_index, save_index, load_shard, save_shard, load_table, save_table
+
+# File listing the runs found in a kappa-scan root
+MANIFEST = 'kappa_scan.json'
+
+# Suffix of the time series of the replicas of a kappa, e.g. en_allk14_r2.txt
+REPLICA = '_r'
+
+# Suffix of the sidecar files with the byte offset of each frame
+FRAME_INDEX = '.frames.npy'
+
+# Peak memory used by a chunk, relative to the bytes of text parsed, and
+# smallest chunk used in the chunked mode of prepare_inputs
+MEMORY_FACTOR = 8
+MIN_BLOCK = 64*1024
 
 def get_parameter(filename):
     """
@@ -30,13 +52,406 @@ def get_parameter(filename):
                 dFile.append(line)
     return dFile
 
-def get_input_data(path, base_pairing=-1, base_stacking=-1, initial="en_all"):
+def find_file(filename):
     """
-        Returns input data joining all of the kappas from the dynamic fitting.
+        Returns a file, or its compressed version if only that one exists.
+        Parameters
+        ----------
+        filename : String
+            Uncompressed file name
+
+        Returns
+        ----------
+        filename : String
+            The existing file name, or the given one if none exists
+    """
+    if not os.path.exists(filename):
+        for ext in COMPRESSED:
+            if os.path.exists(filename + ext):
+                return filename + ext
+    return filename
+
+def parse_run(run):
+    """
+        Returns the kappa and the replica of a run.
+        Parameters
+        ----------
+        run : String
+            Run name, as found in the file names after 'k', e.g. '14' or
+            '14_r2'
+
+        Returns
+        ----------
+        kappa : String
+            Kappa value
+        replica : Int
+            Replica number, or None if the run has no replica suffix
+    """
+    kappa, _, replica = str(run).partition(REPLICA)
+    return kappa, (int(replica) if replica != '' else None)
+
+def file_run(filename, prefix):
+    """
+        Returns the run of a time series named <prefix><run>.<extension>.
+        Parameters
+        ----------
+        filename : String
+            File name, without the directory
+        prefix : String
+            The prefix of the time series, e.g. 'en_allk'
+
+        Returns
+        ----------
+        run : String
+            Run name, e.g. '14' or '14_r2', or None if the file is not a
+            time series with the prefix
+    """
+    if not filename.startswith(prefix):
+        return None
+    run = filename[len(prefix):].split(".")[0]
+    kappa, sep, replica = run.partition(REPLICA)
+    if not kappa.isnumeric() or (sep != '' and not replica.isnumeric()):
+        return None
+    return run
+
+def sort_runs(runs):
+    """
+        Returns runs sorted by kappa and replica. If any of the runs is a
+        replica, the runs without a replica suffix are taken as replica 0.
+        Parameters
+        ----------
+        runs : dictionary
+            The files of each run
+
+        Returns
+        ----------
+        runs : dictionary
+            The files of each run, sorted
+    """
+    if any(parse_run(r)[1] is not None for r in runs):
+        named = {}
+        for r, files in runs.items():
+            name = r if parse_run(r)[1] is not None else f"{r}{REPLICA}0"
+            if name in named:
+                raise ValueError(f"Found two runs for replica {name}: {named[name][0]} and {files[0]}")
+            named[name] = files
+        runs = named
+    order = lambda run: (int(parse_run(run[0])[0]), parse_run(run[0])[1] or 0)
+    return dict(sorted(runs.items(), key=order))
+
+def read_bases(filename, cache_path=None):
+    """
+        Returns the bases of a kappa, with the columns renamed as used by HORNET.
+        Parameters
+        ----------
+        filename : String
+            The bases_k<kappa>.csv file
+        cache_path : String
+            Project directory whose cache keeps a binary copy of the file, or
+            None to always read the CSV
+
+        Returns
+        ----------
+        df : DataFrame
+            The bases, with the columns baseP and baseS
+    """
+    df = load_table(cache_path, filename) if cache_path is not None else None
+    if df is None:
+        df = pd.read_csv(filename)
+        if cache_path is not None:
+            save_table(cache_path, filename, df)
+    return df.rename(columns={"base_pair": "baseP", "base_stack": "baseS"}, errors="raise")
+
+def join_bases(df1, df2):
+    """
+        Attaches the bases to the records of a kappa by their frame, as a left
+        merge on frame and kapa would, but without hashing or copying the
+        records. Falls back to the merge if the frames of the bases are not
+        unique non-negative integers.
+        Parameters
+        ----------
+        df1 : DataFrame
+            Records of a single kappa, with the frame and kapa columns
+        df2 : DataFrame
+            Bases, as returned by read_bases
+
+        Returns
+        ----------
+        df : DataFrame
+            The records with the columns of the bases, keeping their index
+            unless duplicated frames in the bases add records
+    """
+    kappa = df1['kapa'].iloc[0] if len(df1) > 0 else None
+    df2 = df2[df2['kapa'] == kappa]
+    columns = [c for c in df2.columns if c not in ['frame', 'kapa']]
+    bframes = df2['frame'].to_numpy()
+    if (bframes.dtype.kind not in 'iu' or (len(bframes) > 0 and bframes.min() < 0)
+            or not df2['frame'].is_unique or any(c in df1.columns for c in columns)):
+        index = df1.index
+        df1 = df1.merge(df2, how='left', on=["frame","kapa"])
+        if len(df1) == len(index):
+            df1.index = index
+        return df1
+
+    # Position of each frame in the bases, or -1 if missing
+    lookup = np.full(bframes.max() + 1 if len(bframes) > 0 else 0, -1)
+    lookup[bframes] = np.arange(len(bframes))
+    frames = df1['frame'].to_numpy()
+    inside = (frames >= 0) & (frames < len(lookup))
+    pos = np.full(len(frames), -1)
+    pos[inside] = lookup[frames[inside]]
+    found = pos >= 0
+
+    for c in columns:
+        values = df2[c].to_numpy()[np.where(found, pos, 0)] if len(df2) > 0 else np.empty(len(df1))
+        if not found.all():
+            if values.dtype.kind in 'iu':
+                values = values.astype(np.float64)
+            elif values.dtype.kind == 'b':
+                values = values.astype(object)
+            values[~found] = np.nan
+        df1[c] = values
+    return df1
+
+def read_kappa(files, kappa, base_pairing=-1, base_stacking=-1, workers=1, cuts=None,
+               compact=False, drop_unused=False, cache_path=None, frame_index=False):
+    """
+        Returns the data from a single kappa of the dynamic fitting.
+        Parameters
+        ----------
+        files : list(String)
+            The time series file, followed by the bases file if it is used
+        kappa : String
+            Run name, as found in the file name, e.g. '14' or '14_r2'
+        base_pairing : Int
+            Average number of base-pairing, if passed
+        base_stacking : Int
+            Average number of base-stacking, if passed
+        workers : Int
+            Number of processes parsing the file in parallel
+        cuts : list(tuple)
+            The (column, operator, value) cuts applied while parsing
+        compact : Bool
+            Whether to use the compact column types
+        drop_unused : Bool
+            Whether to drop the columns not used by the UML and DNN approaches
+        cache_path : String
+            Project directory whose cache keeps the bases in binary form
+        frame_index : Bool
+            Whether to also save the byte offset of each frame beside the
+            time series (see load_frame_index)
+
+        Returns
+        ----------
+        df : DataFrame
+            The data from the kappa
+    """
+    fn0 = files[0]
+    df1 = read_ts(fn0, workers=workers, cuts=cuts)
+    print(f"   + {fn0}")
+    if frame_index and not is_compressed(fn0):
+        load_frame_index(fn0)
+    df2 = read_bases(files[1], cache_path) if base_pairing < 0 or base_stacking < 0 else None
+    return kappa_columns(df1, kappa, df2, base_pairing, base_stacking, compact, drop_unused)
+
+def iter_kappa(files, kappa, base_pairing=-1, base_stacking=-1, block_size=BLOCK_SIZE, cuts=None,
+               compact=False, drop_unused=False):
+    """
+        Yields the data from a single kappa of the dynamic fitting in chunks,
+        as read_kappa would return it.
+        Parameters
+        ----------
+        files : list(String)
+            The time series file, followed by the bases file if it is used
+        kappa : String
+            Run name, as found in the file name, e.g. '14' or '14_r2'
+        base_pairing : Int
+            Average number of base-pairing, if passed
+        base_stacking : Int
+            Average number of base-stacking, if passed
+        block_size : Int
+            Approximate number of bytes of the time series parsed per chunk
+        cuts : list(tuple)
+            The (column, operator, value) cuts applied while parsing
+        compact : Bool
+            Whether to use the compact column types
+        drop_unused : Bool
+            Whether to drop the columns not used by the UML and DNN approaches
+
+        Returns
+        ----------
+        df : DataFrame
+            A chunk of the data from the kappa
+    """
+    print(f"   + {files[0]}")
+    df2 = read_bases(files[1]) if base_pairing < 0 or base_stacking < 0 else None
+    for df1 in iter_ts(files[0], block_size, cuts):
+        yield kappa_columns(df1, kappa, df2, base_pairing, base_stacking, compact, drop_unused)
+
+def empty_kappa(files, kappa, base_pairing=-1, base_stacking=-1, compact=False, drop_unused=False):
+    """
+        Returns the columns of a kappa of the dynamic fitting, without any
+        records, as read_kappa returns them when every record is cut.
+        Parameters
+        ----------
+        files : list(String)
+            The time series file, followed by the bases file if it is used
+        kappa : String
+            Run name, as found in the file name, e.g. '14' or '14_r2'
+        base_pairing : Int
+            Average number of base-pairing, if passed
+        base_stacking : Int
+            Average number of base-stacking, if passed
+        compact : Bool
+            Whether to use the compact column types
+        drop_unused : Bool
+            Whether to drop the columns not used by the UML and DNN approaches
+
+        Returns
+        ----------
+        df : DataFrame
+            The empty data from the kappa
+    """
+    with open_ts(files[0]) as ts_file:
+        columns = read_header(ts_file)
+    df1 = pd.DataFrame(np.empty((0, len(columns))), columns=columns)
+    df2 = read_bases(files[1]) if base_pairing < 0 or base_stacking < 0 else None
+    return kappa_columns(df1, kappa, df2, base_pairing, base_stacking, compact, drop_unused)
+
+def load_frame_index(filename):
+    """
+        Returns the byte offset of each frame of a time series. The offsets
+        are kept in a sidecar file (<filename>.frames.npy), which is built
+        when it is missing or older than the time series.
+        Parameters
+        ----------
+        filename : String
+            Time series file, not compressed
+
+        Returns
+        ----------
+        index : ndarray
+            The int64 byte offset of each frame
+    """
+    sidecar = filename + FRAME_INDEX
+    if os.path.exists(sidecar) and os.path.getmtime(sidecar) >= os.path.getmtime(filename):
+        return np.load(sidecar)
+    index = index_ts(filename)
+    tmp = temp_file(sidecar)
+    try:
+        with open(tmp, 'wb') as f:
+            np.save(f, index)
+        os.replace(tmp, sidecar)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return index
+
+def index_kappas(runs):
+    """
+        Builds the frame index (see load_frame_index) of the time series of
+        each kappa, if it is missing or older than the file. Compressed time
+        series are skipped.
+        Parameters
+        ----------
+        runs : dictionary
+            The files of each kappa, as returned by select_kappas
+    """
+    for files in runs.values():
+        if not is_compressed(files[0]):
+            load_frame_index(files[0])
+
+def fetch_frames(path, kappa, frames, initial="en_all", replica=None):
+    """
+        Returns some frames of a kappa, seeking to them in the time series
+        instead of reading the whole file.
+        Parameters
+        ----------
+        path : String
+            Project directory or kappa-scan root
+        kappa : Int
+            Kappa value
+        frames : list(Int)
+            The frames to be read, e.g. [2500, 2501] or range(2500, 3000)
+        initial : String
+            The prefix of the files to be used
+        replica : Int
+            Replica of the kappa. If None, the run without a replica suffix
+            (replica 0 in a project with replicas) is read.
+
+        Returns
+        ----------
+        df : DataFrame
+            The records of the frames, sorted, with the frame and kapa columns
+            (and the replica column, if the project has replicas)
+    """
+    runs = select_kappas(path, 1, 1, initial, manifest=False)
+    run = str(kappa) if replica is None else f"{kappa}{REPLICA}{replica}"
+    if replica is None and run not in runs and f"{run}{REPLICA}0" in runs:
+        run = f"{run}{REPLICA}0"
+    if run not in runs:
+        replicas = [parse_run(r)[1] for r in runs if parse_run(r)[0] == str(kappa)]
+        if replica is None and len(replicas) > 0:
+            raise ValueError(f"Kappa {kappa} in {path} has no run without a replica suffix. "
+                             f"Pass one of the replicas: {replicas}.")
+        raise FileExistsError(f"No files found for kappa {run} in {path}.")
+    filename = runs[run][0]
+    df1 = read_frames(filename, frames, load_frame_index(filename))
+    return kappa_columns(df1, run)
+
+def kappa_columns(df1, kappa, df2=None, base_pairing=-1, base_stacking=-1, compact=False, drop_unused=False):
+    """
+        Adds the frame, kappa, replica and bases columns to the records of a
+        kappa. The replica column is only added to the runs of replicas.
+        Parameters
+        ----------
+        df1 : DataFrame
+            Records of the time series, indexed by frame
+        kappa : String
+            Run name, as found in the file name, e.g. '14' or '14_r2'
+        df2 : DataFrame
+            Bases, as returned by read_bases, if they are used
+        base_pairing : Int
+            Average number of base-pairing, if passed
+        base_stacking : Int
+            Average number of base-stacking, if passed
+        compact : Bool
+            Whether to use the compact column types
+        drop_unused : Bool
+            Whether to drop the columns not used by the UML and DNN approaches
+
+        Returns
+        ----------
+        df : DataFrame
+            The records with the new columns
+    """
+    kappa, replica = parse_run(kappa)
+    df1['frame'] = df1.index
+    df1['kapa'] = int(kappa)
+    if replica is not None:
+        df1['replica'] = replica
+    if df2 is not None:
+        df1 = join_bases(df1, df2)
+    if base_pairing > 0:
+        df1['baseP'] = base_pairing
+    if base_stacking > 0:
+        df1['baseS'] = base_stacking
+    if compact:
+        df1 = compact_table(df1, drop_unused)
+    elif drop_unused:
+        df1 = df1.drop(columns=UNUSED, errors='ignore')
+    return df1
+
+def kappa_files(path, kappa, base_pairing=-1, base_stacking=-1, initial="en_all"):
+    """
+        Returns the files read for a single kappa of the dynamic fitting. The
+        replicas of a kappa have their own bases file, e.g. bases_k14_r2.csv.
         Parameters
         ----------
         path : String
             Path to the files
+        kappa : String
+            Run name, as found in the file name, e.g. '14' or '14_r2'
         base_pairing : Int
             Average number of base-pairing, if passed
         base_stacking : Int
@@ -46,62 +461,356 @@ def get_input_data(path, base_pairing=-1, base_stacking=-1, initial="en_all"):
 
         Returns
         ----------
-        df : DataFrame
-            The concatenated data from all kappas
+        files : list(String)
+            The time series file, followed by the bases file if it is used
+    """
+    files = [find_file(f"{path}/{initial}k{kappa}.txt")]
+    if base_pairing < 0 or base_stacking < 0:
+        files.append(find_file(f"{path}/bases_k{kappa}.csv"))
+    return files
+
+def find_kappas(path, base_pairing=-1, base_stacking=-1, initial="en_all"):
     """
-    columns = [
-        'step', 'tempk', 'radg', 'etot', 'velet', ' qscore', 'rmsd_C', 'local',
-        'go', 'repul', 'stack' , 'hbond', 'elect', 'afmcc', 'afmfit', 'stage']
-
-    N = []
-    for file in os.listdir(path):
-        if file.startswith(initial):
-            N.append(file.split(".")[0].split("k")[1])
-    N.sort(key=int)
-
-    Num = len(N)
-    dfs = []
-    for k in range(0,Num):
-        df1 = []
-        fn0 = f"{path}/{initial}k{N[k]}.txt"
-
-        # Create temporary dir
-        if (not os.path.exists('.tmp')):
-            os.mkdir('.tmp')
-        # Remove problematic entries from dynamic fitting
-        os.system(f"grep -v \'*\' {path}/en_allk{N[k]}.txt > .tmp/en_allk{N[k]}.txt")
-
-        fn = f".tmp/en_allk{N[k]}.txt"
-        df1 = get_parameter(fn)
-        print(f"   + {fn0}")
-        del df1[0:7]
-        T = []
-        for i in range(0, len(df1)-1):
-            T.append(df1[i].split())
-        df1 = pd.DataFrame(T,columns=columns)
-        df1 = df1.astype(float)
-        df1['frame'] = range(0, len(df1))
-        df1['kapa'] = int(N[k])
+        Returns the files of each kappa in a project directory, where they
+        are named <initial>k<kappa>.txt and bases_k<kappa>.csv. The replicas
+        of a kappa are named with a suffix, e.g. <initial>k14_r2.txt, and
+        are returned as separate runs (see sort_runs).
+        Parameters
+        ----------
+        path : String
+            Project directory
+        base_pairing : Int
+            Average number of base-pairing, if passed
+        base_stacking : Int
+            Average number of base-stacking, if passed
+        initial : String
+            The prefix of the files to be used
+
+        Returns
+        ----------
+        runs : dictionary
+            The files of each run, as returned by kappa_files, sorted by
+            kappa and replica
+    """
+    N = set(file_run(file, f"{initial}k") for file in os.listdir(path))
+    N.discard(None)
+    return sort_runs({k: kappa_files(path, k, base_pairing, base_stacking, initial) for k in N})
+
+def find_bases(root, kappa):
+    """
+        Returns the bases file of a kappa in a kappa-scan root. It is looked
+        for as bases_k<kappa>.csv in the root, in k<kappa> and in
+        k<kappa>/output, and then as any bases*.csv file inside k<kappa>.
+        Parameters
+        ----------
+        root : String
+            Kappa-scan directory
+        kappa : String
+            Run name, as found in the directory name, e.g. '14' or '14_r2'
+
+        Returns
+        ----------
+        filename : String
+            The bases file, or the expected one in the root if none is found
+    """
+    candidates = [f"{root}/bases_k{kappa}.csv", f"{root}/k{kappa}/bases_k{kappa}.csv",
+                  f"{root}/k{kappa}/output/bases_k{kappa}.csv"]
+    for candidate in candidates:
+        filename = find_file(candidate)
+        if os.path.exists(filename):
+            return filename
+    found = sorted(glob.glob(f"{root}/k{kappa}/**/bases*.csv*", recursive=True))
+    return found[0] if len(found) > 0 else candidates[0]
+
+def scan_kappas(root, base_pairing=-1, base_stacking=-1):
+    """
+        Returns the files of each kappa in a kappa-scan root, where each kappa
+        was run in k<kappa>/output, so they are read in place. The replicas
+        of a kappa are run in folders with a suffix, e.g. k14_r2/output.
+        Parameters
+        ----------
+        root : String
+            Kappa-scan directory
+        base_pairing : Int
+            Average number of base-pairing, if passed
+        base_stacking : Int
+            Average number of base-stacking, if passed
+
+        Returns
+        ----------
+        runs : dictionary
+            The time series file of each run, followed by its bases file if
+            it is used, sorted by kappa and replica
+    """
+    runs = {}
+    for folder in os.listdir(root):
+        output = f"{root}/{folder}/output"
+        if file_run(folder, 'k') != folder[1:] or not os.path.isdir(output):
+            continue
+        ts = sorted(f for f in os.listdir(output) if is_ts(f))
+        if len(ts) == 0:
+            continue
+        if len(ts) > 1:
+            raise ValueError(f"Expecting a single time series in {output}, found: {ts}")
+        runs[folder[1:]] = [f"{output}/{ts[0]}"]
         if base_pairing < 0 or base_stacking < 0:
-            df2 = pd.read_csv(f"{path}/bases_k{N[k]}.csv")
-            df2 = df2.rename(columns={"base_pair": "baseP", "base_stack": "baseS"}, errors="raise")
-            df1 = df1.merge(df2, how='left', on=["frame","kapa"])
-        if base_pairing > 0:
-            df1['baseP'] = base_pairing
-        if base_stacking > 0:
-            df1['baseS'] = base_stacking
-            
-        dfs.append(df1)
-    
-    if len(dfs) == 0:
+            runs[folder[1:]].append(find_bases(root, folder[1:]))
+    return sort_runs(runs)
+
+def save_manifest(path, runs):
+    """
+        Saves the list of the runs discovered in a kappa-scan root.
+        Parameters
+        ----------
+        path : String
+            Directory where the manifest is saved
+        runs : dictionary
+            The files of each kappa, as returned by scan_kappas
+    """
+    manifest = []
+    for k, files in runs.items():
+        kappa, replica = parse_run(k)
+        run = {'kappa': int(kappa)} if replica is None else {'kappa': int(kappa), 'replica': replica}
+        manifest.append({
+            **run, 'files': [os.path.abspath(f) for f in files],
+            'size': sum(os.path.getsize(f) for f in files if os.path.exists(f))})
+    with open(f"{path}/{MANIFEST}", 'w') as f:
+        json.dump({'root': os.path.abspath(path), 'runs': manifest}, f, indent=4)
+
+def select_kappas(path, base_pairing=-1, base_stacking=-1, initial="en_all", cuts=None, manifest=True):
+    """
+        Returns the files of the kappas to be read from a project directory
+        or from a kappa-scan root, skipping the kappas that are cut.
+        Parameters
+        ----------
+        path : String
+            Path to the files
+        base_pairing : Int
+            Average number of base-pairing, if passed
+        base_stacking : Int
+            Average number of base-stacking, if passed
+        initial : String
+            The prefix of the files to be used
+        cuts : list(tuple)
+            The (column, operator, value) cuts, of which the ones on 'kapa'
+            are used
+        manifest : Bool
+            Whether to list the runs found in a kappa-scan root in the
+            manifest file
+
+        Returns
+        ----------
+        runs : dictionary
+            The files of each run, sorted by kappa and replica
+    """
+    runs = find_kappas(path, base_pairing, base_stacking, initial)
+    if len(runs) == 0:
+        runs = scan_kappas(path, base_pairing, base_stacking)
+        if len(runs) > 0 and manifest:
+            print(f"   > Kappa scan: {len(runs)} runs, listed in {path}/{MANIFEST}")
+            save_manifest(path, runs)
+
+    if len(runs) == 0:
         raise FileExistsError(f"No files found in {path}.")
-    return pd.concat(dfs)
 
+    # Skip the kappas that are cut before opening their files
+    if cuts is not None:
+        runs = {k: f for k, f in runs.items() if all(OPERATORS[op](int(parse_run(k)[0]), v) for c, op, v in cuts if c == 'kapa')}
+        if len(runs) == 0:
+            raise ValueError(f"All of the kappas in {path} were cut.")
+    return runs
+
+def get_input_data(path, base_pairing=-1, base_stacking=-1, initial="en_all", workers=1, cache=False, cuts=None,
+                   compact=False, drop_unused=False, frame_index=False):
+    """
+        Returns input data joining all of the kappas from the dynamic fitting.
+        Parameters
+        ----------
+        path : String
+            Path to the files. If there are no files with the prefix, it is
+            read as a kappa-scan root (see scan_kappas), and the runs found
+            are listed in the manifest file. The replicas of a kappa (e.g.
+            en_allk14_r2.txt) are read as separate runs, and their records
+            get a 'replica' column.
+        base_pairing : Int
+            Average number of base-pairing, if passed
+        base_stacking : Int
+            Average number of base-stacking, if passed
+        initial : String
+            The prefix of the files to be used
+        workers : Int
+            Number of processes reading the runs in parallel. If there are
+            fewer runs than workers, each file is split among the workers.
+        cache : Bool
+            Whether to keep the parsed kappas in the project cache, so only
+            new or modified files are parsed in the next runs
+        cuts : list(tuple)
+            The (column, operator, value) cuts applied while reading, e.g.
+            ('etot', '<', 0). Cuts on 'kapa' skip whole files, and cuts on
+            'frame' and on the time series columns are applied while parsing.
+        compact : Bool
+            Whether to use the compact column types: integer counters,
+            float32 energy terms and int32 kappas
+        drop_unused : Bool
+            Whether to drop the columns not used by the UML and DNN
+            approaches, such as 'velet' and 'tempk'
+        frame_index : Bool
+            Whether to save the byte offset of each frame beside the time
+            series, so fetch_frames can read any frame directly
+
+        Returns
+        ----------
+        df : DataFrame
+            The concatenated data from all kappas
+    """
+    runs = select_kappas(path, base_pairing, base_stacking, initial, cuts)
+    N = list(runs)
+
+    # Reuse the kappas whose files did not change
+    params = [base_pairing, base_stacking, None if cuts is None else [list(c) for c in cuts], compact, drop_unused]
+    dfs, index = load_kappas(path, runs, params) if cache else ({}, None)
+    missing = [k for k in N if k not in dfs]
+    cache_path = path if cache else None
+
+    # Kappas are read in order, so the result does not depend on the workers
+    if workers > 1 and len(missing) >= workers:
+        args = [(runs[k], k, base_pairing, base_stacking, 1, cuts, compact, drop_unused, cache_path, frame_index)
+                for k in missing]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            dfs.update(zip(missing, pool.map(read_kappa, *zip(*args))))
+    else:
+        for k in missing:
+            dfs[k] = read_kappa(runs[k], k, base_pairing, base_stacking, workers, cuts, compact, drop_unused, cache_path,
+                                frame_index)
+
+    if cache:
+        save_kappas(path, index, runs, params, {k: dfs[k] for k in missing})
+    if frame_index:
+        # The kappas read above were indexed while parsing
+        index_kappas({k: runs[k] for k in N if k not in missing})
 
-def save_transformed(df, path='data', name='Full_Trajectory'):
+    return pd.concat([dfs[k] for k in N], copy=False)
+
+def load_kappas(path, runs, params):
+    """
+        Returns the kappas found in the project cache, whose files did not
+        change since they were read with the same parameters.
+        Parameters
+        ----------
+        path : String
+            Project directory
+        runs : dictionary
+            The files of each kappa, as returned by select_kappas
+        params : list
+            The parameters used to read the kappas. The run name of each
+            kappa is added, as it sets its kappa and replica columns.
+
+        Returns
+        ----------
+        dfs : dictionary
+            The data of the cached kappas
+        index : dictionary
+            The index of the cache, to be passed to save_kappas
+    """
+    dfs = {}
+    index = load_index(path)
+    for k, files in runs.items():
+        df1 = load_shard(path, index, files, [*params, k])
+        if df1 is not None:
+            print(f"   + {files[0]} (cached)")
+            dfs[k] = df1
+    return dfs, index
+
+def save_kappas(path, index, runs, params, dfs):
+    """
+        Stores the kappas that were read in the project cache and removes the
+        entries of the files no longer read.
+        Parameters
+        ----------
+        path : String
+            Project directory
+        index : dictionary
+            The index of the cache, as returned by load_kappas
+        runs : dictionary
+            The files of each kappa, as returned by select_kappas
+        params : list
+            The parameters used to read the kappas, without the run names
+        dfs : dictionary
+            The data of the kappas that were read
+    """
+    for k, df1 in dfs.items():
+        save_shard(path, index, runs[k], [*params, k], df1)
+    current = [os.path.abspath(files[0]) for files in runs.values()]
+    save_index(path, {f: e for f, e in index.items() if f in current})
+
+
+def drop_overflowed(df):
+    """
+        Returns the rows without problematic entries from the dynamic fitting,
+        such as ***, in their text columns. Numeric columns can not hold them,
+        since the parser drops the records with overflowed fields.
+        Parameters
+        ----------
+        df : DataFrame
+            DataFrame to be checked
+
+        Returns
+        ----------
+        df : DataFrame
+            The rows without problematic entries
+    """
+    text = df.select_dtypes(include='object')
+    if len(text.columns) == 0:
+        return df
+    return df[~text.apply(lambda c: c.astype(str).str.contains('*', regex=False)).any(axis=1)]
+
+def output_file(path, name, fmt):
+    """
+        Returns the name of an output file of a project.
+        Parameters
+        ----------
+        path : String
+            Output directory, or '' for the current one
+        name : String
+            Name of the file, without extension
+        fmt : String
+            Output format: 'csv', 'parquet' or 'feather'
+
+        Returns
+        ----------
+        filename : String
+            The output file
+    """
+    return f"{path}/{name}{FORMATS[fmt]}" if path != '' else f"{name}{FORMATS[fmt]}"
+
+def temp_file(filename):
+    """
+        Returns a new temporary file beside a file, unique to the caller, so
+        that it can be renamed over the file once it is complete.
+        Parameters
+        ----------
+        filename : String
+            Destination file
+
+        Returns
+        ----------
+        tmp : String
+            The temporary file, with the default permissions of new files
+    """
+    fd, tmp = tempfile.mkstemp(prefix=f".{os.path.basename(filename)}.", suffix='.tmp',
+                               dir=os.path.dirname(filename) or '.')
+    os.close(fd)
+    umask = os.umask(0)
+    os.umask(umask)
+    os.chmod(tmp, 0o666 & ~umask)
+    return tmp
+
+def save_transformed(df, path='data', name='Full_Trajectory', fmt='csv'):
     """
         Saves the transformed dataset and remove problematic entries from
-        the dynamic fitting, such as ***.
+        the dynamic fitting, such as ***. The entries are removed in memory
+        and the file is written once, to a temporary file beside the output
+        that is then renamed, so concurrent runs do not interfere.
         Parameters
         ----------
         df : DataFrame
@@ -110,34 +819,58 @@ def save_transformed(df, path='data', name='Full_Trajectory'):
             Output directory 
         name : String
             Name of the file
+        fmt : String
+            Output format: 'csv', 'parquet' or 'feather'
     """
-    # Create temporary dir
-    if (not os.path.exists('.tmp')):
-        os.mkdir('.tmp')
-
-    # Save data to temporary dir
-    df.to_csv(f".tmp/{name}", index=False)
-
-    # Remove problematic entries
-    os.system(f"grep -v \'*\' .tmp/{name} > .tmp/test && mv .tmp/test .tmp/{name}")
+    check_format(fmt)
+    full_path = output_file(path, name, fmt)
 
-    # Save data
-    full_path = f"{path}/{name}.csv" if path != '' else f"{name}.csv"
-    os.system(f"mv .tmp/{name} {full_path}")
+    # Numeric columns can not hold problematic entries, so only the text ones are checked
+    tmp = temp_file(full_path)
+    try:
+        write_table(drop_overflowed(df), tmp, fmt)
+        os.replace(tmp, full_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
 
 
-def prepare_inputs(path, base_pairing=-1, base_stacking=-1):
+def prepare_inputs(path, base_pairing=-1, base_stacking=-1, workers=1, fmt='csv', cache=False,
+                   min_frame=2000, max_kappa=50, compact=False, drop_unused=False, max_memory=None,
+                   frame_index=False):
     """
         Main function to prepare the files from the dynamic fitting as input to UML
         and DNN approaches.
         Parameters
         ----------
         path : string
-            Input and output folder where the files from the analysis will be stored
+            Input and output folder where the files from the analysis will be stored.
+            It can also be the root of a kappa scan, with the runs in k<kappa>/output.
         base_pairing : int
             Number of base-pairing
         base_stacking : int
             Number of base-stacking
+        workers : int
+            Number of processes reading the kappas in parallel
+        fmt : string
+            Output format: 'csv', 'parquet' or 'feather'
+        cache : bool
+            Whether to keep the parsed kappas in the project cache, so only
+            new or modified files are parsed in the next runs
+        min_frame : int
+            Frames up to this one are removed
+        max_kappa : int
+            Kappas from this one on are removed
+        compact : bool
+            Whether to use the compact column types
+        drop_unused : bool
+            Whether to drop the columns not used by the UML and DNN approaches
+        max_memory : int or string
+            Memory budget (e.g. '8G'). If passed, the files are read, filtered and
+            written in chunks that fit in the budget, instead of being fully loaded.
+            The workers and the cache are not used in this mode.
+        frame_index : bool
+            Whether to save the byte offset of each frame beside the time series
     """
 
     # Read files
@@ -145,15 +878,327 @@ def prepare_inputs(path, base_pairing=-1, base_stacking=-1):
         print(f" - Average number of base-pairing: {base_pairing}")
         print(f" - Average number of base-stacking: {base_stacking}")
     print(f" - Reading files from: {path}")
-    df = get_input_data(path, base_pairing, base_stacking)
 
-    # Filtering
-    print(" - Filtering")
-    df = filter_data(df)
+    # Filtering is done while reading the files
+    print(f" - Filtering: frame > {min_frame}, kappa < {max_kappa}, etot < 0 and go < 0")
+    cuts = data_cuts(min_frame, max_kappa)
+    if max_memory is not None:
+        prepare_chunks(path, base_pairing, base_stacking, fmt, cuts, compact, drop_unused, max_memory)
+        if frame_index:
+            index_kappas(select_kappas(path, base_pairing, base_stacking, cuts=cuts))
+        return
+    df = get_input_data(path, base_pairing, base_stacking, workers=workers, cache=cache, cuts=cuts,
+                        compact=compact, drop_unused=drop_unused, frame_index=frame_index)
     
     # Make sure the dataset was correctly filled
     assert (len(df[df['baseP'].isna()]) == 0 and len(df[df['baseS'].isna()]) == 0), "Found NaN entries in the DataFrame! Please, check your number of base-pairs/base-stacking."
     
-    # Save dataset
+    # Save dataset and the statistics of each kappa
     print(" - Saving")
-    save_transformed(df, path=path, name='Full_Trajectory')
\ No newline at end of file
+    save_transformed(df, path=path, name='Full_Trajectory', fmt=fmt)
+    save_moments(output_file(path, 'Full_Trajectory', fmt), moments(drop_overflowed(df)))
+
+def prepare_chunks(path, base_pairing=-1, base_stacking=-1, fmt='csv', cuts=None, compact=False,
+                   drop_unused=False, max_memory='8G', name='Full_Trajectory'):
+    """
+        Prepares the inputs in chunks, streaming the records from the files
+        to the output, so the memory used does not depend on the size of the
+        project. The output is the same as the one saved by prepare_inputs.
+        Parameters
+        ----------
+        path : string
+            Input and output folder
+        base_pairing : int
+            Number of base-pairing
+        base_stacking : int
+            Number of base-stacking
+        fmt : string
+            Output format: 'csv', 'parquet' or 'feather'
+        cuts : list(tuple)
+            The (column, operator, value) cuts applied while reading
+        compact : bool
+            Whether to use the compact column types
+        drop_unused : bool
+            Whether to drop the columns not used by the UML and DNN approaches
+        max_memory : int or string
+            Memory budget (e.g. '8G')
+        name : string
+            Name of the output file
+    """
+    block_size = max(parse_size(max_memory)//MEMORY_FACTOR, MIN_BLOCK)
+    print(f" - Chunked mode: {block_size/1024**2:.1f} MB of text per chunk")
+    check_format(fmt)
+    runs = select_kappas(path, base_pairing, base_stacking, cuts=cuts)
+    full_path = output_file(path, name, fmt)
+
+    # The statistics of each kappa are merged over its chunks
+    shards = {}
+    tmp = temp_file(full_path)
+    table = open_table(tmp, fmt)
+    try:
+        try:
+            for k, files in runs.items():
+                for df in iter_kappa(files, k, base_pairing, base_stacking, block_size, cuts, compact, drop_unused):
+                    # Make sure the dataset was correctly filled
+                    assert (len(df[df['baseP'].isna()]) == 0 and len(df[df['baseS'].isna()]) == 0), "Found NaN entries in the DataFrame! Please, check your number of base-pairs/base-stacking."
+                    df = drop_overflowed(df)
+                    append_table(table, df)
+                    for key, shard in moments(df).items():
+                        shards[key] = merge_moments([shards[key], shard]) if key in shards else shard
+            if table['file'] is None and table['writer'] is None:
+                # No records were read: the table only has the columns of
+                # the first kappa, as prepare_inputs saves it
+                k, files = next(iter(runs.items()))
+                append_table(table, empty_kappa(files, k, base_pairing, base_stacking, compact, drop_unused))
+        finally:
+            close_table(table)
+        os.replace(tmp, full_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    save_moments(full_path, shards)
+    print(f" - Saved {table['rows']} entries")
+
+def find_projects(paths):
+    """
+        Returns the project directories given as a list of paths or glob
+        patterns, e.g. ['data/P*'].
+        Parameters
+        ----------
+        paths : list(String)
+            Paths or glob patterns
+
+        Returns
+        ----------
+        projects : list(String)
+            The existing directories, in the given order and without repetitions
+    """
+    projects = []
+    for pattern in [paths] if isinstance(paths, str) else paths:
+        for path in sorted(glob.glob(pattern)):
+            if os.path.isdir(path) and path not in projects:
+                projects.append(path)
+    return projects
+
+def prepare_batch(paths, base_pairing=-1, base_stacking=-1, workers=1, fmt='csv', cache=False,
+                  min_frame=2000, max_kappa=50, compact=False, drop_unused=False, frame_index=False):
+    """
+        Prepares the inputs of several projects at once. The kappas of all of
+        the projects are read by a single pool of workers, and each project
+        is saved as soon as all of its kappas are read.
+        Parameters
+        ----------
+        paths : list(string)
+            Project directories (or kappa-scan roots), or glob patterns
+        base_pairing : int
+            Number of base-pairing
+        base_stacking : int
+            Number of base-stacking
+        workers : int
+            Number of processes reading the kappas in parallel
+        fmt : string
+            Output format: 'csv', 'parquet' or 'feather'
+        cache : bool
+            Whether to keep the parsed kappas in the cache of each project
+        min_frame : int
+            Frames up to this one are removed
+        max_kappa : int
+            Kappas from this one on are removed
+        compact : bool
+            Whether to use the compact column types
+        drop_unused : bool
+            Whether to drop the columns not used by the UML and DNN approaches
+        frame_index : bool
+            Whether to save the byte offset of each frame beside the time series
+
+        Returns
+        ----------
+        failed : list(string)
+            The projects that could not be prepared
+    """
+    check_format(fmt)
+    projects = find_projects(paths)
+    print(f" - Projects: {len(projects)}")
+    cuts = data_cuts(min_frame, max_kappa)
+    params = [base_pairing, base_stacking, [list(c) for c in cuts], compact, drop_unused]
+
+    # Files and cached kappas of each project
+    plans, failed = {}, []
+    for path in projects:
+        try:
+            runs = select_kappas(path, base_pairing, base_stacking, cuts=cuts)
+        except (FileExistsError, ValueError) as e:
+            print(f"ERROR: {e}")
+            failed.append(path)
+            continue
+        dfs, index = load_kappas(path, runs, params) if cache else ({}, None)
+        if frame_index:
+            index_kappas({k: runs[k] for k in dfs})
+        plans[path] = {'runs': runs, 'dfs': dfs, 'index': index, 'missing': [k for k in runs if k not in dfs]}
+
+    def finish(path):
+        plan = plans.pop(path)
+        try:
+            if cache:
+                save_kappas(path, plan['index'], plan['runs'], params, {k: plan['dfs'][k] for k in plan['missing']})
+            df = pd.concat([plan['dfs'][k] for k in plan['runs']], copy=False)
+            assert (len(df[df['baseP'].isna()]) == 0 and len(df[df['baseS'].isna()]) == 0), "Found NaN entries in the DataFrame! Please, check your number of base-pairs/base-stacking."
+            save_transformed(df, path=path, name='Full_Trajectory', fmt=fmt)
+            save_moments(output_file(path, 'Full_Trajectory', fmt), moments(drop_overflowed(df)))
+            print(f" - Saved {path}")
+        except Exception as e:
+            print(f"ERROR: {path}: {e}")
+            failed.append(path)
+
+    # All of the kappas share the pool, and the projects are saved as they complete
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for path, plan in plans.items():
+            for k in plan['missing']:
+                args = (plan['runs'][k], k, base_pairing, base_stacking, 1, cuts, compact, drop_unused,
+                        path if cache else None, frame_index)
+                futures[pool.submit(read_kappa, *args)] = (path, k)
+        pending = {path: len(plan['missing']) for path, plan in plans.items()}
+        for path in [p for p, n in pending.items() if n == 0]:
+            finish(path)
+        for future in as_completed(futures):
+            path, k = futures[future]
+            if path not in plans:
+                continue
+            try:
+                plans[path]['dfs'][k] = future.result()
+            except Exception as e:
+                print(f"ERROR: {path}: {e}")
+                failed.append(path)
+                plans.pop(path)
+                continue
+            pending[path] -= 1
+            if pending[path] == 0:
+                finish(path)
+    return failed
+
+def update_inputs(path, base_pairing=-1, base_stacking=-1, initial="output_k", name='Live_Trajectory'):
+    """
+        Appends the records written to the running time series since the last
+        call to the live trajectory of the project. The position reached in
+        each file is kept in the project directory, so only the new complete
+        records are parsed.
+        The replicas of a kappa (e.g. output_k14_r2.ts) get a 'replica' column.
+        Only the time series files (.ts, optionally compressed) are read.
+        Parameters
+        ----------
+        path : String
+            Project directory, with the time series being written
+        base_pairing : Int
+            Average number of base-pairing, if passed
+        base_stacking : Int
+            Average number of base-stacking, if passed. If not passed, the
+            records are only appended once their frames are in bases_k*.csv.
+        initial : String
+            The prefix of the time series files
+        name : String
+            Name of the live trajectory file
+
+        Returns
+        ----------
+        n : Int
+            Number of entries appended, after filtering
+    """
+    state_file = f"{path}/.{name}.json"
+    store = f"{path}/{name}.csv"
+    state = {}
+    if os.path.exists(state_file):
+        with open(state_file, 'r') as f:
+            state = json.load(f)
+
+    files = {file_run(f, initial): [f] for f in os.listdir(path) if is_ts(f)}
+    files.pop(None, None)
+    replicas = any(parse_run(r)[1] is not None for r in files)
+
+    appended = 0
+    for run, (file,) in sort_runs(files).items():
+        kappa, replica = parse_run(run)
+        fn = f"{path}/{file}"
+        entry = state.get(file, {'offset': 0, 'frames': 0})
+        if not is_compressed(fn) and os.path.getsize(fn) < entry['offset']:
+            print(f"Warning: {fn} was truncated, reading it from the beginning.")
+            entry = {'offset': 0, 'frames': 0}
+        with open_ts(fn) as ts_file:
+            try:
+                read_header(ts_file)
+            except ValueError:
+                # Header not written yet
+                continue
+        df1, record_offsets, end = read_new_records(fn, entry['offset'])
+        df1['frame'] = range(entry['frames'], entry['frames'] + len(df1))
+        df1['kapa'] = int(kappa)
+        if replicas:
+            df1['replica'] = replica
+        if base_pairing < 0 or base_stacking < 0:
+            # Hold the records whose bases were not computed yet
+            fn2 = find_file(f"{path}/bases_k{file_run(file, initial)}.csv")
+            df2 = read_bases(fn2) if os.path.exists(fn2) else None
+            n = 0 if df2 is None or len(df2) == 0 else int((df1['frame'] <= df2['frame'].max()).sum())
+            if n < len(df1):
+                end = int(record_offsets[n])
+                df1 = df1.iloc[:n]
+            if df2 is not None:
+                df1 = join_bases(df1, df2)
+        if base_pairing > 0:
+            df1['baseP'] = base_pairing
+        if base_stacking > 0:
+            df1['baseS'] = base_stacking
+        state[file] = {'offset': end, 'frames': entry['frames'] + len(df1)}
+
+        df1 = filter_data(df1)
+        if len(df1) > 0:
+            # The runs without a replica suffix are replica 0 once one appears
+            append_csv(store, df1, fill={'replica': 0})
+            appended += len(df1)
+
+    tmp = f"{state_file}.{os.getpid()}"
+    with open(tmp, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp, state_file)
+    return appended
+
+
+def follow_inputs(path, base_pairing=-1, base_stacking=-1, initial="output_k", name='Live_Trajectory',
+                  interval=60, iterations=None, callback=None):
+    """
+        Main function to follow the dynamic fitting while it is running. The
+        new records are periodically appended to the live trajectory, which
+        can be used by the UML and DNN approaches as Full_Trajectory.
+        Parameters
+        ----------
+        path : string
+            Project directory, with the time series being written
+        base_pairing : int
+            Number of base-pairing
+        base_stacking : int
+            Number of base-stacking
+        initial : string
+            The prefix of the time series files
+        name : string
+            Name of the live trajectory file
+        interval : float
+            Seconds between updates
+        iterations : int
+            Number of updates, or None to follow until interrupted
+        callback : function
+            Function called with the live trajectory file after each update
+            that appended entries
+    """
+    print(f" - Following files from: {path}")
+    i = 0
+    try:
+        while iterations is None or i < iterations:
+            n = update_inputs(path, base_pairing, base_stacking, initial, name)
+            print(f"   + {n} new entries")
+            if n > 0 and callback is not None:
+                callback(f"{path}/{name}.csv")
+            i += 1
+            if iterations is None or i < iterations:
+                time.sleep(interval)
+    except KeyboardInterrupt:
+        print(" - Stopped")
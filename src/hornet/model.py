@@ -17,6 +17,8 @@ from tensorflow.keras.layers import Dense, Dropout, AlphaDropout
 from tensorflow.keras.optimizers import Adam
 from keras.regularizers import l2
 
+from hornet.storage import read_table
+
 built_feat = [
     'cc7xEtot'
 ]
@@ -39,12 +41,16 @@ BP = 'baseP'
 BS = 'baseS'
 RG = 'radg'
 KP = 'kapa'
+REP = 'replica'
 LOSS = 'mse'
 
+# Columns read from the datasets. The replica column is only found in projects with replicas.
+read_cols = [f for f in feat if f not in built_feat] + etot_sum + [BP, BS, KP, REP, 'frame', target]
+
 mse_loss = tf.keras.losses.MeanSquaredError()
 huber_loss = tf.keras.losses.Huber()
 
-def read_data(dataset, n_residues, min_frame, max_kappa):
+def read_data(dataset, n_residues, min_frame, max_kappa, columns=None):
     """
         Returns a DataFrame containing all of the dataset included in training.
         Parameters
@@ -57,6 +63,8 @@ def read_data(dataset, n_residues, min_frame, max_kappa):
             Minimum frame cut 
         max_kappa: int
             Maximum accepted kappa 
+        columns: Array(string)
+            Columns to be loaded, or None to load all of them
   
         Returns
         ----------
@@ -66,7 +74,7 @@ def read_data(dataset, n_residues, min_frame, max_kappa):
     dfs = []
     for i in range(len(dataset)):
         print(f"   + {dataset[i]}")
-        df_i = pd.read_csv(dataset[i])
+        df_i = read_table(dataset[i], columns=columns)
         df_i = clean_data(df_i, min_frame, max_kappa)
         df_i = normalize(df_i, n_residues[i])
         df_i = featurize(df_i)
@@ -127,8 +135,11 @@ def normalize(df, n_residues):
     n_beads = n_residues*3
     for j in norm_by_size:
         df[j] = df[j]/n_beads
+    # The kappas of compact tables are integers, so the product is done in
+    # floating point to avoid wrapping around
+    kappa = df[KP].astype('float64')
     for j in norm_by_kappa:
-        df[j] = df[j]/(n_beads*df[KP])
+        df[j] = df[j]/(n_beads*kappa)
     for j in norm_by_base_pairs:
         df[j] = df[j]/df[BP]
     for j in norm_by_base_stacking:
@@ -372,7 +383,7 @@ def train(
 
     # Read datasets from argument
     print("\n - Reading training data")
-    df = read_data(dataset,n_residues,min_frame,max_kappa)
+    df = read_data(dataset,n_residues,min_frame,max_kappa,read_cols)
     mean, sigma = extract_mean_and_sigma(df,output_folder)
     df = standardize(df,mean,sigma)
     df = df[all_feat]
@@ -384,7 +395,7 @@ def train(
     # If user inserted a validation set
     if (validation != ""):
         print("\n - Reading validation data")
-        df_val = read_data([validation],[validation_residues],min_frame,max_kappa)
+        df_val = read_data([validation],[validation_residues],min_frame,max_kappa,read_cols)
         df_val = standardize(df_val,mean,sigma)
         df_val = df_val[all_feat]
         print(f"   > Shape of validation data: {df_val.shape}")
@@ -482,16 +493,17 @@ def predict(
             Maximum accepted kappa
     """
 
+    name = os.path.splitext(dataset.split('/')[-1])[0]
     print("\n - Setting up")
     print(f"   Output folder: {output_folder}")
-    print(f"   Predictions will be stored at {output_folder}/{dataset.split('/')[-1][:-4]}_prediction.csv.")
+    print(f"   Predictions will be stored at {output_folder}/{name}_prediction.csv.")
 
     if (not os.path.exists(output_folder)):
         f"   Creating output folder"
         os.system(f"mkdir {output_folder}")
 
     print("\n - Reading data")
-    df = read_data([dataset],[n_residues],min_frame,max_kappa)
+    df = read_data([dataset],[n_residues],min_frame,max_kappa,read_cols)
     mean, sigma = retrieve_mean_and_sigma(model_location)
     df = standardize(df,mean,sigma)
     print(f"   > Shape of data: {df.shape}")
@@ -504,12 +516,12 @@ def predict(
 
     print("\n - Evaluate Predictions")
     df['prediction'] = model.predict(X)
-    cols = ['frame','kapa','prediction']
+    cols = ['frame','kapa','prediction'] if REP not in df.columns else ['frame','kapa',REP,'prediction']
 
-    df[cols].to_csv(f"{output_folder}/{dataset.split('/')[-1][:-4]}_prediction.csv",index=False)
-    print(f"   Predictions stored at {output_folder}/{dataset.split('/')[-1][:-4]}_prediction.csv.")
+    df[cols].to_csv(f"{output_folder}/{name}_prediction.csv",index=False)
+    print(f"   Predictions stored at {output_folder}/{name}_prediction.csv.")
     
     df = df.sort_values(by=['prediction'], ascending=True)
     n_top = 10
-    df[cols].iloc[:n_top].to_csv(f"{output_folder}/{dataset.split('/')[-1][:-4]}_Top{n_top}.csv",index=False)
-    print(f"   Top {n_top} predictions stored at {output_folder}/{dataset.split('/')[-1][:-4]}_Top{n_top}.csv.")
\ No newline at end of file
+    df[cols].iloc[:n_top].to_csv(f"{output_folder}/{name}_Top{n_top}.csv",index=False)
+    print(f"   Top {n_top} predictions stored at {output_folder}/{name}_Top{n_top}.csv.")
\ No newline at end of file
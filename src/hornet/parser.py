@@ -0,0 +1,615 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Author:
+        Maximilia F. S. Degenhardt <frazaodesouzam2@nih.gov>
+        Hermann F. Degenhardt <degenhardthf@nih.gov>
+"""
+import os, io, gzip, lzma
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+# Size of the blocks read from the time series files
+BLOCK_SIZE = 16*1024*1024
+
+# Names used by HORNET for the columns declared in the '#unit' line
+UNIT_NAMES = {'qscore': ' qscore', 'rmsd': 'rmsd_C', 'stack_rna': 'stack'}
+
+HASH, NEWLINE, STAR = ord('#'), ord('\n'), ord('*')
+RECORD = b'#all'
+
+# Extensions of the compressed files, which are decompressed while parsing
+COMPRESSED = ['.gz', '.xz', '.zst']
+
+# Operators accepted in the cuts
+OPERATORS = {
+    '<': np.less, '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal,
+    '==': np.equal, '!=': np.not_equal}
+
+def is_compressed(filename):
+    """
+        Returns whether a file is compressed, based on its extension.
+        Parameters
+        ----------
+        filename : String
+            File to be checked
+
+        Returns
+        ----------
+        compressed : Bool
+            True for the extensions in COMPRESSED
+    """
+    return os.path.splitext(filename)[1] in COMPRESSED
+
+def is_ts(filename):
+    """
+        Returns whether a file is a time series, optionally compressed, based
+        on its extension.
+        Parameters
+        ----------
+        filename : String
+            File to be checked
+
+        Returns
+        ----------
+        ts : Bool
+            True for '.ts' files and their compressed versions
+    """
+    if is_compressed(filename):
+        filename = os.path.splitext(filename)[0]
+    return filename.endswith('.ts')
+
+def open_ts(filename):
+    """
+        Opens a time series in binary mode. Compressed files are decompressed
+        as they are read, without writing the decompressed file.
+        Parameters
+        ----------
+        filename : String
+            Time series file, optionally compressed with gzip (.gz), xz (.xz)
+            or zstandard (.zst)
+
+        Returns
+        ----------
+        ts_file : File
+            File object with the decompressed content
+    """
+    ext = os.path.splitext(filename)[1]
+    if ext == '.gz':
+        return gzip.open(filename, 'rb')
+    if ext == '.xz':
+        return lzma.open(filename, 'rb')
+    if ext == '.zst':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("Reading .zst files requires the zstandard package (pip install hornet[zstd]).")
+        return io.BufferedReader(zstandard.open(filename, "rb"))
+    return open(filename, 'rb')
+
+def read_header(ts_file):
+    """
+        Reads the header of a CafeMol time series, up to the '#unit' line,
+        and returns the column names.
+        Parameters
+        ----------
+        ts_file : File
+            Time series file opened in binary mode. It is left positioned at
+            the line after '#unit'.
+
+        Returns
+        ----------
+        columns : list(String)
+            Names of the columns of the '#all' records
+    """
+    for line in iter(ts_file.readline, b''):
+        if line.startswith(b'#unit'):
+            return [UNIT_NAMES.get(c, c) for c in line.decode().split()[1:]]
+    raise ValueError("No '#unit' line found in the time series header.")
+
+def iter_blocks(ts_file, block_size=BLOCK_SIZE, size=None):
+    """
+        Yields line-aligned blocks of bytes from a file.
+        Parameters
+        ----------
+        ts_file : File
+            File opened in binary mode
+        block_size : Int
+            Approximate number of bytes per block
+        size : Int
+            Number of bytes to read from the current position, or None to
+            read up to the end of the file
+
+        Returns
+        ----------
+        block : bytes
+            Block of complete lines
+    """
+    rest = b''
+    while size is None or size > 0:
+        data = ts_file.read(block_size if size is None else min(block_size, size))
+        if not data:
+            break
+        if size is not None:
+            size -= len(data)
+        data = rest + data
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            rest = data
+            continue
+        rest = data[end:]
+        yield data[:end]
+    if rest:
+        yield rest
+
+def find_records(text):
+    """
+        Finds the lines of a block and which of them are '#all' records.
+        Lines with overflowed fields ('*') are not valid.
+        Parameters
+        ----------
+        text : ndarray
+            Block of complete lines, as an array of bytes
+
+        Returns
+        ----------
+        starts : ndarray
+            Position of the first byte of each line
+        lengths : ndarray
+            Length of each line, without the line break
+        records : ndarray
+            Boolean array, True for the lines that are valid records
+        last_record : Bool
+            Whether the last valid '#' line of the block is a record, or None
+            if the block has no valid '#' line
+    """
+    ends = np.flatnonzero(text == NEWLINE)
+    if len(ends) == 0 or ends[-1] != len(text) - 1:
+        ends = np.append(ends, len(text))
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    lengths = ends - starts
+
+    # Lines starting with '#' and without overflowed fields
+    padded = np.append(text, np.zeros(len(RECORD), dtype=np.uint8))
+    hashed = padded[starts] == HASH
+    hashed[np.searchsorted(ends, np.flatnonzero(text == STAR))] = False
+    valid = np.flatnonzero(hashed)
+    last_record = None
+
+    # Records are the valid lines starting with '#all'
+    records = hashed & (lengths >= len(RECORD))
+    for i, c in enumerate(RECORD[1:], 1):
+        records &= padded[starts + i] == c
+    if len(valid) > 0:
+        last_record = bool(records[valid[-1]])
+    return starts, lengths, records, last_record
+
+def record_values(text, starts, lengths, records):
+    """
+        Returns the fields of the '#all' records of a block of lines.
+        Parameters
+        ----------
+        text : ndarray
+            The bytes of the block
+        starts : ndarray
+            Position of the first byte of each line
+        lengths : ndarray
+            Length of each line
+        records : ndarray
+            Whether each line is a record
+
+        Returns
+        ----------
+        values : ndarray
+            The fields of all of the records, one after the other
+        n_records : Int
+            Number of records
+    """
+    # Keep the record lines without their prefix
+    mask = np.repeat(records, lengths + 1)[:len(text)]
+    for i in range(len(RECORD)):
+        mask[starts[records] + i] = False
+    values = np.fromstring(text[mask].tobytes(), dtype=np.float64, sep=' ')
+    return values, np.count_nonzero(records)
+
+def parse_block(block, n_columns, offsets=False):
+    """
+        Parses the '#all' records of a block of lines into a float array.
+        Lines with overflowed fields ('*') are dropped.
+        Parameters
+        ----------
+        block : bytes
+            Block of complete lines from a time series
+        n_columns : Int
+            Number of fields in each record
+        offsets : Bool
+            Whether to also return the position of each record in the block
+
+        Returns
+        ----------
+        values : ndarray
+            Array of shape (records, n_columns)
+        last_record : Bool
+            Whether the last valid '#' line of the block is a record, or None
+            if the block has no valid '#' line
+        record_offsets : ndarray
+            Position of the first byte of each record, if offsets is True
+    """
+    text = np.frombuffer(block, dtype=np.uint8)
+    starts, lengths, records, last_record = find_records(text)
+    values, n_records = record_values(text, starts, lengths, records)
+    if values.size != n_records*n_columns and len(records) > 0 and records[-1] and not block.endswith(b'\n'):
+        # The unterminated last line of a file still being written, or of a
+        # killed run, is dropped, as the last '#' line always is
+        records[-1] = False
+        last_record = False
+        values, n_records = record_values(text, starts, lengths, records)
+    if values.size != n_records*n_columns:
+        raise ValueError(f"Malformed '#all' records: expected {n_columns} fields per record.")
+    if offsets:
+        return values.reshape(n_records, n_columns), last_record, starts[records]
+    return values.reshape(n_records, n_columns), last_record
+
+def stack_blocks(blocks, n_columns):
+    """
+        Returns the parsed blocks stacked in a single array, avoiding the copy
+        when there is only one block.
+        Parameters
+        ----------
+        blocks : list(ndarray)
+            Arrays of shape (records, n_columns)
+        n_columns : Int
+            Number of fields in each record
+
+        Returns
+        ----------
+        values : ndarray
+            Array of shape (records, n_columns)
+    """
+    if len(blocks) == 0:
+        return np.empty((0, n_columns))
+    if len(blocks) == 1:
+        return blocks[0]
+    return np.concatenate(blocks)
+
+def split_ts(filename, n_ranges):
+    """
+        Splits the records of a CafeMol time series into line-aligned byte
+        ranges of similar size. Compressed files can not be split, so they
+        have a single range.
+        Parameters
+        ----------
+        filename : String
+            Time series file
+        n_ranges : Int
+            Number of ranges
+
+        Returns
+        ----------
+        columns : list(String)
+            Names of the columns of the '#all' records
+        ranges : list(tuple)
+            The (start, end) byte offsets of each range. The end is None
+            when the range goes up to the end of a compressed file.
+    """
+    if is_compressed(filename):
+        with open_ts(filename) as ts_file:
+            columns = read_header(ts_file)
+            return columns, [(ts_file.tell(), None)]
+
+    with open(filename, 'rb') as ts_file:
+        columns = read_header(ts_file)
+        start = ts_file.tell()
+        end = os.fstat(ts_file.fileno()).st_size
+        bounds = [start]
+        for i in range(1, max(n_ranges, 1)):
+            position = max(start + (end - start)*i//n_ranges, bounds[-1])
+            if position > start:
+                # Move to the beginning of the next line
+                ts_file.seek(position - 1)
+                ts_file.readline()
+                position = ts_file.tell()
+            bounds.append(position)
+        bounds.append(end)
+    ranges = [(a, b) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+    return columns, ranges
+
+def cut_mask(values, cuts):
+    """
+        Returns which records pass all of the cuts.
+        Parameters
+        ----------
+        values : ndarray
+            Array of shape (records, columns)
+        cuts : list(tuple)
+            The (column index, operator, value) cuts, with operators from
+            OPERATORS
+
+        Returns
+        ----------
+        mask : ndarray
+            Boolean array with one entry per record
+    """
+    mask = np.ones(len(values), dtype=bool)
+    for column, op, value in cuts:
+        mask &= OPERATORS[op](values[:, column], value)
+    return mask
+
+def parse_range(filename, start, end, n_columns, block_size=BLOCK_SIZE, cuts=None):
+    """
+        Parses the '#all' records within a line-aligned byte range.
+        Parameters
+        ----------
+        filename : String
+            Time series file
+        start : Int
+            First byte of the range
+        end : Int
+            Byte after the end of the range, or None to parse up to the end
+            of the file
+        n_columns : Int
+            Number of fields in each record
+        block_size : Int
+            Approximate number of bytes parsed at a time
+        cuts : list(tuple)
+            The (column index, operator, value) cuts applied to each block, or
+            None to keep all of the records
+
+        Returns
+        ----------
+        values : ndarray
+            Array of shape (records kept, n_columns)
+        last_record : Bool
+            Whether the last valid '#' line of the range is a record, or None
+            if the range has no valid '#' line
+        n_records : Int
+            Number of records in the range, including the ones cut
+        rows : ndarray
+            Position of the records kept within the range, or None if there
+            are no cuts
+    """
+    blocks, rows, last_record, n_records = [], [], None, 0
+    with open_ts(filename) as ts_file:
+        if is_compressed(filename):
+            # Compressed streams are not seekable, the range starts after the header
+            read_header(ts_file)
+        else:
+            ts_file.seek(start)
+        for block in iter_blocks(ts_file, block_size, None if end is None else end - start):
+            values, last = parse_block(block, n_columns)
+            if cuts is not None:
+                mask = cut_mask(values, cuts)
+                rows.append(np.flatnonzero(mask) + n_records)
+                n_records += len(values)
+                values = values[mask]
+            else:
+                n_records += len(values)
+            blocks.append(values)
+            if last is not None:
+                last_record = last
+    if cuts is None:
+        rows = None
+    else:
+        rows = np.concatenate(rows) if len(rows) > 0 else np.empty(0, dtype=np.int64)
+    return stack_blocks(blocks, n_columns), last_record, n_records, rows
+
+def read_ts(filename, block_size=BLOCK_SIZE, workers=1, cuts=None):
+    """
+        Returns the '#all' records from a CafeMol time series. As in the
+        original reader, records with overflowed fields ('*') are dropped and
+        the last '#' line of the file is discarded.
+        Parameters
+        ----------
+        filename : String
+            Time series file, optionally compressed (see open_ts)
+        block_size : Int
+            Approximate number of bytes parsed at a time
+        workers : Int
+            Number of processes parsing byte ranges of the file in parallel.
+            Compressed files are parsed by a single process.
+        cuts : list(tuple)
+            The (column, operator, value) cuts applied while parsing, e.g.
+            ('etot', '<', 0). The column 'frame' refers to the position of the
+            record in the file. Cuts on other columns are ignored.
+
+        Returns
+        ----------
+        df : DataFrame
+            The records, one column per '#unit' field. The index is the
+            position of each record in the file (the frame).
+    """
+    columns, ranges = split_ts(filename, workers)
+    row_cuts = None
+    if cuts is not None:
+        row_cuts = [(columns.index(c), op, v) for c, op, v in cuts if c in columns]
+    args = [(filename, start, end, len(columns), block_size, row_cuts) for start, end in ranges]
+    if workers > 1 and len(ranges) > 1:
+        with ProcessPoolExecutor(max_workers=len(ranges)) as pool:
+            results = list(pool.map(parse_range, *zip(*args)))
+    else:
+        results = [parse_range(*a) for a in args]
+
+    # Stitch the ranges back in the order of the file
+    values = stack_blocks([r[0] for r in results], len(columns))
+    last_record = [r[1] for r in results if r[1] is not None]
+    n_records = sum(r[2] for r in results)
+    if len(last_record) > 0 and last_record[-1]:
+        n_records -= 1
+    if cuts is None:
+        return pd.DataFrame(values[:n_records], columns=columns)
+
+    # Position of the records kept in the whole file
+    first = np.cumsum([0] + [r[2] for r in results[:-1]])
+    rows = np.concatenate([r[3] + f for r, f in zip(results, first)]) if len(results) > 0 else np.empty(0, dtype=np.int64)
+    mask = rows < n_records
+    for c, op, v in cuts:
+        if c == 'frame':
+            mask &= OPERATORS[op](rows, v)
+    return pd.DataFrame(values[mask], columns=columns, index=rows[mask])
+
+def iter_ts(filename, block_size=BLOCK_SIZE, cuts=None):
+    """
+        Yields the '#all' records from a CafeMol time series block by block,
+        so that the file is never fully loaded. The records are the same as
+        the ones returned by read_ts.
+        Parameters
+        ----------
+        filename : String
+            Time series file, optionally compressed (see open_ts)
+        block_size : Int
+            Approximate number of bytes parsed at a time
+        cuts : list(tuple)
+            The (column, operator, value) cuts applied to each block, as in
+            read_ts
+
+        Returns
+        ----------
+        df : DataFrame
+            The records of a block, indexed by their position in the file
+    """
+    with open_ts(filename) as ts_file:
+        columns = read_header(ts_file)
+        row_cuts, frame_cuts = [], []
+        if cuts is not None:
+            row_cuts = [(columns.index(c), op, v) for c, op, v in cuts if c in columns]
+            frame_cuts = [(op, v) for c, op, v in cuts if c == 'frame']
+
+        # The last record parsed is held until another '#' line shows it is
+        # not the last one of the file
+        held, n_records = None, 0
+        for block in iter_blocks(ts_file, block_size):
+            values, last = parse_block(block, len(columns))
+            rows = np.arange(n_records, n_records + len(values))
+            n_records += len(values)
+            if held is not None and last is not None:
+                values = np.concatenate([held[0], values])
+                rows = np.concatenate([held[1], rows])
+                held = None
+            if last:
+                held = (values[-1:], rows[-1:])
+                values, rows = values[:-1], rows[:-1]
+            if len(values) == 0:
+                continue
+
+            mask = cut_mask(values, row_cuts)
+            for op, v in frame_cuts:
+                mask &= OPERATORS[op](rows, v)
+            yield pd.DataFrame(values[mask], columns=columns, index=rows[mask])
+
+def index_ts(filename, block_size=BLOCK_SIZE):
+    """
+        Returns the position of each record of a CafeMol time series, so that
+        frame i starts at byte index[i]. Only the lines are classified, the
+        fields are not parsed. The frames are the ones returned by read_ts.
+        Parameters
+        ----------
+        filename : String
+            Time series file, not compressed
+        block_size : Int
+            Approximate number of bytes read at a time
+
+        Returns
+        ----------
+        index : ndarray
+            The int64 byte offset of each frame
+    """
+    if is_compressed(filename):
+        raise ValueError(f"Compressed files can not be indexed: {filename}")
+    positions, last_record = [], None
+    with open(filename, 'rb') as ts_file:
+        read_header(ts_file)
+        position = ts_file.tell()
+        for block in iter_blocks(ts_file, block_size):
+            starts, _, records, last = find_records(np.frombuffer(block, dtype=np.uint8))
+            positions.append(starts[records] + position)
+            position += len(block)
+            if last is not None:
+                last_record = last
+    index = np.concatenate(positions).astype(np.int64) if len(positions) > 0 else np.empty(0, dtype=np.int64)
+    return index[:-1] if last_record else index
+
+def read_frames(filename, frames, index):
+    """
+        Returns some records of a CafeMol time series, reading only their
+        lines from the file.
+        Parameters
+        ----------
+        filename : String
+            Time series file, not compressed
+        frames : list(Int)
+            The frames to be read
+        index : ndarray
+            The byte offset of each frame, as returned by index_ts
+
+        Returns
+        ----------
+        df : DataFrame
+            The records, one column per '#unit' field, indexed by frame and
+            sorted
+    """
+    frames = np.unique(np.asarray(frames, dtype=np.int64))
+    if len(frames) > 0 and (frames[0] < 0 or frames[-1] >= len(index)):
+        raise IndexError(f"Frames out of range: the file has {len(index)} frames.")
+
+    # Consecutive frames are read at once
+    splits = np.flatnonzero(np.diff(frames) != 1) + 1
+    blocks = []
+    with open(filename, 'rb') as ts_file:
+        columns = read_header(ts_file)
+        for run in np.split(frames, splits) if len(frames) > 0 else []:
+            ts_file.seek(index[run[0]])
+            block = ts_file.read(index[run[-1]] - index[run[0]]) + ts_file.readline()
+            values = parse_block(block, len(columns))[0]
+            if len(values) != len(run):
+                raise ValueError(f"The index of {filename} does not match the file.")
+            blocks.append(values)
+    return pd.DataFrame(stack_blocks(blocks, len(columns)), columns=columns, index=frames)
+
+def read_new_records(filename, offset=0, block_size=BLOCK_SIZE):
+    """
+        Returns the complete '#all' records appended to a CafeMol time series
+        after a given position. A trailing line still being written is left
+        for the next call. Unlike read_ts, the last record is kept.
+        For compressed files, the positions are in the decompressed content.
+        Parameters
+        ----------
+        filename : String
+            Time series file, optionally compressed
+        offset : Int
+            Position from which to read, usually the end offset returned by
+            the previous call, or 0 to read from the beginning
+        block_size : Int
+            Approximate number of bytes parsed at a time
+
+        Returns
+        ----------
+        df : DataFrame
+            The new records, one column per '#unit' field
+        record_offsets : ndarray
+            Position of the first byte of each record in the file
+        end : Int
+            Position after the last complete line
+    """
+    blocks, positions = [], []
+    with open_ts(filename) as ts_file:
+        columns = read_header(ts_file)
+        end = max(offset, ts_file.tell())
+        # Compressed files are decompressed up to the offset, and read up to
+        # the end of the data flushed so far
+        size = None if is_compressed(filename) else os.fstat(ts_file.fileno()).st_size - end
+        ts_file.seek(end)
+        try:
+            for block in iter_blocks(ts_file, block_size, size):
+                if not block.endswith(b'\n'):
+                    break
+                values, _, record_offsets = parse_block(block, len(columns), offsets=True)
+                blocks.append(values)
+                positions.append(record_offsets + end)
+                end += len(block)
+        except EOFError:
+            # Compressed stream still being written
+            pass
+    values = stack_blocks(blocks, len(columns))
+    record_offsets = np.concatenate(positions) if len(positions) > 0 else np.empty(0, dtype=np.int64)
+    return pd.DataFrame(values, columns=columns), record_offsets, end
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Author:
+        Maximilia F. S. Degenhardt <frazaodesouzam2@nih.gov>
+        Hermann F. Degenhardt <degenhardthf@nih.gov>
+"""
+import os, json
+import numpy as np
+import pandas as pd
+
+# Sufficient statistics kept for each column, which can be merged between
+# shards. The sum of squared deviations from the mean (m2) is kept instead of
+# the raw sum of squares, which loses the spread of large values.
+MOMENTS = ['count', 'mean', 'm2', 'min', 'max']
+VERSION = 2
+
+def moments(df, by='kapa'):
+    """
+        Returns the sufficient statistics of the numeric columns of a table,
+        for each of its shards. NaN entries are ignored.
+        Parameters
+        ----------
+        df : DataFrame
+            Table to be summarized
+        by : String
+            Column defining the shards, or None for a single shard
+
+        Returns
+        ----------
+        shards : dictionary
+            For each shard, a dictionary with the MOMENTS of each column
+    """
+    numeric = df.select_dtypes(include='number').astype(np.float64)
+    if by is None:
+        keys = pd.Series('all', index=df.index)
+    else:
+        keys = df[by].astype(str)
+    groups = numeric.groupby(keys)
+    deviations = numeric - groups.transform('mean')
+    summary = {
+        'count': groups.count(), 'mean': groups.mean(), 'm2': (deviations**2).groupby(keys).sum(),
+        'min': groups.min(), 'max': groups.max()}
+    shards = {}
+    for key in summary['count'].index:
+        shards[key] = {c: [float(summary[m].at[key, c]) for m in MOMENTS] for c in numeric.columns}
+    return shards
+
+def merge_moments(shards):
+    """
+        Returns the statistics of the union of several shards. The means and
+        the sums of squared deviations are combined with the pairwise formula
+        of Chan et al.
+        Parameters
+        ----------
+        shards : list(dictionary)
+            The statistics of each shard, with the MOMENTS of each column
+
+        Returns
+        ----------
+        merged : dictionary
+            The MOMENTS of each column over all of the shards
+    """
+    merged = {}
+    for shard in shards:
+        for c, (count, mean, m2, low, high) in shard.items():
+            if c not in merged or merged[c][0] == 0:
+                merged[c] = [count, mean, m2, low, high]
+                continue
+            if count == 0:
+                continue
+            m = merged[c]
+            n = m[0] + count
+            delta = mean - m[1]
+            m[1] += delta*count/n
+            m[2] += m2 + delta*delta*m[0]*count/n
+            m[0] = n
+            m[3] = np.nanmin([m[3], low])
+            m[4] = np.nanmax([m[4], high])
+    return merged
+
+def mean_std(moments, column, ddof=1):
+    """
+        Returns the mean and standard deviation of a column from its
+        statistics, as DataFrame.mean and DataFrame.std would.
+        Parameters
+        ----------
+        moments : dictionary
+            The MOMENTS of each column, e.g. as returned by merge_moments
+        column : String
+            Column name
+        ddof : Int
+            Delta degrees of freedom of the standard deviation
+
+        Returns
+        ----------
+        mean : float
+            Mean of the column
+        std : float
+            Standard deviation of the column
+    """
+    count, mean, m2 = moments[column][:3]
+    if count == 0:
+        return np.nan, np.nan
+    if count <= ddof:
+        return mean, np.nan
+    return mean, np.sqrt(max(m2, 0.)/(count - ddof))
+
+def stats_file(filename):
+    """
+        Returns the name of the statistics sidecar of a table file.
+        Parameters
+        ----------
+        filename : String
+            Table file, e.g. Full_Trajectory.csv
+
+        Returns
+        ----------
+        sidecar : String
+            The sidecar, e.g. Full_Trajectory_stats.json
+    """
+    return os.path.splitext(filename)[0] + '_stats.json'
+
+def save_moments(filename, shards):
+    """
+        Saves the statistics of the shards of a table beside it.
+        Parameters
+        ----------
+        filename : String
+            Table file
+        shards : dictionary
+            The statistics of each shard, as returned by moments
+    """
+    sidecar = stats_file(filename)
+    tmp = f"{sidecar}.{os.getpid()}"
+    with open(tmp, 'w') as f:
+        json.dump({'version': VERSION, 'moments': MOMENTS, 'shards': shards}, f)
+    os.replace(tmp, sidecar)
+
+def load_moments(filename):
+    """
+        Returns the statistics of the shards of a table, if they were saved.
+        Parameters
+        ----------
+        filename : String
+            Table file
+
+        Returns
+        ----------
+        shards : dictionary
+            The statistics of each shard, or None if there is no valid sidecar
+            newer than the table
+    """
+    sidecar = stats_file(filename)
+    if not os.path.exists(sidecar) or os.path.getmtime(sidecar) < os.path.getmtime(filename):
+        return None
+    with open(sidecar, 'r') as f:
+        content = json.load(f)
+    if content.get('version') != VERSION:
+        return None
+    return content['shards']
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Author:
+        Maximilia F. S. Degenhardt <frazaodesouzam2@nih.gov>
+        Hermann F. Degenhardt <degenhardthf@nih.gov>
+"""
+import os
+import numpy as np
+import pandas as pd
+
+# Supported formats and their file extensions
+FORMATS = {'csv': '.csv', 'parquet': '.parquet', 'feather': '.feather'}
+COMPRESSION = 'zstd'
+
+# Compact types of the trajectory columns. Columns not listed keep their type.
+ENERGY_TERMS = [
+    'etot', 'local', 'go', 'repul', 'stack', 'hbond', 'elect', 'afmfit', 'stage',
+    'tempk', 'velet', 'radg', ' qscore', 'rmsd_C']
+SCHEMA = {
+    **{c: 'float32' for c in ENERGY_TERMS},
+    'step': 'int64', 'frame': 'int32', 'kapa': 'int32', 'replica': 'int32',
+    'baseP': 'int32', 'baseS': 'int32', 'native': 'int32', 'Unnamed: 0': 'int32'}
+
+# Trajectory columns that are not used by the UML and DNN approaches
+UNUSED = ['step', 'tempk', 'velet', ' qscore', 'Unnamed: 0']
+
+def parse_size(size):
+    """
+        Returns a number of bytes given as an integer or as a string with a
+        K, M, G or T suffix (e.g. '8G').
+        Parameters
+        ----------
+        size : String
+            Number of bytes
+
+        Returns
+        ----------
+        n_bytes : Int
+            The number of bytes
+    """
+    units = {'K': 1024, 'M': 1024**2, 'G': 1024**3, 'T': 1024**4}
+    text = str(size).strip().upper().rstrip('B')
+    factor = units.get(text[-1:], 1)
+    if text[-1:] in units:
+        text = text[:-1]
+    try:
+        n_bytes = int(float(text)*factor)
+    except ValueError:
+        raise ValueError(f"Invalid size: {size}. Expecting a number of bytes, e.g. 8G or 512M.")
+    if n_bytes <= 0:
+        raise ValueError(f"Invalid size: {size}. Expecting a positive number of bytes.")
+    return n_bytes
+
+def check_format(fmt):
+    """
+        Raises an error if the format is not supported.
+        Parameters
+        ----------
+        fmt : String
+            Format name
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Invalid format: {fmt}. Expecting one of {list(FORMATS.keys())}.")
+
+def detect_format(filename):
+    """
+        Returns the format of a table file based on its leading bytes.
+        Parameters
+        ----------
+        filename : String
+            File to be checked
+
+        Returns
+        ----------
+        fmt : String
+            One of 'parquet', 'feather' or 'csv'
+    """
+    with open(filename, 'rb') as table_file:
+        magic = table_file.read(6)
+    if magic.startswith(b'PAR1'):
+        return 'parquet'
+    if magic == b'ARROW1':
+        return 'feather'
+    return 'csv'
+
+def compact_table(df, drop_unused=False):
+    """
+        Returns a trajectory table with the compact types from SCHEMA.
+        Integer columns holding NaN entries keep their type.
+        Parameters
+        ----------
+        df : DataFrame
+            Trajectory table
+        drop_unused : Bool
+            Whether to also drop the UNUSED columns
+
+        Returns
+        ----------
+        df : DataFrame
+            The table with the compact types
+    """
+    if drop_unused:
+        df = df.drop(columns=UNUSED, errors='ignore')
+    types = {}
+    for c, t in SCHEMA.items():
+        if c in df.columns and df[c].dtype != t:
+            if t.startswith('int') and df[c].isna().any():
+                continue
+            types[c] = t
+    return df.astype(types, copy=False) if len(types) > 0 else df
+
+def read_table(filename, columns=None, compact=False):
+    """
+        Returns the content of a table file in any of the supported formats.
+        Parameters
+        ----------
+        filename : String
+            File to be read
+        columns : list(String)
+            Columns to be loaded, or None to load all of them. Columns that
+            are not in the file are ignored.
+        compact : Bool
+            Whether to convert the columns to the compact types from SCHEMA
+
+        Returns
+        ----------
+        df : DataFrame
+            The table
+    """
+    fmt = detect_format(filename)
+    if fmt == 'csv':
+        usecols = None if columns is None else (lambda c: c in columns)
+        df = pd.read_csv(filename, usecols=usecols)
+        return compact_table(df) if compact else df
+
+    import pyarrow.parquet as pq
+    import pyarrow.feather as pf
+    import pyarrow.ipc as ipc
+    if columns is not None:
+        if fmt == 'parquet':
+            names = pq.read_schema(filename).names
+        else:
+            with ipc.open_file(filename) as reader:
+                names = reader.schema.names
+        columns = [c for c in names if c in columns]
+    if fmt == 'parquet':
+        table = pq.read_table(filename, columns=columns)
+    else:
+        table = pf.read_table(filename, columns=columns)
+    df = table.to_pandas()
+    return compact_table(df) if compact else df
+
+def iter_table(filename, columns=None, rows=1000000):
+    """
+        Yields the content of a table file in chunks of rows, indexed by
+        their position in the file, as read_table would return it.
+        Parameters
+        ----------
+        filename : String
+            File to be read
+        columns : list(String)
+            Columns to be loaded, or None to load all of them. Columns that
+            are not in the file are ignored.
+        rows : Int
+            Maximum number of rows of each chunk
+
+        Returns
+        ----------
+        df : DataFrame
+            A chunk of the table
+    """
+    fmt = detect_format(filename)
+    if fmt == 'csv':
+        usecols = None if columns is None else (lambda c: c in columns)
+        yield from pd.read_csv(filename, usecols=usecols, chunksize=rows)
+        return
+
+    import pyarrow.parquet as pq
+    import pyarrow.ipc as ipc
+    offset = 0
+    if fmt == 'parquet':
+        table = pq.ParquetFile(filename)
+        if columns is not None:
+            columns = [c for c in table.schema_arrow.names if c in columns]
+        batches = table.iter_batches(batch_size=rows, columns=columns)
+    else:
+        reader = ipc.open_file(filename)
+        if columns is not None:
+            columns = [c for c in reader.schema.names if c in columns]
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+    for batch in batches:
+        if columns is not None:
+            batch = batch.select(columns)
+        for start in range(0, batch.num_rows, rows):
+            df = batch.slice(start, rows).to_pandas()
+            df.index = pd.RangeIndex(offset, offset + len(df))
+            offset += len(df)
+            yield df
+
+def write_table(df, filename, fmt='csv'):
+    """
+        Saves a table in one of the supported formats.
+        Parameters
+        ----------
+        df : DataFrame
+            DataFrame to be saved
+        filename : String
+            Output file
+        fmt : String
+            One of 'csv', 'parquet' or 'feather'
+    """
+    check_format(fmt)
+    if fmt == 'csv':
+        df.to_csv(filename, index=False)
+    elif fmt == 'parquet':
+        df.to_parquet(filename, index=False, compression=COMPRESSION)
+    else:
+        df.reset_index(drop=True).to_feather(filename, compression=COMPRESSION)
+
+def open_table(filename, fmt='csv'):
+    """
+        Starts a table file written chunk by chunk with append_table.
+        Parameters
+        ----------
+        filename : String
+            Output file
+        fmt : String
+            One of 'csv', 'parquet' or 'feather'
+
+        Returns
+        ----------
+        table : dictionary
+            The state of the writer, to be passed to append_table and
+            close_table
+    """
+    check_format(fmt)
+    return {'filename': filename, 'fmt': fmt, 'file': None, 'writer': None, 'schema': None, 'rows': 0}
+
+def append_table(table, df):
+    """
+        Appends a chunk to a table file. All of the chunks must have the
+        columns of the first one.
+        Parameters
+        ----------
+        table : dictionary
+            The writer returned by open_table
+        df : DataFrame
+            Chunk to be appended
+    """
+    if table['fmt'] == 'csv':
+        if table['file'] is None:
+            table['file'] = open(table['filename'], 'w', newline='')
+            df.to_csv(table['file'], index=False)
+        else:
+            df.to_csv(table['file'], index=False, header=False)
+        table['rows'] += len(df)
+        return
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import pyarrow.ipc as ipc
+    chunk = pa.Table.from_pandas(df, preserve_index=False, schema=table['schema'])
+    if table['writer'] is None:
+        table['schema'] = chunk.schema
+        if table['fmt'] == 'parquet':
+            table['writer'] = pq.ParquetWriter(table['filename'], chunk.schema, compression=COMPRESSION)
+        else:
+            options = ipc.IpcWriteOptions(compression=COMPRESSION)
+            table['writer'] = ipc.new_file(table['filename'], chunk.schema, options=options)
+    table['writer'].write_table(chunk)
+    table['rows'] += len(df)
+
+def append_csv(filename, df, fill=None):
+    """
+        Appends entries to a CSV table that is extended between runs, keeping
+        the contract of append_table: the rows are written with the columns
+        of the table. Columns missing from the entries are left empty, and
+        the table is rewritten once with the columns it does not have yet.
+        Parameters
+        ----------
+        filename : String
+            CSV table, created with the columns of the entries if missing
+        df : DataFrame
+            Entries to be appended
+        fill : dictionary
+            Value of the new columns in the rows already in the table, if
+            not empty
+    """
+    if not os.path.exists(filename):
+        df.to_csv(filename, index=False)
+        return
+    columns = list(pd.read_csv(filename, nrows=0).columns)
+    new = [c for c in df.columns if c not in columns]
+    if len(new) > 0:
+        table = pd.read_csv(filename)
+        for c in new:
+            table[c] = (fill or {}).get(c, np.nan)
+        tmp = f"{filename}.{os.getpid()}"
+        table.to_csv(tmp, index=False)
+        os.replace(tmp, filename)
+        columns += new
+    df.reindex(columns=columns).to_csv(filename, mode='a', header=False, index=False)
+
+def close_table(table):
+    """
+        Finishes a table file written with append_table.
+        Parameters
+        ----------
+        table : dictionary
+            The writer returned by open_table
+    """
+    if table['file'] is not None:
+        table['file'].close()
+    if table['writer'] is not None:
+        table['writer'].close()
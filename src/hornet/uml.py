@@ -5,20 +5,99 @@ Author:
         Maximilia F. S. Degenhardt <frazaodesouzam2@nih.gov>
         Hermann F. Degenhardt <degenhardthf@nih.gov>
 """
-import os, sys, math
+import os, sys, math, json, tempfile
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import matplotlib.pyplot as plt
 import pandas as pd
 import seaborn as sns
-from copy import deepcopy
 from numpy import diff
 
 from sklearn.preprocessing import StandardScaler
-from sklearn.decomposition import PCA
-from sklearn.cluster import KMeans
+from sklearn.decomposition import PCA, IncrementalPCA
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from threadpoolctl import threadpool_limits
+
+from hornet.parser import OPERATORS
+from hornet.cache import open_stages, next_stages, load_stage, save_stage
+from hornet.stats import moments, load_moments, merge_moments, mean_std
+from hornet.storage import FORMATS, check_format, detect_format, parse_size, read_table, iter_table, write_table, \
+    open_table, append_table, close_table
 
 sns.set(font_scale=1)
 
+# Defaults of the PCA and clustering steps. In headless mode, the number of
+# components covers the VARIANCE fraction of the explained variance, and the
+# number of clusters is the knee of the WCSS curve.
+DEFAULT_COMPONENTS = 8
+DEFAULT_CLUSTERS = 3
+VARIANCE = 0.8
+
+# Methods computing the WCSS curve of the elbow plot, and number of repeated
+# fits giving the confidence band of the 'minibatch' method
+ELBOW_METHODS = ['full', 'bisecting', 'minibatch']
+ELBOW_REPEATS = 5
+
+# Components scores shared by the processes of a parallel WCSS sweep
+ELBOW_DATA = None
+
+# Columns used in the PCA, and attributes of a fitted PCA kept by the cache
+PCA_COLUMNS = ['etot', 'local', 'go', 'repul', 'stack', 'hbond', 'elect', 'afmcc', 'afmfit', 'kapa', 'stage']
+PCA_ATTRIBUTES = [
+    'mean_', 'components_', 'explained_variance_', 'explained_variance_ratio_', 'singular_values_',
+    'noise_variance_', 'n_components_', 'n_features_in_', 'n_samples_']
+
+# Steps of the energy and cohort filters. Each rule (column, operator, k)
+# keeps the entries where the column compares to mean + k*std of the data
+# that reached the step. Other rules can be passed to energy_filter,
+# cluster_filter and uml_analysis.
+ENERGY_RULES = [
+    [('repul', '<', 1.), ('hbond', '<', 3.), ('stage', '<', 4.), ('stack', '<', 2.), ('local', '<', 2.)],
+    [('afmcc', '>', -2.), ('etot', '<', 3.)]]
+COHORT_RULES = [
+    [('go', '<', 0.), ('elect', '>', 1.5), ('local', '<', 3.)],
+    [('etot', '<', -1.), ('afmcc', '>', 0.), ('afmfit', '<', 2.)]]
+
+# Chunked mode: approximate memory used by each row of a chunk, smallest
+# chunk, rows of each MiniBatchKMeans step and default number of rows of the
+# sample used for the WCSS curve
+ROW_BYTES = 1024
+MIN_ROWS = 10000
+MINIBATCH_ROWS = 65536
+CHUNK_SAMPLE = 200000
+
+# Parameter sweep: output files
+SWEEP_SUMMARY = 'UML_sweep.csv'
+SWEEP_OVERLAP = 'UML_sweep_overlap.csv'
+
+# Fitted UML model saved beside the outputs, version of its layout and its
+# arrays. Chunks of 1000000 rows are read when applying it without a budget.
+UML_MODEL = 'UML_model.npz'
+UML_VERSION = 1
+MODEL_ARRAYS = ['scaler_mean', 'scaler_scale', 'pca_mean', 'components', 'variance', 'centers']
+APPLY_ROWS = 1000000
+
+def data_cuts(min_frame=2000, max_kappa=50):
+    """
+        Returns the cuts applied to the data before the analysis.
+        Parameters
+        ----------
+        min_frame : int
+            Frames up to this one are removed
+        max_kappa : int
+            Kappas from this one on are removed
+
+        Returns
+        ----------
+        cuts : list(tuple)
+            The (column, operator, value) cuts
+    """
+    return [
+        ('kapa',  '<', max_kappa),
+        ('frame', '>', min_frame),
+        ('etot',  '<', 0),
+        ('go',    '<', 0)]
+
 def filter_data(df):
     """
         Returns the data filtered by fixed cuts.
@@ -32,10 +111,8 @@ def filter_data(df):
         df : DataFrame
             Filtered dataset
     """
-    df = df[df['kapa']  <   50]
-    df = df[df['frame'] > 2000]
-    df = df[df['etot']  <    0]
-    df = df[df['go']    <    0]
+    for column, op, value in data_cuts():
+        df = df[OPERATORS[op](df[column], value)]
     return df
 
 def create_features(df):
@@ -55,7 +132,201 @@ def create_features(df):
     df['etotPower'] = df['afmccpow']*df['etot']
     return df
 
-def energy_filter(df):
+def rule_matrix(df, steps):
+    """
+        Returns the columns used by the rules of a filter as a single float
+        array, contiguous by column.
+        Parameters
+        ----------
+        df : DataFrame
+            Dataset to be filtered
+        steps : list(list(tuple))
+            The (column, operator, k) rules of each step
+
+        Returns
+        ----------
+        X : array
+            The values of the columns
+        columns : list(string)
+            The column of each position of X
+    """
+    columns = list(dict.fromkeys(c for rules in steps for c, op, k in rules))
+    return np.asfortranarray(df[columns].to_numpy(dtype=np.float64)), columns
+
+def rule_thresholds(rules, values=None, stats=None):
+    """
+        Returns the thresholds of the rules of a step, the mean + k*std of
+        each column. The statistics of all of the columns are computed at
+        once.
+        Parameters
+        ----------
+        rules : list(tuple)
+            The (column, operator, k) rules of the step
+        values : array
+            The values of the column of each rule, used for the columns
+            without statistics
+        stats : dictionary
+            The statistics of the columns, as returned by
+            stats.merge_moments. The columns created after they were
+            computed (e.g. by create_features) are taken from values.
+
+        Returns
+        ----------
+        thresholds : array
+            The threshold of each rule
+    """
+    k = np.array([k for c, op, k in rules], dtype=np.float64)
+    known = np.array([stats is not None and c in stats for c, op, k in rules], dtype=bool)
+    mean, std = np.full(len(rules), np.nan), np.full(len(rules), np.nan)
+    if not known.all():
+        if values is None:
+            raise KeyError(f"No statistics for the columns: {[r[0] for r, kn in zip(rules, known) if not kn]}")
+        values = np.asarray(values)[:, ~known]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean[~known] = np.nanmean(values, axis=0)
+            std[~known] = np.nanstd(values, axis=0, ddof=1)
+    for i in np.flatnonzero(known):
+        mean[i], std[i] = mean_std(stats, rules[i][0])
+    return np.where(k == 0, mean, mean + k*std)
+
+def step_mask(X, columns, rules, stats=None, thresholds=None):
+    """
+        Returns the entries kept by a step of a filter. The rules sharing an
+        operator are evaluated together.
+        Parameters
+        ----------
+        X : array
+            The values of the columns, as returned by rule_matrix
+        columns : list(string)
+            The column of each position of X
+        rules : list(tuple)
+            The (column, operator, k) rules of the step
+        stats : dictionary
+            The statistics of the columns, as returned by
+            stats.merge_moments. If None, they are computed from X.
+        thresholds : array
+            Fixed thresholds of the rules. If None, they are computed.
+
+        Returns
+        ----------
+        mask : array
+            Whether each entry passes all of the rules
+    """
+    positions = np.array([columns.index(c) for c, op, k in rules], dtype=int)
+    if thresholds is None:
+        thresholds = rule_thresholds(rules, X[:, positions], stats)
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+
+    mask = np.ones(len(X), dtype=bool)
+    ops = np.array([op for c, op, k in rules])
+    for op in dict.fromkeys(ops):
+        same = ops == op
+        mask &= OPERATORS[op](X[:, positions[same]], thresholds[same]).all(axis=1)
+    return mask
+
+def rule_mask(df, rules, stats=None):
+    """
+        Returns the entries kept by a step of a filter.
+        Parameters
+        ----------
+        df : DataFrame
+            Dataset to be filtered
+        rules : list(tuple)
+            The (column, operator, k) rules of the step
+        stats : dictionary
+            The statistics of the columns, as returned by
+            stats.merge_moments. If None, they are computed from df.
+
+        Returns
+        ----------
+        mask : array
+            Whether each entry passes all of the rules
+    """
+    X, columns = rule_matrix(df, [rules])
+    return step_mask(X, columns, rules, stats)
+
+def filter_steps(df, steps, stats=None, thresholds=None):
+    """
+        Returns the positions of the entries kept by a filter, and the
+        thresholds used by each step. Only the columns used by the rules are
+        read, and each step works on the entries kept by the previous one.
+        Parameters
+        ----------
+        df : DataFrame
+            Dataset to be filtered
+        steps : list(list(tuple))
+            The (column, operator, k) rules of each step
+        stats : dictionary
+            The statistics of the columns of df, used by the first step, as
+            returned by stats.merge_moments. If None, they are computed.
+        thresholds : list(array)
+            Fixed thresholds of each step, e.g. from a saved UML model. If
+            None, they are computed from the data.
+
+        Returns
+        ----------
+        index : array
+            The positions in df of the entries kept
+        thresholds : list(array)
+            The thresholds of each step
+    """
+    X, columns = rule_matrix(df, steps)
+    index = np.arange(len(X))
+    used = []
+    for i, rules in enumerate(steps):
+        if i > 0:
+            X = X[mask]
+        if thresholds is None:
+            positions = [columns.index(c) for c, op, k in rules]
+            used.append(rule_thresholds(rules, X[:, positions], stats if i == 0 else None))
+        else:
+            used.append(np.asarray(thresholds[i], dtype=np.float64))
+        mask = step_mask(X, columns, rules, thresholds=used[-1])
+        index = index[mask]
+    return index, used
+
+def filter_index(df, steps, stats=None, thresholds=None):
+    """
+        Returns the positions of the entries kept by a filter (see
+        filter_steps).
+        Parameters
+        ----------
+        df : DataFrame
+            Dataset to be filtered
+        steps : list(list(tuple))
+            The (column, operator, k) rules of each step
+        stats : dictionary
+            The statistics of the columns of df, used by the first step. If
+            None, they are computed.
+        thresholds : list(array)
+            Fixed thresholds of each step. If None, they are computed.
+
+        Returns
+        ----------
+        index : array
+            The positions in df of the entries kept
+    """
+    return filter_steps(df, steps, stats, thresholds)[0]
+
+def scale_rules(steps, sigma=1.):
+    """
+        Returns the rules of a filter with their numbers of standard
+        deviations multiplied by a factor. Rules at the mean are kept.
+        Parameters
+        ----------
+        steps : list(list(tuple))
+            The (column, operator, k) rules of each step
+        sigma : float
+            Factor of the number of standard deviations k
+
+        Returns
+        ----------
+        steps : list(list(tuple))
+            The scaled rules
+    """
+    return [[(c, op, k*sigma) for c, op, k in rules] for rules in steps]
+
+def energy_filter(df, stats=None, rules=ENERGY_RULES):
     """
         Returns the data filtered by energies. This is the first step of the
         UML approach.
@@ -63,28 +334,313 @@ def energy_filter(df):
         ----------
         df : DataFrame
             Initial dataset
+        stats : dictionary
+            The statistics of the columns of the initial dataset, as returned
+            by stats.merge_moments. If None, they are computed from df.
+        rules : list(list(tuple))
+            The (column, operator, k) rules of each step
 
         Returns
         ----------
         df : DataFrame
             Filtered dataset
     """
-    # Step 1
-    b_repul = df['repul'] < (df['repul'].mean() + 1.*(df['repul'].std()))
-    b_hbond = df['hbond'] < (df['hbond'].mean() + 3.*(df['hbond'].std()))
-    b_stage = df['stage'] < (df['stage'].mean() + 4.*(df['stage'].std()))
-    b_stack = df['stack'] < (df['stack'].mean() + 2.*(df['stack'].std()))
-    b_local = df['local'] < (df['local'].mean() + 2.*(df['local'].std()))
-    df = df[b_local & b_repul & b_stack & b_stage & b_hbond]
+    return df.iloc[filter_index(df, rules, stats)]
 
-    # Step 2
-    b_afmcc = df['afmcc'] > (df['afmcc'].mean() - 2.*df['afmcc'].std())
-    b_etot  = df['etot']  < (df['etot'].mean()  + 3.*df['etot'].std())
-    df = df[b_afmcc & b_etot]
+def select_components(ratios, variance=VARIANCE):
+    """
+        Returns the smallest number of components that explains a fraction
+        of the variance.
+        Parameters
+        ----------
+        ratios : array
+            Explained variance ratio of each component, in decreasing order
+        variance : float
+            Fraction of the variance to be explained, between 0 and 1
 
-    return df
+        Returns
+        ----------
+        n_components : int
+            Number of components
+    """
+    if not 0 < variance <= 1:
+        raise ValueError(f"Invalid variance fraction: {variance}. Expecting a value in (0, 1].")
+    cumulative = np.cumsum(ratios)
+    n = int(np.searchsorted(cumulative, variance*cumulative[-1] - 1e-12)) + 1
+    return min(n, len(ratios))
+
+def find_knee(x, y):
+    """
+        Returns the knee of a decreasing curve, as the point farthest below
+        the line joining its first and last points.
+        Parameters
+        ----------
+        x : list
+            Coordinates of the points, e.g. the numbers of clusters
+        y : list
+            Values of the curve, e.g. the WCSS
 
-def create_pca_dataset(df, output_dir="."):
+        Returns
+        ----------
+        knee : int
+            The x coordinate of the knee
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    if len(x) < 3 or y[0] == y[-1]:
+        return int(x[0])
+    xn = (x - x[0])/(x[-1] - x[0])
+    yn = (y - y[-1])/(y[0] - y[-1])
+    return int(x[np.argmax((1 - xn) - yn)])
+
+def sample_rows(X, sample=None, seed=42):
+    """
+        Returns a reproducible random sample of the rows of an array.
+        Parameters
+        ----------
+        X : array
+            Data to be sampled
+        sample : int
+            Number of rows of the sample. If None, or not smaller than the
+            data, all of the rows are returned.
+        seed : int
+            Seed for reproducibility
+
+        Returns
+        ----------
+        X : array
+            The sampled rows, in their original order
+    """
+    X = np.asarray(X)
+    if sample is None or sample >= len(X):
+        return X
+    rows = np.random.default_rng(seed).choice(len(X), size=sample, replace=False)
+    return X[np.sort(rows)]
+
+def bisecting_wcss(X, max_clusters, seed=42):
+    """
+        Returns the WCSS for 1 to max_clusters clusters in a single pass,
+        splitting in two the cluster with the largest WCSS at each step.
+        Parameters
+        ----------
+        X : array
+            Data to be clustered
+        max_clusters : int
+            Largest number of clusters
+        seed : int
+            Seed for reproducibility
+
+        Returns
+        ----------
+        wcss : list(float)
+            The WCSS for each number of clusters
+    """
+    labels = np.zeros(len(X), dtype=int)
+    sse = [float(((X - X.mean(axis=0))**2).sum())]
+    wcss = [sse[0]]
+    for k in range(1, max_clusters):
+        i = int(np.argmax(sse))
+        rows = np.flatnonzero(labels == i)
+        if len(rows) < 2 or sse[i] == 0:
+            # Nothing left to split
+            wcss.append(wcss[-1])
+            continue
+        km = KMeans(n_clusters=2, init='k-means++', n_init=3, random_state=seed).fit(X[rows])
+        labels[rows[km.labels_ == 1]] = k
+        parts = [X[rows[km.labels_ == j]] for j in range(2)]
+        sse[i], new = [float(((part - part.mean(axis=0))**2).sum()) for part in parts]
+        sse.append(new)
+        wcss.append(sum(sse))
+    return wcss
+
+def fit_wcss(X, n_clusters, method='full', sample=None, seed=42, random_state=42):
+    """
+        Returns the WCSS of a single fit of the elbow curve.
+        Parameters
+        ----------
+        X : array
+            Components scores
+        n_clusters : int
+            Number of clusters
+        method : string
+            'full' for KMeans or 'minibatch' for MiniBatchKMeans
+        sample : int
+            Number of rows used in the fit, or None to use all of them
+        seed : int
+            Seed of the sample
+        random_state : int
+            Seed of the fit
+
+        Returns
+        ----------
+        wcss : float
+            The WCSS, scaled to the size of the data
+    """
+    Xs = sample_rows(X, sample, seed)
+    if method == 'full':
+        kmeans_pca = KMeans(n_clusters=n_clusters, init='k-means++', random_state=random_state)
+    else:
+        kmeans_pca = MiniBatchKMeans(n_clusters=n_clusters, init='k-means++', n_init=3, random_state=random_state)
+    kmeans_pca.fit(Xs)
+    return kmeans_pca.inertia_*len(X)/len(Xs)
+
+def init_elbow_worker(X, threads):
+    """
+        Prepares a process of a parallel WCSS sweep.
+        Parameters
+        ----------
+        X : array
+            Components scores
+        threads : int
+            Number of BLAS and OpenMP threads used by the process
+    """
+    global ELBOW_DATA
+    ELBOW_DATA = X
+    threadpool_limits(limits=threads)
+
+def pool_wcss(*args):
+    """
+        Returns the WCSS of a fit in a process of a parallel WCSS sweep, as
+        fit_wcss(ELBOW_DATA, *args).
+    """
+    return fit_wcss(ELBOW_DATA, *args)
+
+def elbow_curve(scores_pca, x_range, method='full', sample=None, seed=42, workers=1, threads=None):
+    """
+        Returns the WCSS curve used to choose the number of clusters.
+        Parameters
+        ----------
+        scores_pca : array
+            Components scores
+        x_range : range
+            Numbers of clusters, starting from 1
+        method : string
+            One of ELBOW_METHODS. 'full' fits a KMeans model for each number
+            of clusters, 'bisecting' gets the whole curve from a single
+            bisecting pass, and 'minibatch' fits MiniBatchKMeans models
+            ELBOW_REPEATS times, on different samples if sample is passed.
+        sample : int
+            Number of rows used to compute the curve, or None to use all of
+            them. The WCSS is scaled to the size of the data.
+        seed : int
+            Seed for reproducibility
+        workers : int
+            Number of processes running the fits of the 'full' and
+            'minibatch' methods concurrently
+        threads : int
+            Number of BLAS and OpenMP threads of each process. If None, the
+            cores are split among the processes.
+
+        Returns
+        ----------
+        wcss : list(float)
+            The WCSS for each number of clusters
+        band : list(float)
+            The standard deviation of the WCSS over the repeated fits of the
+            'minibatch' method, or None
+    """
+    if method not in ELBOW_METHODS:
+        raise ValueError(f"Invalid elbow method: {method}. Expecting one of {ELBOW_METHODS}.")
+    if method == 'bisecting':
+        X = sample_rows(scores_pca, sample, seed)
+        wcss = bisecting_wcss(X, max(x_range), seed)
+        return [wcss[i-1]*len(scores_pca)/len(X) for i in x_range], None
+
+    # The fits are independent: (n_clusters, method, sample, seed, random_state)
+    if method == 'full':
+        fits = [(i, method, sample, seed, 42) for i in x_range]
+    else:
+        fits = [(i, method, sample, seed + r, seed + r) for r in range(ELBOW_REPEATS) for i in x_range]
+    if workers > 1:
+        if threads is None:
+            threads = max(1, (os.cpu_count() or 1)//workers)
+        # The largest numbers of clusters are the slowest, so they start first
+        order = sorted(range(len(fits)), key=lambda j: -fits[j][0])
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_elbow_worker,
+                                 initargs=(np.asarray(scores_pca), threads)) as pool:
+            results = dict(zip(order, pool.map(pool_wcss, *zip(*[fits[j] for j in order]))))
+        results = [results[j] for j in range(len(fits))]
+    else:
+        results = [fit_wcss(scores_pca, *fit) for fit in fits]
+
+    if method == 'full':
+        return results, None
+    curves = np.array(results).reshape(ELBOW_REPEATS, len(x_range))
+    return list(curves.mean(axis=0)), list(curves.std(axis=0))
+
+def plot_variance(ratios, output_dir=".", headless=False):
+    """
+        Plots the cumulative explained variance of the PCA components.
+        Parameters
+        ----------
+        ratios : array
+            Explained variance ratio of each component
+        output_dir : string
+            Output directory
+        headless : bool
+            Whether to only save the plot, without showing it
+    """
+    plt.figure(figsize=(10,8))
+    plt.plot(range(1,len(ratios)+1), np.cumsum(ratios), marker='o', linestyle='-',color='b')
+    plt.xlabel('Number of Components')
+    plt.ylabel('Cumulative explained variance')
+    plt.savefig(f"{output_dir}/PCA_Cumulative_variance.pdf", dpi=50, bbox_inches='tight')
+    if headless:
+        plt.close()
+    else:
+        plt.show()
+
+def choose_components(ratios, n_components=None, variance=VARIANCE, headless=False, max_components=None):
+    """
+        Returns the number of PCA components to be used.
+        Parameters
+        ----------
+        ratios : array
+            Explained variance ratio of each component
+        n_components : int
+            Number of components. If None, it is asked for, or chosen from
+            the variance in headless mode.
+        variance : float
+            Fraction of the explained variance used in headless mode
+        headless : bool
+            Whether to choose without asking for input
+        max_components : int
+            Largest valid number of components, by default the number of
+            ratios
+
+        Returns
+        ----------
+        n_components : int
+            Number of components
+    """
+    if max_components is None:
+        max_components = len(ratios)
+
+    # Fit the data using number of compenents that mach at least 70-80% of the data
+    if n_components is not None:
+        if n_components <= 0 or n_components > max_components:
+            raise ValueError(f"Invalid number of components: {n_components}.")
+    elif headless:
+        n_components = select_components(ratios, variance)
+        explained = np.sum(ratios[:n_components])
+        print(f"The first {n_components} components explain {100*explained:.1f}% of the variance.")
+    else:
+        n_components = DEFAULT_COMPONENTS
+        n_components_user = input("Please, enter the number of components based on PCA plot (default = 8): ")
+        if n_components_user is None or n_components_user in ['', ' ','\n']:
+            print("Using default number of components.")
+        else:
+            try:
+                n_components_user = int(n_components_user)
+                if n_components_user < 0 or n_components_user > max_components:
+                    raise ValueError("Invalid number of components.")
+                n_components = n_components_user
+            except:
+                print("Invalid number of components. Using default number of components.")
+    print(f"Using {n_components} components.")
+    return n_components
+
+def create_pca_dataset(df, output_dir=".", n_components=None, variance=VARIANCE, headless=False, stages=None,
+                       scaling=None):
     """
         Returns the PCA analysis based on the input dataset.
         Parameters
@@ -93,6 +649,21 @@ def create_pca_dataset(df, output_dir="."):
             Input dataset
         output_dir : string
             Output directory
+        n_components : int
+            Number of PCA components. If None, it is asked for, or chosen
+            from the variance in headless mode.
+        variance : float
+            Fraction of the explained variance used to choose the number of
+            components in headless mode
+        headless : bool
+            Whether to run without showing the plot and asking for input
+        stages : dictionary
+            Cache of the stages (see cache.open_stages). If passed, the
+            standardization and the PCA fits are reused when they already ran
+            on the same data.
+        scaling : dictionary
+            If passed, it is updated with the 'mean' and 'scale' of the
+            standardization, as stored in the cache
 
         Returns
         ----------
@@ -109,42 +680,36 @@ def create_pca_dataset(df, output_dir="."):
         n_components : int
             Number of PCA components used
     """
-    pca_ana = deepcopy(df)
-    pca_ana.reset_index(inplace=True)
-    cols = ['etot', 'local', 'go', 'repul', 'stack', 'hbond',
-            'elect', 'afmcc', 'afmfit', 'kapa', 'stage']
-    pca_ana = pca_ana[cols]
+    pca_ana = df[PCA_COLUMNS].reset_index(drop=True)
 
-    scaler = StandardScaler()
-    pca_std = scaler.fit_transform(pca_ana)
-
-    pca = PCA()
-    pca.fit(pca_std)
-
-    pca.explained_variance_ratio_
-    plt.figure(figsize=(10,8))
-    plt.plot(range(1,12), pca.explained_variance_ratio_.cumsum(), marker='o', linestyle='-',color='b')
-    plt.xlabel('Number of Components')
-    plt.ylabel('Cumulative explained variance')
-    plt.savefig(f"{output_dir}/PCA_Cumulative_variance.pdf", dpi=50, bbox_inches='tight')
-    plt.show()
+    cached = load_stage(stages, 'scaler', PCA_COLUMNS)
+    if cached is None:
+        scaler = StandardScaler()
+        pca_std = scaler.fit_transform(pca_ana)
 
-    # Fit the data using number of compenents that mach at least 70-80% of the data
-    n_components = 8
-    n_components_user = input("Please, enter the number of components based on PCA plot (default = 8): ")
-    if n_components_user is None or n_components_user in ['', ' ','\n']:
-        print("Using default number of components.")
+        pca = PCA()
+        pca.fit(pca_std)
+        cached = {'mean': scaler.mean_, 'scale': scaler.scale_, 'ratios': pca.explained_variance_ratio_}
+        save_stage(stages, 'scaler', PCA_COLUMNS, cached)
     else:
-        try:
-            n_components_user = int(n_components_user)
-            if n_components_user < 0 or n_components_user > min(len(pca_ana), len(cols)):
-                raise ValueError("Invalid number of components.")
-            n_components = n_components_user
-        except:
-            print("Invalid number of components. Using default number of components.")
-    print(f"Using {n_components} components.")
+        print("Using the cached standardization.")
+        pca_std = (pca_ana.to_numpy(dtype=np.float64) - cached['mean'])/cached['scale']
+    if scaling is not None:
+        scaling.update(mean=cached['mean'], scale=cached['scale'])
+
+    plot_variance(cached['ratios'], output_dir, headless)
+    n_components = choose_components(cached['ratios'], n_components, variance, headless,
+                                     min(len(pca_ana), len(PCA_COLUMNS)))
+    stages = next_stages(stages, 'scaler', PCA_COLUMNS)
     pca = PCA(n_components=n_components)
-    pca.fit(pca_std)
+    cached = load_stage(stages, 'pca', [n_components])
+    if cached is None:
+        pca.fit(pca_std)
+        save_stage(stages, 'pca', [n_components], {a: getattr(pca, a) for a in PCA_ATTRIBUTES})
+    else:
+        print("Using the cached PCA.")
+        for a in PCA_ATTRIBUTES:
+            setattr(pca, a, cached[a])
 
     # Calculated resulting components scores for the elements in our data set:
     scores_pca = pca.transform(pca_std)
@@ -155,46 +720,28 @@ def create_pca_dataset(df, output_dir="."):
 
     return pca_ana, pca_std, pca, scores_pca, PCA_variance, n_components
 
-def create_pca_kmeans_clustering(pca_ana, scores_pca, filtered, output_dir=".", n_components=8, N_CLUSTERS=3, seed=42):
+def plot_elbow(x_range, wcss, band=None, output_dir=".", headless=False):
     """
-        Returns the PCA analysis based on the input dataset.
+        Plots the WCSS curve used to choose the number of clusters.
         Parameters
         ----------
-        pca_ana : DataFrame
-            Transformed dataset from PCA
-        scores_pca : DataFrame
-            Components scores
-        filtered : DataFrame
-            Filtered dataset
+        x_range : range
+            Numbers of clusters
+        wcss : list(float)
+            The WCSS for each number of clusters
+        band : list(float)
+            The standard deviation of the WCSS, or None
         output_dir : string
             Output directory
-        n_components : int
-            Number of PCA components used
-        N_CLUSTERS : int
-            Number of KMeans clusters to use
-        seed : int
-            Seed for reproducibility
-
-        Returns
-        ----------
-        df_segm_pca_kmeans : DataFrame
-            Segmented dataset from PCA+Clustering
-        km : KMeans cluster model
-            KMeans cluster model
+        headless : bool
+            Whether to only save the plot, without showing it
     """
-
-    # Testing the number of cluster that describe the data
-    wcss = []
-    x_range = range(1,10)
-    for i in x_range:
-        kmeans_pca = KMeans(n_clusters=i, init='k-means++', random_state=42)
-        kmeans_pca.fit(scores_pca)
-        wcss.append(kmeans_pca.inertia_)
-
     fig, (ax1, ax2) = plt.subplots(nrows=2, figsize=(10,8), sharex=True)
 
     # Elbow-method. The approach consists of looking for a kink or elbow in the WCSS graph.
     ax1.plot(x_range, wcss, marker='o', linestyle='--')
+    if band is not None:
+        ax1.fill_between(x_range, np.subtract(wcss, band), np.add(wcss, band), alpha=0.3)
     ax1.set_title('K-means with PCA Clustering')
     ax1.set_xlabel('Number of Clusters')
     ax1.set_ylabel('WCSS')
@@ -204,30 +751,78 @@ def create_pca_kmeans_clustering(pca_ana, scores_pca, filtered, output_dir=".",
     ax2.set_xlabel('Number of Clusters')
     ax2.set_ylabel('WCSS derivative')
     plt.savefig(f"{output_dir}/Kmeans_PCA_clustering.pdf", dpi=50, bbox_inches='tight')
-    plt.show()
+    if headless:
+        plt.close()
+    else:
+        plt.show()
 
-    n_clusters_user = input("Please, enter the number of clusters based on the Clustering PCA plot (default = 3): ")
-    if n_clusters_user is None or n_clusters_user in ['', ' ', '\n']:
-        print("Using default number of clusters.")
+def choose_clusters(x_range, wcss, N_CLUSTERS=None, headless=False):
+    """
+        Returns the number of KMeans clusters to be used.
+        Parameters
+        ----------
+        x_range : range
+            Numbers of clusters
+        wcss : list(float)
+            The WCSS for each number of clusters
+        N_CLUSTERS : int
+            Number of clusters. If None, it is asked for, or chosen at the
+            knee of the WCSS curve in headless mode.
+        headless : bool
+            Whether to choose without asking for input
+
+        Returns
+        ----------
+        N_CLUSTERS : int
+            Number of clusters
+    """
+    if N_CLUSTERS is not None:
+        if N_CLUSTERS <= 0:
+            raise ValueError(f"Invalid number of clusters: {N_CLUSTERS}.")
+    elif headless:
+        N_CLUSTERS = find_knee(x_range, wcss)
+        print("Using the knee of the WCSS curve.")
     else:
-        try:
-            n_clusters_user = int(n_clusters_user)
-            N_CLUSTERS = n_clusters_user
-        except:
-            print("Invalid number of components. Using default number of components.")
+        N_CLUSTERS = DEFAULT_CLUSTERS
+        n_clusters_user = input("Please, enter the number of clusters based on the Clustering PCA plot (default = 3): ")
+        if n_clusters_user is None or n_clusters_user in ['', ' ', '\n']:
+            print("Using default number of clusters.")
+        else:
+            try:
+                n_clusters_user = int(n_clusters_user)
+                N_CLUSTERS = n_clusters_user
+            except:
+                print("Invalid number of components. Using default number of components.")
     print(f"Using {N_CLUSTERS} clusters.")
+    return N_CLUSTERS
 
-    # Create KMeans
-    km = KMeans(n_clusters=N_CLUSTERS, init='k-means++', random_state=seed)
-    km = km.fit(scores_pca)
-
-    # Get cluster label of all data
-    cluster_labels = km.labels_
+def segment_table(pca_ana, scores_pca, labels, filtered, n_components, N_CLUSTERS):
+    """
+        Returns the dataset segmented by the clustering.
+        Parameters
+        ----------
+        pca_ana : DataFrame
+            Columns used in the PCA
+        scores_pca : array
+            Components scores
+        labels : array
+            Cluster of each entry
+        filtered : DataFrame
+            Filtered dataset, indexed as pca_ana
+        n_components : int
+            Number of PCA components used
+        N_CLUSTERS : int
+            Number of KMeans clusters used
 
+        Returns
+        ----------
+        df_segm_pca_kmeans : DataFrame
+            Segmented dataset from PCA+Clustering
+    """
     # Segmentation PCA
     df_segm_pca_kmeans = pd.concat([pca_ana.reset_index(drop=True),pd.DataFrame(scores_pca)],axis=1)
     df_segm_pca_kmeans.columns.values[-n_components:] = [f"Component{i}" for i in range(n_components)]
-    df_segm_pca_kmeans['Segment k-means PCA'] = km.labels_
+    df_segm_pca_kmeans['Segment k-means PCA'] = labels
 
     # Clustering
     dic = {}
@@ -239,10 +834,78 @@ def create_pca_kmeans_clustering(pca_ana, scores_pca, filtered, output_dir=".",
     feat_dnn = ['etot', 'local', 'go', 'repul', 'stack', 'hbond', 'elect', 'afmfit', 'afmcc']
     cols_to_copy_original = [f for f in feat_dnn]
     cols_to_include = ["frame", "baseP", "baseS"]
+    if 'replica' in filtered.columns:
+        cols_to_include.append('replica')
     total_colums = cols_to_copy_original + cols_to_include
     for c in total_colums:
         df_segm_pca_kmeans[c] = filtered[c]
 
+    return df_segm_pca_kmeans
+
+def create_pca_kmeans_clustering(pca_ana, scores_pca, filtered, output_dir=".", n_components=8, N_CLUSTERS=None, seed=42,
+                                 headless=False, elbow='full', sample=None, workers=1, stages=None):
+    """
+        Returns the PCA analysis based on the input dataset.
+        Parameters
+        ----------
+        pca_ana : DataFrame
+            Transformed dataset from PCA
+        scores_pca : DataFrame
+            Components scores
+        filtered : DataFrame
+            Filtered dataset
+        output_dir : string
+            Output directory
+        n_components : int
+            Number of PCA components used
+        N_CLUSTERS : int
+            Number of KMeans clusters to use. If None, it is asked for, or
+            chosen at the knee of the WCSS curve in headless mode.
+        seed : int
+            Seed for reproducibility
+        headless : bool
+            Whether to run without showing the plot and asking for input
+        elbow : string
+            Method computing the WCSS curve, one of ELBOW_METHODS (see
+            elbow_curve). The final clustering always uses all of the data.
+        sample : int
+            Number of rows used to compute the WCSS curve, or None to use
+            all of them
+        workers : int
+            Number of processes computing the WCSS curve
+        stages : dictionary
+            Cache of the stages (see cache.open_stages). If passed, the WCSS
+            curve is reused when it was already computed for the same
+            components.
+
+        Returns
+        ----------
+        df_segm_pca_kmeans : DataFrame
+            Segmented dataset from PCA+Clustering
+        km : KMeans cluster model
+            KMeans cluster model
+    """
+
+    # Testing the number of cluster that describe the data
+    x_range = range(1,10)
+    params = [list(x_range), elbow, sample, seed]
+    cached = load_stage(stages, 'wcss', params)
+    if cached is None:
+        wcss, band = elbow_curve(scores_pca, x_range, elbow, sample, seed, workers)
+        save_stage(stages, 'wcss', params, {'wcss': wcss} if band is None else {'wcss': wcss, 'band': band})
+    else:
+        print("Using the cached WCSS curve.")
+        wcss, band = list(cached['wcss']), cached.get('band')
+    plot_elbow(x_range, wcss, band, output_dir, headless)
+    N_CLUSTERS = choose_clusters(x_range, wcss, N_CLUSTERS, headless)
+
+    # Create KMeans
+    km = KMeans(n_clusters=N_CLUSTERS, init='k-means++', random_state=seed)
+    km = km.fit(scores_pca)
+
+    # Segmentation of all data
+    df_segm_pca_kmeans = segment_table(pca_ana, scores_pca, km.labels_, filtered, n_components, N_CLUSTERS)
+
     return df_segm_pca_kmeans, km
 
 def get_min_cluster_index(df,col):
@@ -282,36 +945,628 @@ def get_min_cluster_index(df,col):
 
     return means, index
 
-def cluster_filter(df):
+def cluster_filter(df, rules=COHORT_RULES):
     """
         Select the cohort structures based on energy and cc filters.
         Parameters
         ----------
         df : DataFrame
             DataFrame to be filtered from clustering
+        rules : list(list(tuple))
+            The (column, operator, k) rules of each step
 
         Returns
         ----------
         df : DataFrame
             Cohort of structures based of the filtering
     """
-    # Step 1
-    cohort  = df.copy()
-    b_go    = cohort['go']    < (cohort['go'].mean())
-    b_elect = cohort['elect'] > (cohort['elect'].mean() + 1.5*(cohort['elect'].std()))
-    b_local = cohort['local'] < (cohort['local'].mean() + 3.0*(cohort['local'].std()))
-    cohort  = cohort[b_go & b_elect & b_local]
+    return df.iloc[filter_index(df, rules)]
+
+
+def save_uml_model(filename, model):
+    """
+        Saves a fitted UML model, to be applied to new trajectories with
+        uml_apply. The file is a .npz archive without pickled objects.
+        Parameters
+        ----------
+        filename : string
+            Output file, e.g. UML_model.npz
+        model : dictionary
+            The fitted model: 'scaler_mean' and 'scaler_scale' (standardization
+            of the PCA_COLUMNS), 'pca_mean', 'components' and 'variance' (PCA
+            projection), 'centers' (KMeans clusters), 'cluster' (selected
+            cluster), and the rules and thresholds of each step of the
+            filters ('energy_rules', 'energy_thresholds', 'cohort_rules',
+            'cohort_thresholds')
+    """
+    arrays = {k: np.asarray(model[k], dtype=np.float64) for k in MODEL_ARRAYS}
+    meta = {
+        'version': UML_VERSION, 'columns': list(PCA_COLUMNS), 'cluster': int(model['cluster']),
+        **{k: model[k] for k in ['energy_rules', 'cohort_rules']},
+        **{k: [[float(t) for t in step] for step in model[k]] for k in ['energy_thresholds', 'cohort_thresholds']}}
+    tmp = f"{filename}.{os.getpid()}"
+    with open(tmp, 'wb') as f:
+        np.savez(f, meta=json.dumps(meta), **arrays)
+    os.replace(tmp, filename)
+
+def load_uml_model(filename):
+    """
+        Returns a UML model saved by save_uml_model.
+        Parameters
+        ----------
+        filename : string
+            Model file
+
+        Returns
+        ----------
+        model : dictionary
+            The fitted model (see save_uml_model)
+    """
+    with np.load(filename, allow_pickle=False) as data:
+        meta = json.loads(str(data['meta']))
+        if meta.get('version') != UML_VERSION:
+            raise ValueError(f"Unsupported UML model version in {filename}: {meta.get('version')}. "
+                             f"Expecting version {UML_VERSION}, please run uml_analysis again.")
+        model = {k: data[k] for k in MODEL_ARRAYS}
+    model.update(meta)
+    for k in ['energy_rules', 'cohort_rules']:
+        model[k] = [[tuple(rule) for rule in step] for step in model[k]]
+    for k in ['energy_thresholds', 'cohort_thresholds']:
+        model[k] = [np.array(step, dtype=np.float64) for step in model[k]]
+    return model
+
+def project_scores(df, model):
+    """
+        Returns the PCA scores of entries, standardized and projected as by
+        a fitted UML model.
+        Parameters
+        ----------
+        df : DataFrame
+            Entries with the PCA columns of the model
+        model : dictionary
+            The fitted model (see save_uml_model)
+
+        Returns
+        ----------
+        scores : array
+            The scores of the components of the model
+    """
+    X = df[model['columns']].to_numpy(dtype=np.float64)
+    return ((X - model['scaler_mean'])/model['scaler_scale'] - model['pca_mean']) @ model['components'].T
+
+def nearest_center(X, centers):
+    """
+        Returns the closest cluster center of each row, as KMeans.predict.
+        Parameters
+        ----------
+        X : array
+            Rows to be assigned
+        centers : array
+            Cluster centers
+
+        Returns
+        ----------
+        labels : array
+            The index of the closest center of each row
+    """
+    distances = (centers**2).sum(axis=1) - 2*(X @ centers.T)
+    return distances.argmin(axis=1).astype(np.int32)
+
+def chunk_rows(max_memory=None, default=APPLY_ROWS):
+    """
+        Returns the number of rows of the chunks that fit in a memory budget.
+        Parameters
+        ----------
+        max_memory : int or string
+            Memory budget (e.g. '8G'), or None
+        default : int
+            Number of rows without a budget
+
+        Returns
+        ----------
+        rows : int
+            Number of rows of each chunk
+    """
+    if max_memory is None:
+        return default
+    return max(parse_size(max_memory)//ROW_BYTES, MIN_ROWS)
+
+def merge_blocks(blocks, min_rows):
+    """
+        Yields blocks of rows, merging the blocks with fewer than min_rows
+        rows with their neighbours.
+        Parameters
+        ----------
+        blocks : iterable(array)
+            Blocks of rows
+        min_rows : int
+            Smallest number of rows of a block
+
+        Returns
+        ----------
+        block : array
+            A block with at least min_rows rows, unless all of the blocks
+            together have fewer
+    """
+    held = None
+    for block in blocks:
+        if len(block) == 0:
+            continue
+        if held is None:
+            held = block
+        elif len(held) < min_rows or len(block) < min_rows:
+            held = np.concatenate([held, block])
+        else:
+            yield held
+            held = block
+    if held is not None:
+        yield held
+
+def uml_chunked(input_file, output_dir=".", fmt='csv', n_components=None, n_clusters=None, variance=VARIANCE,
+                headless=False, elbow='full', sample=None, workers=1, rows=1000000, seed=42,
+                energy_rules=ENERGY_RULES, cohort_rules=COHORT_RULES):
+    """
+        Runs the UML approach reading the trajectory in chunks of rows, so
+        the memory used does not depend on its size. The statistics of the
+        filters are accumulated over the chunks, the scaler and the PCA are
+        fitted incrementally, the clusters are found by MiniBatchKMeans and
+        the outputs are written chunk by chunk. Only the cluster of each
+        entry is kept in memory.
+        Parameters
+        ----------
+        input_file : string
+            Full trajectory from simulation
+        output_dir : string
+            Output directory
+        fmt : string
+            Output format: 'csv', 'parquet' or 'feather'
+        n_components : int
+            Number of PCA components, or None to choose it
+        n_clusters : int
+            Number of KMeans clusters, or None to choose it
+        variance : float
+            Fraction of the explained variance covered by the components
+            chosen in headless mode
+        headless : bool
+            Whether to run without showing the plots and asking for input
+        elbow : string
+            Method computing the WCSS curve (see elbow_curve)
+        sample : int
+            Number of rows used to compute the WCSS curve and to initialize
+            the clusters, by default CHUNK_SAMPLE
+        workers : int
+            Number of processes computing the WCSS curve
+        rows : int
+            Number of rows of each chunk
+        seed : int
+            Seed for reproducibility
+        energy_rules : list(list(tuple))
+            The rules of the energy filter (see energy_filter)
+        cohort_rules : list(list(tuple))
+            The rules of the cohort filter (see cluster_filter)
+    """
+    ext = FORMATS[fmt]
+    filtered_file = f"{output_dir}/Filtered_Data{ext}"
+    cluster_file = f"{output_dir}/Select_Cluster{ext}"
+    cohort_file = f"{output_dir}/Final_Cohort{ext}"
+    needed = [c for c, op, v in data_cuts()] + ['afmcc']
+    trajectory = lambda columns: (create_features(filter_data(df))
+                                  for df in iter_table(input_file, columns=columns + needed, rows=rows))
+    columns_of = lambda rules: [c for c, op, k in rules]
+    merge_into = lambda merged, df: merge_moments([merged, *moments(df, by=None).values()])
+
+    # ------------ STEP 1: Energy Filtering ------------
+    print(" - STEP 1: Energy Filtering")
+    stats1 = {}
+    for df in trajectory(columns_of(energy_rules[0])):
+        stats1 = merge_into(stats1, df[columns_of(energy_rules[0])])
+    stats2 = {}
+    for df in trajectory(columns_of(energy_rules[0]) + columns_of(energy_rules[1])):
+        df = df[rule_mask(df, energy_rules[0], stats1)]
+        stats2 = merge_into(stats2, df[columns_of(energy_rules[1])])
+    energy_thresholds = [rule_thresholds(energy_rules[0], stats=stats1), rule_thresholds(energy_rules[1], stats=stats2)]
+
+    # The filtered entries keep their position in the trajectory, and the
+    # statistics of the PCA columns are used to standardize them
+    scaling, table, empty = {}, open_table(filtered_file, fmt), None
+    try:
+        for df in iter_table(input_file, rows=rows):
+            df = create_features(filter_data(df))
+            df = df.iloc[filter_index(df, energy_rules, thresholds=energy_thresholds)].reset_index()
+            if len(df) > 0:
+                append_table(table, df)
+                scaling = merge_into(scaling, df[PCA_COLUMNS])
+            empty = df.iloc[:0]
+        n = table['rows']
+        if n == 0 and empty is not None:
+            append_table(table, empty)
+    finally:
+        close_table(table)
+    print(f"Filtered size: {n}")
+    if n == 0:
+        raise ValueError("No entries were left by the energy filter.")
+
+    # ------------- STEP 2: PCA+Clustering -------------
+    print(" - STEP 2: PCA + Clustering")
+    mean = np.array([mean_std(scaling, c, ddof=0)[0] for c in PCA_COLUMNS])
+    scale = np.array([mean_std(scaling, c, ddof=0)[1] for c in PCA_COLUMNS])
+    scale[~(scale > 0)] = 1.
+    standard = lambda df: (df[PCA_COLUMNS].to_numpy(dtype=np.float64) - mean)/scale
+    filtered_chunks = lambda columns=PCA_COLUMNS: iter_table(filtered_file, columns=columns, rows=rows)
+
+    # PCA, fitted with all of the components, which are then truncated
+    ipca = IncrementalPCA()
+    for X in merge_blocks((standard(df) for df in filtered_chunks()), len(PCA_COLUMNS)):
+        ipca.partial_fit(X)
+    ratios = ipca.explained_variance_ratio_
+    plot_variance(ratios, output_dir, headless)
+    n_components = choose_components(ratios, n_components, variance, headless, min(n, len(PCA_COLUMNS)))
+    PCA_variance = pd.DataFrame(ratios[:n_components]*100, columns=['PCA'])
+    PCA_variance.to_json(f"{output_dir}/PCA_variance.json")
+    components = ipca.components_[:n_components]
+    project = lambda df: (standard(df) - ipca.mean_) @ components.T
+
+    # WCSS curve and initial clusters from a reproducible sample
+    if sample is None:
+        sample = CHUNK_SAMPLE
+    rng = np.random.default_rng(seed)
+    picked = []
+    for df in filtered_chunks():
+        X = project(df)
+        picked.append(X[rng.random(len(X)) < sample/n])
+    Xs = np.concatenate(picked)
+    x_range = range(1,10)
+    wcss, band = elbow_curve(Xs, x_range, elbow, None, seed, workers)
+    wcss = [w*n/len(Xs) for w in wcss]
+    band = None if band is None else [b*n/len(Xs) for b in band]
+    plot_elbow(x_range, wcss, band, output_dir, headless)
+    N_CLUSTERS = choose_clusters(x_range, wcss, n_clusters, headless)
+    centers = KMeans(n_clusters=N_CLUSTERS, init='k-means++', random_state=seed).fit(Xs).cluster_centers_
+    km = MiniBatchKMeans(n_clusters=N_CLUSTERS, init=centers, n_init=1, random_state=seed)
+    batches = (X[i:i+MINIBATCH_ROWS] for X in map(project, filtered_chunks()) for i in range(0, len(X), MINIBATCH_ROWS))
+    for X in merge_blocks(batches, N_CLUSTERS):
+        km.partial_fit(X)
+
+    # Cluster Selection, by the means of each cluster
+    labels, sums, counts = [], np.zeros((N_CLUSTERS, 3)), np.zeros(N_CLUSTERS)
+    for df in filtered_chunks():
+        cluster_labels = km.predict(project(df)).astype(np.int32)
+        labels.append(cluster_labels)
+        np.add.at(sums, cluster_labels, df[['etot', 'go', 'local']].to_numpy(dtype=np.float64))
+        counts += np.bincount(cluster_labels, minlength=N_CLUSTERS)
+    labels = np.concatenate(labels)
+    with np.errstate(invalid='ignore'):
+        means = sums/counts[:, None]
+    index_minEtot, index_minGo, index_minLocal = np.nanargmin(means, axis=0)
+    if (index_minLocal == index_minGo == index_minEtot) == False:
+        print("Warning: mean_etot, mean_go and min_local are not located in the same cluster.")
+
+    stats1, table, offset = {}, open_table(cluster_file, fmt), 0
+    try:
+        for df in filtered_chunks(None):
+            cluster_labels = labels[offset:offset+len(df)]
+            offset += len(df)
+            keep = cluster_labels == index_minGo
+            if keep.any():
+                df = df[keep].reset_index(drop=True)
+                cluster = segment_table(df[PCA_COLUMNS], project(df), cluster_labels[keep], df, n_components, N_CLUSTERS)
+                append_table(table, cluster)
+                stats1 = merge_into(stats1, cluster[columns_of(cohort_rules[0])])
+        n = table['rows']
+    finally:
+        close_table(table)
+    print(f"Cluster size: {n}")
+
+    # ---------------- STEP 3: Cohort ----------------
+    print(" - STEP 3: Cohort")
+    stats2 = {}
+    for df in iter_table(cluster_file, rows=rows):
+        df = df[rule_mask(df, cohort_rules[0], stats1)]
+        stats2 = merge_into(stats2, df[columns_of(cohort_rules[1])])
+    cohort_thresholds = [rule_thresholds(cohort_rules[0], stats=stats1), rule_thresholds(cohort_rules[1], stats=stats2)]
+    table, empty = open_table(cohort_file, fmt), None
+    try:
+        for df in iter_table(cluster_file, rows=rows):
+            df = df.iloc[filter_index(df, cohort_rules, thresholds=cohort_thresholds)]
+            if len(df) > 0:
+                append_table(table, df)
+            empty = df.iloc[:0]
+        if table['rows'] == 0 and empty is not None:
+            append_table(table, empty)
+    finally:
+        close_table(table)
+    print(f"Cohort size: {table['rows']}")
+
+    save_uml_model(f"{output_dir}/{UML_MODEL}", {
+        'scaler_mean': mean, 'scaler_scale': scale, 'pca_mean': ipca.mean_, 'components': components,
+        'variance': ratios[:n_components], 'centers': km.cluster_centers_, 'cluster': index_minGo,
+        'energy_rules': energy_rules, 'energy_thresholds': energy_thresholds,
+        'cohort_rules': cohort_rules, 'cohort_thresholds': cohort_thresholds})
+
+def uml_apply(input_file, model_file, output_dir=None, fmt=None, max_memory=None):
+    """
+        Applies a fitted UML model to a new trajectory, e.g. extra kappa runs
+        or a follow-up simulation of the same RNA, in a single pass over
+        chunks of rows. The energy filter and cohort thresholds, the
+        standardization, the PCA and the clusters of the model are used as
+        they are, and nothing is refitted. The outputs are written beside the
+        input file, named after it (e.g. Extra_Trajectory_Final_Cohort.csv).
+        Parameters
+        ----------
+        input_file : string
+            Trajectory to be classified
+        model_file : string
+            Model saved by uml_analysis (UML_model.npz)
+        output_dir : string
+            Output directory. If None, the directory of the input file.
+        fmt : string
+            Output format: 'csv', 'parquet' or 'feather'. If None, the
+            format of the input file is used.
+        max_memory : int or string
+            Memory budget (e.g. '8G') of each chunk. If None, chunks of
+            APPLY_ROWS rows are read.
+    """
+    model = load_uml_model(model_file)
+    print(f" - Apply UML model {model_file} to {input_file}")
+    if fmt is None:
+        fmt = detect_format(input_file)
+    check_format(fmt)
+    if output_dir is None:
+        output_dir = os.path.dirname(input_file) or os.getcwd()
+    name = os.path.splitext(os.path.basename(input_file))[0]
+    n_components, n_clusters = len(model['components']), len(model['centers'])
+    outputs = ['Filtered_Data', 'Select_Cluster', 'Final_Cohort']
+    tables = [open_table(f"{output_dir}/{name}_{output}{FORMATS[fmt]}", fmt) for output in outputs]
+    try:
+        for df in iter_table(input_file, rows=chunk_rows(max_memory)):
+            df = create_features(filter_data(df))
+            filtered = df.iloc[filter_index(df, model['energy_rules'], thresholds=model['energy_thresholds'])]
+            filtered = filtered.reset_index()
+            scores = project_scores(filtered, model)
+            labels = nearest_center(scores, model['centers'])
+            keep = labels == model['cluster']
+            selected = filtered[keep].reset_index(drop=True)
+            cluster = segment_table(selected[PCA_COLUMNS], scores[keep], labels[keep], selected, n_components, n_clusters)
+            cohort = cluster.iloc[filter_index(cluster, model['cohort_rules'], thresholds=model['cohort_thresholds'])]
+            for table, chunk in zip(tables, [filtered, cluster, cohort]):
+                if len(chunk) > 0 or table['rows'] == 0:
+                    append_table(table, chunk)
+    finally:
+        for table in tables:
+            close_table(table)
+    for output, table in zip(outputs, tables):
+        print(f"{output} size: {table['rows']}")
+
+def trajectory_stats(input_file, n_entries):
+    """
+        Returns the statistics saved by prepare_inputs beside a trajectory,
+        if they still describe the data.
+        Parameters
+        ----------
+        input_file : string
+            Full trajectory
+        n_entries : int
+            Number of entries of the trajectory, after filter_data
+
+        Returns
+        ----------
+        stats : dictionary
+            The merged statistics (see stats.merge_moments), or None
+    """
+    shards = load_moments(input_file)
+    if shards is None:
+        return None
+    stats = merge_moments(shards.values())
+    if stats.get('etot', [0])[0] != n_entries:
+        return None
+    return stats
+
+def init_sweep_worker(threads):
+    """
+        Prepares a process of a parameter sweep.
+        Parameters
+        ----------
+        threads : int
+            Number of BLAS and OpenMP threads used by the process
+    """
+    threadpool_limits(limits=threads)
+
+def sweep_point(scores, table, n_clusters, cohort_sigmas=[1.], seed=42):
+    """
+        Runs the clustering of a point of a parameter sweep, and the cohort
+        selection of each factor of the cohort rules.
+        Parameters
+        ----------
+        scores : array
+            Components scores of the filtered entries
+        table : DataFrame
+            The filtered entries, with their position in the trajectory
+            ('index') and the columns used to select the cluster and the
+            cohort
+        n_clusters : int
+            Number of KMeans clusters
+        cohort_sigmas : list(float)
+            Factors of the standard deviations of the cohort rules
+        seed : int
+            Seed for reproducibility
+
+        Returns
+        ----------
+        rows : list(dictionary)
+            The sizes and means of the selected cluster and of the cohort of
+            each factor
+        cohorts : list(array)
+            The entries of each cohort, by their position in the trajectory
+    """
+    km = KMeans(n_clusters=n_clusters, init='k-means++', random_state=seed).fit(scores)
+    counts = np.bincount(km.labels_, minlength=n_clusters)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = {c: np.bincount(km.labels_, weights=table[c], minlength=n_clusters)/counts
+                 for c in ['etot', 'go', 'local']}
+    selected = int(np.nanargmin(means['go']))
+    cluster = table[km.labels_ == selected]
+    row = {
+        'cluster': selected, 'cluster_size': int(counts[selected]),
+        **{f"cluster_{c}": means[c][selected] for c in means},
+        'consistent': bool(np.nanargmin(means['etot']) == selected == np.nanargmin(means['local']))}
+    rows, cohorts = [], []
+    for sigma in cohort_sigmas:
+        cohort = cluster.iloc[filter_index(cluster, scale_rules(COHORT_RULES, sigma))]
+        rows.append({**row, 'cohort': len(cohort)})
+        cohorts.append(cohort['index'].to_numpy(dtype=np.int64))
+    return rows, cohorts
+
+def sweep_file_point(scores_file, table_file, columns, n_clusters, cohort_sigmas=[1.], seed=42):
+    """
+        Runs a point of a parameter sweep (see sweep_point) over the arrays
+        saved by uml_sweep, which are mapped instead of being copied to
+        each process.
+        Parameters
+        ----------
+        scores_file : string
+            The .npy file of the components scores
+        table_file : string
+            The .npy file of the values of the filtered entries
+        columns : list(string)
+            The column of each position of the values
+        n_clusters : int
+            Number of KMeans clusters
+        cohort_sigmas : list(float)
+            Factors of the standard deviations of the cohort rules
+        seed : int
+            Seed for reproducibility
+
+        Returns
+        ----------
+        rows : list(dictionary)
+            The sizes and means of the selected cluster and of the cohort of
+            each factor
+        cohorts : list(array)
+            The entries of each cohort, by their position in the trajectory
+    """
+    scores = np.load(scores_file, mmap_mode='r')
+    table = pd.DataFrame(np.load(table_file, mmap_mode='r'), columns=columns)
+    return sweep_point(scores, table, n_clusters, cohort_sigmas, seed)
+
+def uml_sweep(input_file, components=[DEFAULT_COMPONENTS], clusters=[DEFAULT_CLUSTERS], energy_sigmas=[1.],
+              cohort_sigmas=[1.], workers=1, seed=42, output_dir=None):
+    """
+        Runs the UML approach for every combination of a grid of numbers of
+        components, numbers of clusters and factors of the standard
+        deviations of the energy rules and of the cohort rules. The
+        trajectory is read once, filtered once per energy factor and
+        projected once per number of components, and the clusterings of the
+        grid points run in parallel. The cohorts of all of the cohort
+        factors are selected from the same clustering.
+        A summary table and the overlaps between the cohorts are saved.
+        Parameters
+        ----------
+        input_file : string
+            Full trajectory from simulation
+        components : list(int)
+            Numbers of PCA components
+        clusters : list(int)
+            Numbers of KMeans clusters
+        energy_sigmas : list(float)
+            Factors of the standard deviations of the energy rules (see
+            scale_rules). 1 gives the default rules.
+        cohort_sigmas : list(float)
+            Factors of the standard deviations of the cohort rules. 1 gives
+            the default rules.
+        workers : int
+            Number of processes running the grid points
+        seed : int
+            Seed for reproducibility
+        output_dir : string
+            Output directory. If None, the directory of the input file.
+
+        Returns
+        ----------
+        summary : DataFrame
+            One row per grid point: the explained variance, the sizes of the
+            filtered data, of the selected cluster and of the cohort, the
+            means of the cluster, whether its etot, go and local means are
+            the lowest, and the overlap of the cohort with the reference one
+        overlaps : DataFrame
+            The Jaccard index between the cohorts of each pair of grid points
+    """
+    if any(n < 1 or n > len(PCA_COLUMNS) for n in components):
+        raise ValueError(f"Invalid number of components in {components}. Expecting 1 to {len(PCA_COLUMNS)}.")
+    if any(n < 1 for n in clusters):
+        raise ValueError(f"Invalid number of clusters in {clusters}.")
+    if output_dir is None:
+        output_dir = os.path.dirname(input_file) or os.getcwd()
 
-    # Step 2
-    b_etot   = cohort['etot']   < (cohort['etot'].mean() - 1.0*(cohort['etot'].std()))
-    b_afmCC  = cohort['afmcc']  > (cohort['afmcc'].mean())
-    b_afmfit = cohort['afmfit'] < (cohort['afmfit'].mean() + 2.0*(cohort['afmfit'].std()))
-    cohort   = cohort[b_etot & b_afmCC & b_afmfit]
+    # Common work: the trajectory is read and cleaned once
+    print(f" - Read data: {input_file}")
+    full_traj = create_features(filter_data(read_table(input_file)))
+    stats = trajectory_stats(input_file, len(full_traj))
 
-    return cohort
+    # Filters by energy sigma, and projections by number of components
+    columns = list(dict.fromkeys(['index'] + [c for rules in COHORT_RULES for c, op, k in rules] + ['etot', 'go', 'local']))
+    tables, data, points, rows = [], [], [], []
+    for energy_sigma in energy_sigmas:
+        filtered = full_traj.iloc[filter_index(full_traj, scale_rules(ENERGY_RULES, energy_sigma), stats)].reset_index()
+        print(f" - Energy sigma {energy_sigma}: {len(filtered)} filtered entries")
+        tables.append(filtered[columns])
+        pca_std = StandardScaler().fit_transform(filtered[PCA_COLUMNS])
+        for n_components in components:
+            pca = PCA(n_components=n_components)
+            data.append((pca.fit_transform(pca_std), len(tables) - 1))
+            for n_clusters in clusters:
+                points.append((len(data) - 1, n_clusters))
+                rows += [{
+                    'energy_sigma': energy_sigma, 'cohort_sigma': cohort_sigma, 'components': n_components,
+                    'clusters': n_clusters, 'variance': pca.explained_variance_ratio_.sum()*100,
+                    'filtered': len(filtered)} for cohort_sigma in cohort_sigmas]
+    del full_traj
 
+    # Clustering of each grid point, and cohort of each cohort sigma. The
+    # processes map the arrays from files instead of receiving copies.
+    print(f" - Clustering {len(points)} grid points")
+    if workers > 1:
+        threads = max(1, (os.cpu_count() or 1)//workers)
+        with tempfile.TemporaryDirectory(dir=output_dir) as folder:
+            for t, table in enumerate(tables):
+                np.save(f"{folder}/table{t}.npy", table.to_numpy(dtype=np.float64))
+            for d, (scores, t) in enumerate(data):
+                np.save(f"{folder}/scores{d}.npy", scores)
+            args = [(f"{folder}/scores{d}.npy", f"{folder}/table{data[d][1]}.npy", columns, n_clusters,
+                     cohort_sigmas, seed) for d, n_clusters in points]
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_sweep_worker,
+                                     initargs=(threads,)) as pool:
+                results = list(pool.map(sweep_file_point, *zip(*args)))
+    else:
+        results = [sweep_point(data[d][0], tables[data[d][1]], n_clusters, cohort_sigmas, seed)
+                   for d, n_clusters in points]
+    results = [(row, cohort) for point_rows, cohorts in results for row, cohort in zip(point_rows, cohorts)]
 
-def uml_analysis(input_file):
+    # Overlaps between the cohorts, and with the default settings if they
+    # are in the grid
+    names = [f"energy{r['energy_sigma']}_cohort{r['cohort_sigma']}_n{r['components']}_c{r['clusters']}" for r in rows]
+    cohorts = [set(cohort) for row, cohort in results]
+    jaccard = lambda a, b: len(a & b)/len(a | b) if len(a | b) > 0 else 1.
+    overlaps = pd.DataFrame([[jaccard(a, b) for b in cohorts] for a in cohorts], index=names, columns=names)
+    defaults = [i for i, r in enumerate(rows)
+                if (r['energy_sigma'], r['cohort_sigma'], r['components'], r['clusters'])
+                == (1., 1., DEFAULT_COMPONENTS, DEFAULT_CLUSTERS)]
+    reference = defaults[0] if len(defaults) > 0 else 0
+    for i, (row, cohort) in enumerate(results):
+        rows[i].update(row)
+        rows[i]['shared'] = len(cohorts[i] & cohorts[reference])
+        rows[i]['overlap'] = overlaps.iloc[i, reference]
+    summary = pd.DataFrame(rows)
+    summary.insert(0, 'point', names)
+
+    summary.to_csv(f"{output_dir}/{SWEEP_SUMMARY}", index=False)
+    overlaps.to_csv(f"{output_dir}/{SWEEP_OVERLAP}")
+    print(f" - Reference point: {names[reference]}")
+    print(summary.to_string(index=False))
+    return summary, overlaps
+
+def uml_analysis(input_file, fmt=None, n_components=None, n_clusters=None, variance=VARIANCE, headless=False,
+                 elbow='full', sample=None, workers=1, max_memory=None, energy_rules=ENERGY_RULES,
+                 cohort_rules=COHORT_RULES, cache=False):
     """
         Main function to use UML approach over the inputs from dynamic fitting. It
         will create the Filtered, Cluster, and Cohort of structures at the end.
@@ -319,14 +1574,59 @@ def uml_analysis(input_file):
         ----------
         input_file : string
             Full trajectory from simulation
+        fmt : string
+            Output format: 'csv', 'parquet' or 'feather'. If None, the
+            format of the input file is used.
+        n_components : int
+            Number of PCA components. If None, it is asked for, or chosen
+            from the variance in headless mode.
+        n_clusters : int
+            Number of KMeans clusters. If None, it is asked for, or chosen
+            at the knee of the WCSS curve in headless mode.
+        variance : float
+            Fraction of the explained variance covered by the components
+            chosen in headless mode
+        headless : bool
+            Whether to run without showing the plots and asking for input
+        elbow : string
+            Method computing the WCSS curve: 'full', 'bisecting' or
+            'minibatch' (see elbow_curve)
+        sample : int
+            Number of rows used to compute the WCSS curve, or None to use
+            all of them
+        workers : int
+            Number of processes computing the WCSS curve
+        max_memory : int or string
+            Memory budget (e.g. '8G'). If passed, the trajectory is read in
+            chunks that fit in the budget (see uml_chunked).
+        energy_rules : list(list(tuple))
+            The rules of the energy filter (see energy_filter)
+        cohort_rules : list(list(tuple))
+            The rules of the cohort filter (see cluster_filter)
+        cache : bool
+            Whether to keep the result of each stage (energy filter,
+            standardization, PCA fits and WCSS curve) in the cache folder
+            beside the input file, keyed by the content of the file and the
+            parameters of the stage. A rerun changing only the number of
+            clusters then goes straight to the final KMeans fit. It is not
+            used in chunked mode.
     """
 
     # Reading data
     print(f" - Read data: {input_file}")
-    full_traj = pd.read_csv(input_file)
+    if fmt is None:
+        fmt = detect_format(input_file)
+    check_format(fmt)
     output_dir = input_file[0:-len(input_file.split("/")[-1])]
     if output_dir == "":
         output_dir = os.getcwd()
+    if max_memory is not None:
+        rows = chunk_rows(max_memory)
+        print(f" - Chunked mode: {rows} rows per chunk")
+        uml_chunked(input_file, output_dir, fmt, n_components, n_clusters, variance, headless, elbow, sample, workers, rows,
+                    energy_rules=energy_rules, cohort_rules=cohort_rules)
+        return
+    full_traj = read_table(input_file)
     print(f"Full Trajectory initial size: {len(full_traj)}")
 
     # Initial Cleaning and Featurization
@@ -334,20 +1634,38 @@ def uml_analysis(input_file):
     full_traj = filter_data(full_traj)
     full_traj = create_features(full_traj)
 
+    # Statistics saved by prepare_inputs, if they still describe the data
+    stats = trajectory_stats(input_file, len(full_traj))
+
     # ------------ STEP 1: Energy Filtering ------------
     print(" - STEP 1: Energy Filtering")
     # Energy Filtering
-    filtered = energy_filter(full_traj)
+    stages = open_stages(output_dir, input_file) if cache else None
+    params = [data_cuts(), energy_rules, stats is not None]
+    cached = load_stage(stages, 'filter', params)
+    if cached is None:
+        index, energy_thresholds = filter_steps(full_traj, energy_rules, stats)
+        save_stage(stages, 'filter', params, {'index': index, **{f"step{i}": t for i, t in enumerate(energy_thresholds)}})
+    else:
+        print("Using the cached energy filter.")
+        index, energy_thresholds = cached['index'], [cached[f"step{i}"] for i in range(len(energy_rules))]
+    stages = next_stages(stages, 'filter', params)
+    filtered = full_traj.iloc[index]
     filtered.reset_index(inplace=True)
 
     # ------------- STEP 2: PCA+Clustering -------------
     print(" - STEP 2: PCA + Clustering")
     # PCA
-    pca_ana, pca_std, pca, scores_pca, PCA_variance, n_components = create_pca_dataset(filtered, output_dir)
+    scaling = {}
+    pca_ana, pca_std, pca, scores_pca, PCA_variance, n_components = create_pca_dataset(
+        filtered, output_dir, n_components=n_components, variance=variance, headless=headless, stages=stages,
+        scaling=scaling)
+    stages = next_stages(next_stages(stages, 'scaler', PCA_COLUMNS), 'pca', [n_components])
 
     # KMeans Clustering
-    n_clusters = 3
-    df_segm_pca_kmeans, km = create_pca_kmeans_clustering(pca_ana, scores_pca, filtered, output_dir, n_components=n_components, N_CLUSTERS=n_clusters)
+    df_segm_pca_kmeans, km = create_pca_kmeans_clustering(
+        pca_ana, scores_pca, filtered, output_dir, n_components=n_components, N_CLUSTERS=n_clusters, headless=headless,
+        elbow=elbow, sample=sample, workers=workers, stages=stages)
 
     # Cluster Selection
     means_Etot, index_minEtot = get_min_cluster_index(df_segm_pca_kmeans, 'etot')
@@ -361,13 +1679,22 @@ def uml_analysis(input_file):
     # ---------------- STEP 3: Cohort ----------------
     print(" - STEP 3: Cohort")
     # Filter after PCA analysis
-    cohort = cluster_filter(cluster)
+    index, cohort_thresholds = filter_steps(cluster, cohort_rules)
+    cohort = cluster.iloc[index]
 
     # Save datasets
     print(" - Saving datasets")
     print(f"Filtered size: {len(filtered)}")
-    filtered.to_csv(f"{output_dir}/Filtered_Data.csv",  index=False)
+    ext = FORMATS[fmt]
+    write_table(filtered, f"{output_dir}/Filtered_Data{ext}",  fmt)
     print(f"Cluster size: {len(cluster)}")
-    cluster.to_csv( f"{output_dir}/Select_Cluster.csv", index=False)
+    write_table(cluster,  f"{output_dir}/Select_Cluster{ext}", fmt)
     print(f"Cohort size: {len(cohort)}")
-    cohort.to_csv(  f"{output_dir}/Final_Cohort.csv",   index=False)
\ No newline at end of file
+    write_table(cohort,   f"{output_dir}/Final_Cohort{ext}",   fmt)
+
+    # Fitted model, to classify new trajectories with uml_apply
+    save_uml_model(f"{output_dir}/{UML_MODEL}", {
+        'scaler_mean': scaling['mean'], 'scaler_scale': scaling['scale'], 'pca_mean': pca.mean_,
+        'components': pca.components_, 'variance': pca.explained_variance_ratio_, 'centers': km.cluster_centers_,
+        'cluster': int(index_minGo[len('Cluster'):]), 'energy_rules': energy_rules,
+        'energy_thresholds': energy_thresholds, 'cohort_rules': cohort_rules, 'cohort_thresholds': cohort_thresholds})
\ No newline at end of file
@@ -0,0 +1,28 @@
+import os
+import unittest
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.arguments import pop_arg
+
+class TestPopArg(unittest.TestCase):
+
+    def test_pop_arg(self):
+        args = ['file.csv', '-w', '4', '--format', 'parquet']
+        value, args = pop_arg(args, ['-w', '--workers'])
+        self.assertEqual(value, '4')
+        self.assertEqual(args, ['file.csv', '--format', 'parquet'])
+        value, args = pop_arg(args, ['-f', '--format'])
+        self.assertEqual(value, 'parquet')
+        self.assertEqual(args, ['file.csv'])
+
+    def test_pop_arg_missing(self):
+        value, args = pop_arg(['file.csv'], ['-w', '--workers'])
+        self.assertIsNone(value)
+        self.assertEqual(args, ['file.csv'])
+
+    def test_pop_arg_no_value(self):
+        with self.assertRaises(ValueError):
+            pop_arg(['file.csv', '-w'], ['-w', '--workers'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import numpy as np
+import pandas as pd
+import unittest
+import unittest.mock
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.cache import CACHE_DIR, evict_arrays, open_stages, load_stage, save_stage, load_table, save_table
+
+class TestEvictArrays(unittest.TestCase):
+
+    def setUp(self):
+        self.path = '.data_test'
+        if (not os.path.exists(self.path)):
+            os.mkdir(self.path)
+        self.file = f"{self.path}/Full_Trajectory.csv"
+        pd.DataFrame({'etot': [-1., -2.], 'frame': [0, 1]}).to_csv(self.file, index=False)
+        self.folder = f"{self.path}/{CACHE_DIR}"
+
+    def tearDown(self):
+        os.system(f"rm -rf {self.path}")
+
+    def test_evict_arrays(self):
+        stages = open_stages(self.path, self.file)
+        files = []
+        for i in range(3):
+            save_stage(stages, 'filter', [i], {'index': np.arange(1000)})
+            files += [f for f in os.listdir(self.folder) if f.endswith('.npz') and f not in files]
+        save_table(self.path, self.file, pd.read_csv(self.file))
+        files += [f for f in os.listdir(self.folder) if f.endswith('.npz') and f not in files]
+        self.assertEqual(len(files), 4)
+        for i, f in enumerate(files):
+            os.utime(f"{self.folder}/{f}", ns=(i*10**9, i*10**9))
+
+        # The least recently used ones are removed first, and a load marks a
+        # file as used
+        self.assertIsNotNone(load_stage(stages, 'filter', [0]))
+        size = sum(os.path.getsize(f"{self.folder}/{f}") for f in files)
+        evict_arrays(self.folder, max_size=size - 1)
+        left = [f for f in files if os.path.exists(f"{self.folder}/{f}")]
+        self.assertEqual(left, [files[0], files[2], files[3]])
+        self.assertIsNotNone(load_table(self.path, self.file))
+
+        # The kept file stays, even beyond the size
+        evict_arrays(self.folder, keep=files[2], max_size=0)
+        self.assertEqual([f for f in os.listdir(self.folder) if f.endswith('.npz')], [files[2]])
+
+    def test_evict_arrays_save(self):
+        # Storing a stage evicts beyond the cache size, other files are kept
+        stages = open_stages(self.path, self.file)
+        with unittest.mock.patch('hornet.cache.CACHE_SIZE', 0):
+            save_stage(stages, 'filter', [0], {'index': np.arange(1000)})
+            save_stage(stages, 'filter', [1], {'index': np.arange(1000)})
+        self.assertIsNone(load_stage(stages, 'filter', [0]))
+        self.assertIsNotNone(load_stage(stages, 'filter', [1]))
+        self.assertTrue(os.path.exists(f"{self.folder}/hashes.json"))
+
+    def test_evict_arrays_removed(self):
+        # Files removed by another process while evicting are skipped
+        stages = open_stages(self.path, self.file)
+        for i in range(3):
+            save_stage(stages, 'filter', [i], {'index': np.arange(1000)})
+        files = sorted(f for f in os.listdir(self.folder) if f.endswith('.npz'))
+        stat = os.stat
+        def removed_stat(name, *args, **kwargs):
+            if name.endswith(files[0]):
+                raise FileNotFoundError(name)
+            return stat(name, *args, **kwargs)
+        with unittest.mock.patch('hornet.cache.os.stat', side_effect=removed_stat), \
+                unittest.mock.patch('hornet.cache.os.remove', side_effect=FileNotFoundError):
+            evict_arrays(self.folder, max_size=0)
+
+if __name__ == '__main__':
+    unittest.main()
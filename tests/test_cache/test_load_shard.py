@@ -0,0 +1,52 @@
+import os
+import pandas as pd
+import unittest
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.cache import load_index, save_index, load_shard, save_shard, CACHE_DIR
+
+class TestLoadShard(unittest.TestCase):
+
+    def setUp(self):
+        self.path = '.data_test'
+        if (not os.path.exists(self.path)):
+            os.mkdir(self.path)
+        self.files = [f"{self.path}/en_allk1.txt", f"{self.path}/bases_k1.csv"]
+        for file in self.files:
+            with open(file, 'w') as f:
+                f.write("1\n")
+        self.df = pd.DataFrame({'frame': [0, 1], 'etot': [-1.5, -2.5]})
+
+    def tearDown(self):
+        os.system(f"rm -rf {self.path}")
+
+    def test_load_shard(self):
+        index = load_index(self.path)
+        self.assertEqual(index, {})
+        save_shard(self.path, index, self.files, [-1, -1], self.df)
+        save_index(self.path, index)
+
+        index = load_index(self.path)
+        df = load_shard(self.path, index, self.files, [-1, -1])
+        self.assertTrue(df.equals(self.df))
+
+    def test_load_shard_invalid(self):
+        index = {}
+        save_shard(self.path, index, self.files, [-1, -1], self.df)
+
+        # Different parameters
+        self.assertIsNone(load_shard(self.path, index, self.files, [88, 192]))
+
+        # Modified dependency
+        with open(self.files[1], 'w') as f:
+            f.write("12\n")
+        self.assertIsNone(load_shard(self.path, index, self.files, [-1, -1]))
+
+    def test_save_index_removes_shards(self):
+        index = {}
+        save_shard(self.path, index, self.files, [-1, -1], self.df)
+        save_index(self.path, {})
+        self.assertEqual([f for f in os.listdir(f"{self.path}/{CACHE_DIR}") if f.endswith('.pkl')], [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import os
+import numpy as np
+import pandas as pd
+import unittest
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.cache import open_stages, next_stages, load_stage, save_stage
+
+class TestLoadStage(unittest.TestCase):
+
+    def setUp(self):
+        self.path = '.data_test'
+        if (not os.path.exists(self.path)):
+            os.mkdir(self.path)
+        self.file = f"{self.path}/Full_Trajectory.csv"
+        pd.DataFrame({'etot': [-1., -2.], 'frame': [0, 1]}).to_csv(self.file, index=False)
+
+    def tearDown(self):
+        os.system(f"rm -rf {self.path}")
+
+    def test_load_stage(self):
+        stages = open_stages(self.path, self.file)
+        self.assertIsNone(load_stage(stages, 'filter', [1]))
+        save_stage(stages, 'filter', [1], {'index': np.arange(3)})
+        self.assertTrue(np.array_equal(load_stage(stages, 'filter', [1])['index'], np.arange(3)))
+
+        # Other parameters, or an earlier stage with other parameters, miss
+        self.assertIsNone(load_stage(stages, 'filter', [2]))
+        save_stage(next_stages(stages, 'filter', [1]), 'pca', [8], {'mean': np.zeros(2)})
+        self.assertIsNotNone(load_stage(next_stages(stages, 'filter', [1]), 'pca', [8]))
+        self.assertIsNone(load_stage(next_stages(stages, 'filter', [2]), 'pca', [8]))
+
+        # Nothing is cached without stages
+        self.assertIsNone(load_stage(None, 'filter', [1]))
+        self.assertIsNone(next_stages(None, 'filter', [1]))
+
+    def test_load_stage_modified(self):
+        # The stages are keyed by the content of the file
+        save_stage(open_stages(self.path, self.file), 'filter', [1], {'index': np.arange(3)})
+        pd.DataFrame({'etot': [-1., -3.], 'frame': [0, 1]}).to_csv(self.file, index=False)
+        self.assertIsNone(load_stage(open_stages(self.path, self.file), 'filter', [1]))
+
+if __name__ == '__main__':
+    unittest.main()
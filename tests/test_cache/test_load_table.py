@@ -0,0 +1,38 @@
+import os
+import pandas as pd
+import unittest
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.cache import load_table, save_table
+
+class TestLoadTable(unittest.TestCase):
+
+    def setUp(self):
+        self.path = '.data_test'
+        if (not os.path.exists(self.path)):
+            os.mkdir(self.path)
+        self.file = f"{self.path}/bases_k1.csv"
+        self.df = pd.DataFrame({'base_pair': [5, 6], 'base_stack': [10, 12], 'frame': [0, 1], 'kapa': [1, 1]})
+        self.df.to_csv(self.file, index=False)
+
+    def tearDown(self):
+        os.system(f"rm -rf {self.path}")
+
+    def test_load_table(self):
+        self.assertIsNone(load_table(self.path, self.file))
+        save_table(self.path, self.file, self.df)
+        self.assertTrue(load_table(self.path, self.file).equals(self.df))
+
+    def test_load_table_modified(self):
+        save_table(self.path, self.file, self.df)
+        self.df.iloc[:1].to_csv(self.file, index=False)
+        self.assertIsNone(load_table(self.path, self.file))
+
+    def test_save_table_text(self):
+        # Tables with text columns are not stored
+        df = self.df.assign(name=['a', 'b'])
+        save_table(self.path, self.file, df)
+        self.assertIsNone(load_table(self.path, self.file))
+
+if __name__ == '__main__':
+    unittest.main()
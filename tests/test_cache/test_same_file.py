@@ -0,0 +1,44 @@
+import os
+import unittest
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.cache import fingerprint, same_file
+
+class TestSameFile(unittest.TestCase):
+
+    def setUp(self):
+        self.path = '.data_test'
+        if (not os.path.exists(self.path)):
+            os.mkdir(self.path)
+        self.file = f"{self.path}/en_allk1.txt"
+        with open(self.file, 'w') as f:
+            f.write("#all 1 2 3\n")
+
+    def tearDown(self):
+        os.system(f"rm -rf {self.path}")
+
+    def test_unchanged(self):
+        fp = fingerprint(self.file)
+        self.assertTrue(same_file(fp, self.file))
+
+    def test_touched(self):
+        # Only the modification time changed
+        fp = fingerprint(self.file)
+        os.utime(self.file, ns=(fp['mtime'] + 10**9, fp['mtime'] + 10**9))
+        self.assertTrue(same_file(fp, self.file))
+        self.assertEqual(fp['mtime'], os.stat(self.file).st_mtime_ns)
+
+    def test_modified(self):
+        fp = fingerprint(self.file)
+        with open(self.file, 'w') as f:
+            f.write("#all 1 2 4\n")
+        os.utime(self.file, ns=(fp['mtime'] + 10**9, fp['mtime'] + 10**9))
+        self.assertFalse(same_file(fp, self.file))
+
+    def test_removed(self):
+        fp = fingerprint(self.file)
+        os.remove(self.file)
+        self.assertFalse(same_file(fp, self.file))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import numpy as np
+import unittest
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.input import fetch_frames, get_input_data, FRAME_INDEX, MANIFEST
+
+class TestFetchFrames(unittest.TestCase):
+
+    def setUp(self):
+        origin = os.path.dirname(os.path.realpath(__file__)) + "/../test_data"
+        self.path = '.data_test'
+        if (not os.path.exists(self.path)):
+            os.mkdir(self.path)
+        os.system(f"cp {origin}/en_allk*.txt {self.path}")
+        os.system(f"cp {origin}/bases_k*.csv {self.path}")
+
+    def tearDown(self):
+        os.system(f"rm -rf {self.path}")
+
+    def test_fetch_frames(self):
+        df = get_input_data(self.path, frame_index=True)
+        self.assertTrue(os.path.exists(f"{self.path}/en_allk22.txt{FRAME_INDEX}"))
+        df = df[df['kapa'] == 22].iloc[2500:2510]
+        df_fetched = fetch_frames(self.path, 22, range(2500, 2510))
+        self.assertEqual(list(df_fetched['frame']), list(df['frame']))
+        self.assertTrue(np.allclose(df_fetched['etot'], df['etot']))
+
+    def test_fetch_frames_builds_index(self):
+        df_fetched = fetch_frames(self.path, 14, [3, 1])
+        self.assertEqual(list(df_fetched['frame']), [1, 3])
+        self.assertTrue(os.path.exists(f"{self.path}/en_allk14.txt{FRAME_INDEX}"))
+
+    def test_fetch_frames_invalid_kappa(self):
+        with self.assertRaises(FileExistsError):
+            fetch_frames(self.path, 99, [1])
+
+    def test_fetch_frames_replicas(self):
+        # The run without a suffix is replica 0 once the kappa has replicas
+        os.system(f"cp {self.path}/en_allk14.txt {self.path}/en_allk14_r2.txt")
+        df_fetched = fetch_frames(self.path, 14, [1, 3])
+        self.assertEqual(list(df_fetched['replica']), [0, 0])
+        self.assertTrue(df_fetched.drop(columns='replica').equals(fetch_frames(self.path, 14, [1, 3], replica=2)
+                                                                  .drop(columns='replica')))
+        # Kappas with replicas only must be given one
+        os.system(f"mv {self.path}/en_allk22.txt {self.path}/en_allk22_r1.txt")
+        with self.assertRaises(ValueError):
+            fetch_frames(self.path, 22, [1])
+        self.assertEqual(list(fetch_frames(self.path, 22, [1], replica=1)['replica']), [1])
+
+    def test_fetch_frames_scan(self):
+        # Reading frames from a kappa-scan root does not write its manifest
+        os.makedirs(f"{self.path}/scan/k14/output")
+        os.system(f"cp {self.path}/en_allk14.txt {self.path}/scan/k14/output/md.ts")
+        df_fetched = fetch_frames(f"{self.path}/scan", 14, [1, 3])
+        self.assertEqual(list(df_fetched['frame']), [1, 3])
+        self.assertFalse(os.path.exists(f"{self.path}/scan/{MANIFEST}"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import pandas as pd
+import unittest
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.input import find_kappas, get_input_data, fetch_frames
+
+class TestFindKappas(unittest.TestCase):
+
+    def setUp(self):
+        self.origin = os.path.dirname(os.path.realpath(__file__)) + "/../test_data"
+        self.path = '.data_test'
+        if (not os.path.exists(self.path)):
+            os.mkdir(self.path)
+
+        # Kappa 14 was run twice, the first run without a replica suffix
+        for k in [14, 22]:
+            os.system(f"cp {self.origin}/en_allk{k}.txt {self.origin}/bases_k{k}.csv {self.path}")
+        os.system(f"cp {self.origin}/en_allk14.txt {self.path}/en_allk14_r1.txt")
+        os.system(f"cp {self.origin}/bases_k14.csv {self.path}/bases_k14_r1.csv")
+
+    def tearDown(self):
+        os.system(f"rm -rf {self.path}")
+
+    def test_find_kappas(self):
+        runs = find_kappas(self.path)
+        self.assertEqual(list(runs), ['14_r0', '14_r1', '22_r0'])
+        self.assertEqual(runs['14_r1'], [f"{self.path}/en_allk14_r1.txt", f"{self.path}/bases_k14_r1.csv"])
+        self.assertEqual(runs['14_r0'], [f"{self.path}/en_allk14.txt", f"{self.path}/bases_k14.csv"])
+
+    def test_find_kappas_without_replicas(self):
+        runs = find_kappas(self.origin)
+        self.assertEqual(list(runs), ['14', '22'])
+
+    def test_find_kappas_duplicated_replica(self):
+        os.system(f"cp {self.path}/en_allk14.txt {self.path}/en_allk14_r0.txt")
+        with self.assertRaises(ValueError):
+            find_kappas(self.path)
+
+    def test_get_input_data_replicas(self):
+        df = get_input_data(self.path, workers=2)
+        df_single = get_input_data(self.origin)
+        self.assertEqual(sorted(df.groupby(['kapa', 'replica']).groups), [(14, 0), (14, 1), (22, 0)])
+        self.assertTrue(df[df['replica'] == 0].drop(columns='replica').equals(df_single))
+        self.assertFalse('replica' in df_single.columns)
+
+    def test_fetch_frames_replica(self):
+        df = fetch_frames(self.path, 14, [3, 1], replica=1)
+        self.assertEqual(list(df['frame']), [1, 3])
+        self.assertTrue((df['replica'] == 1).all())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,9 +2,11 @@ import os
 import pandas as pd
 import numpy as np
 import unittest
+import unittest.mock
 import sys
 sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
 from hornet.input import get_input_data
+from hornet.parser import read_ts
 
 class TestGetInputData(unittest.TestCase):
 
@@ -91,5 +93,64 @@ class TestGetInputData(unittest.TestCase):
         self.assertTrue(df['baseP'].unique() == [2])
         self.assertTrue(df['baseS'].unique() == [3])
 
+    def test_workers(self):
+        # Test that parallel reading matches the serial one
+        df = get_input_data(self.path)
+        df_parallel = get_input_data(self.path, workers=2)
+        self.assertTrue(df.equals(df_parallel))
+        self.assertEqual(list(df_parallel['kapa']), [1, 2])
+
+    def test_cache(self):
+        # Test that only modified files are parsed again
+        df = get_input_data(self.path, cache=True)
+        with open(f"{self.path}/bases_k2.csv", "w") as f:
+            f.write("base_pair,base_stack,frame,kapa\n"
+                    "7,14,0,2\n")
+        with unittest.mock.patch('hornet.input.read_ts', wraps=read_ts) as read_patch:
+            df_cached = get_input_data(self.path, cache=True)
+            self.assertEqual(read_patch.call_count, 1)
+        self.assertTrue(df.iloc[:1].equals(df_cached.iloc[:1]))
+        self.assertEqual(list(df_cached['baseP']), [5, 7])
+
+    def test_cache_replica(self):
+        # Test that a replica added between two cached runs renames the
+        # cached kappas as replica 0
+        get_input_data(self.path, cache=True)
+        os.system(f"cp {self.path}/en_allk1.txt {self.path}/en_allk1_r2.txt")
+        with open(f"{self.path}/bases_k1_r2.csv", "w") as f:
+            f.write("base_pair,base_stack,frame,kapa\n"
+                    "7,14,0,1\n")
+        df_cached = get_input_data(self.path, cache=True)
+        df = get_input_data(self.path)
+        self.assertTrue(df_cached.equals(df))
+        self.assertEqual(list(df_cached['replica']), [0, 2, 0])
+        self.assertEqual(df_cached['replica'].dtype, np.int64)
+
+    def test_cache_frame_index(self):
+        # Test that the cached kappas are also indexed
+        get_input_data(self.path, cache=True)
+        self.assertFalse(os.path.exists(f"{self.path}/en_allk1.txt.frames.npy"))
+        get_input_data(self.path, cache=True, frame_index=True)
+        for k in [1, 2]:
+            self.assertTrue(os.path.exists(f"{self.path}/en_allk{k}.txt.frames.npy"))
+
+    def test_compressed(self):
+        # Test that compressed files are read in place
+        df = get_input_data(self.path)
+        os.system(f"gzip {self.path}/en_allk2.txt {self.path}/bases_k2.csv")
+        df_compressed = get_input_data(self.path)
+        self.assertTrue(df.equals(df_compressed))
+
+    def test_cuts(self):
+        # Test that the kappas cut are not read
+        with unittest.mock.patch('hornet.input.read_ts', wraps=read_ts) as read_patch:
+            df = get_input_data(self.path, cuts=[('kapa', '<', 2), ('etot', '>', 0)])
+            self.assertEqual(read_patch.call_count, 1)
+        self.assertEqual(list(df['kapa']), [1])
+        df = get_input_data(self.path, cuts=[('etot', '<', 0)])
+        self.assertEqual(len(df), 0)
+        with self.assertRaises(ValueError):
+            get_input_data(self.path, cuts=[('kapa', '>', 2)])
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,44 @@
+import os
+import numpy as np
+import pandas as pd
+import unittest
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.input import join_bases
+
+class TestJoinBases(unittest.TestCase):
+
+    def setUp(self):
+        self.df1 = pd.DataFrame({'etot': [-1., -2., -3., -4.], 'frame': [0, 1, 2, 3], 'kapa': 1})
+        # Bases are not always sorted by frame
+        self.df2 = pd.DataFrame({
+            'baseP': [7, 5, 6, 8], 'baseS': [14, 10, 12, 16],
+            'native': [3, 1, 2, 4], 'frame': [2, 0, 1, 3], 'kapa': 1})
+
+    def test_join_bases(self):
+        df = join_bases(self.df1.copy(), self.df2)
+        expected = self.df1.merge(self.df2, how='left', on=['frame', 'kapa'])
+        pd.testing.assert_frame_equal(df, expected)
+        self.assertEqual(list(df['baseP']), [5, 6, 7, 8])
+
+    def test_join_bases_missing_frames(self):
+        # Frames without bases get NaN, as in the merge
+        df = join_bases(self.df1.copy(), self.df2.iloc[:2])
+        expected = self.df1.merge(self.df2.iloc[:2], how='left', on=['frame', 'kapa'])
+        pd.testing.assert_frame_equal(df, expected)
+        self.assertTrue(np.isnan(df['baseP'].iloc[1]))
+
+    def test_join_bases_index(self):
+        # The index of the records is kept
+        df1 = self.df1.iloc[[1, 3]]
+        df = join_bases(df1.copy(), self.df2)
+        self.assertEqual(list(df.index), [1, 3])
+        self.assertEqual(list(df['baseS']), [12, 16])
+
+    def test_join_bases_duplicated_frames(self):
+        df2 = pd.concat([self.df2, self.df2.iloc[:1]])
+        df = join_bases(self.df1.copy(), df2)
+        self.assertEqual(len(df), 5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,22 @@
+import os
+import unittest
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.input import parse_size
+
+class TestParseSize(unittest.TestCase):
+
+    def test_parse_size(self):
+        self.assertEqual(parse_size('8G'), 8*1024**3)
+        self.assertEqual(parse_size('512M'), 512*1024**2)
+        self.assertEqual(parse_size('1.5kb'), 1536)
+        self.assertEqual(parse_size(1000), 1000)
+
+    def test_parse_size_invalid(self):
+        with self.assertRaises(ValueError):
+            parse_size('eight')
+        with self.assertRaises(ValueError):
+            parse_size('0G')
+
+if __name__ == '__main__':
+    unittest.main()
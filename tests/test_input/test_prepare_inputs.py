@@ -83,6 +83,7 @@ class TestPrepareInputs(unittest.TestCase):
         self.assertTrue(len(df) == 3)
         self.assertTrue(df['baseP'].unique() == [5])
         self.assertTrue(df['baseS'].unique() == [10])
+        self.assertTrue(os.path.exists(f"{self.path}/Full_Trajectory_stats.json"))
     
     def test_custom_parameters(self):
         # Test with custom parameters
@@ -95,5 +96,23 @@ class TestPrepareInputs(unittest.TestCase):
         self.assertTrue(df['baseP'].unique() == [2])
         self.assertTrue(df['baseS'].unique() == [3])
 
+    def test_max_memory_all_cut(self):
+        # Test that the chunked mode saves the columns when no record is left
+        with open(f"{self.path}/en_allk1.txt", "r") as f:
+            header = ''.join(line for line in f if not line.startswith('#all'))
+        with open(f"{self.path}/en_allk1.txt", "w") as f:
+            f.write(header)
+        os.remove(f"{self.path}/en_allk55.txt")
+        for fmt in ['csv', 'parquet']:
+            prepare_inputs(self.path, fmt=fmt)
+            expected = pd.read_csv(f"{self.path}/Full_Trajectory.csv") if fmt == 'csv' \
+                else pd.read_parquet(f"{self.path}/Full_Trajectory.parquet")
+            prepare_inputs(self.path, fmt=fmt, max_memory='512K')
+            df = pd.read_csv(f"{self.path}/Full_Trajectory.csv") if fmt == 'csv' \
+                else pd.read_parquet(f"{self.path}/Full_Trajectory.parquet")
+            self.assertEqual(len(df), 0)
+            self.assertEqual(list(df.columns), list(expected.columns))
+            self.assertIn('baseP', df.columns)
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
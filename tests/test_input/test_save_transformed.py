@@ -56,6 +56,31 @@ class TestSaveTransformed(unittest.TestCase):
         with open(f"{self.path}/{name}.csv", 'r') as file:
             lines = file.readlines()
             self.assertTrue(len(lines) == n_lines_without_star)
-        
+
+    def test_save_transformed_parquet(self):
+        # Create a test DataFrame
+        df = pd.DataFrame({'col1': ['1', '2', '3'], 'col2': ['4', '*', '6']})
+
+        name = 'FullTrajectory'
+        save_transformed(df, path=self.path, name=name, fmt='parquet')
+
+        # Check if the file is saved in the correct path without problematic entries
+        self.assertTrue(os.path.exists(f"{self.path}/{name}.parquet"))
+        df_saved = pd.read_parquet(f"{self.path}/{name}.parquet")
+        self.assertEqual(list(df_saved['col1']), ['1', '3'])
+
+    def test_save_transformed_temporary_files(self):
+        # The file is replaced at once, without leaving temporary files
+        df = pd.DataFrame({'col1': ['1', '2', '3'], 'col2': ['4', '*', '6']})
+        name = 'FullTrajectory'
+        with open(f"{self.path}/{name}.csv", 'w') as f:
+            f.write("old\n")
+        os.system(f"rm -r {self.tmp}")
+        save_transformed(df, path=self.path, name=name)
+        self.assertEqual(os.listdir(self.path), [f"{name}.csv"])
+        self.assertFalse(os.path.exists(self.tmp))
+        self.assertEqual(list(pd.read_csv(f"{self.path}/{name}.csv")['col1']), [1, 3])
+        os.mkdir(self.tmp)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,58 @@
+import os
+import json
+import pandas as pd
+import unittest
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.input import scan_kappas, get_input_data, MANIFEST
+
+class TestScanKappas(unittest.TestCase):
+
+    def setUp(self):
+        self.origin = os.path.dirname(os.path.realpath(__file__)) + "/../test_data"
+        self.path = '.data_test'
+
+        # Kappa-scan layout: k<kappa>/output/*.ts
+        for k in [14, 22]:
+            os.makedirs(f"{self.path}/k{k}/output", exist_ok=True)
+            os.system(f"cp {self.origin}/en_allk{k}.txt {self.path}/k{k}/output/md.ts")
+        os.system(f"cp {self.origin}/bases_k14.csv {self.path}")
+        os.system(f"cp {self.origin}/bases_k22.csv {self.path}/k22/output")
+        os.makedirs(f"{self.path}/k30/input", exist_ok=True)
+
+    def tearDown(self):
+        os.system(f"rm -rf {self.path}")
+
+    def test_scan_kappas(self):
+        runs = scan_kappas(self.path)
+        self.assertEqual(list(runs), ['14', '22'])
+        self.assertEqual(runs['14'], [f"{self.path}/k14/output/md.ts", f"{self.path}/bases_k14.csv"])
+        self.assertEqual(runs['22'], [f"{self.path}/k22/output/md.ts", f"{self.path}/k22/output/bases_k22.csv"])
+
+    def test_scan_kappas_without_bases(self):
+        runs = scan_kappas(self.path, 88, 192)
+        self.assertEqual(runs['14'], [f"{self.path}/k14/output/md.ts"])
+
+    def test_scan_kappas_multiple_ts(self):
+        os.system(f"cp {self.path}/k14/output/md.ts {self.path}/k14/output/md2.ts")
+        with self.assertRaises(ValueError):
+            scan_kappas(self.path)
+
+    def test_scan_kappas_replicas(self):
+        os.makedirs(f"{self.path}/k14_r2/output", exist_ok=True)
+        os.system(f"cp {self.path}/k14/output/md.ts {self.path}/k14_r2/output/md.ts")
+        runs = scan_kappas(self.path, 88, 192)
+        self.assertEqual(list(runs), ['14_r0', '14_r2', '22_r0'])
+        self.assertEqual(runs['14_r2'], [f"{self.path}/k14_r2/output/md.ts"])
+
+    def test_get_input_data_scan(self):
+        # Reading in place matches reading the copied files
+        df = get_input_data(self.path)
+        df_copied = get_input_data(self.origin)
+        self.assertTrue(df.equals(df_copied))
+        with open(f"{self.path}/{MANIFEST}") as f:
+            manifest = json.load(f)
+        self.assertEqual([r['kappa'] for r in manifest['runs']], [14, 22])
+
+if __name__ == '__main__':
+    unittest.main()
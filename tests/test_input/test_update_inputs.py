@@ -0,0 +1,123 @@
+import os, gzip
+import pandas as pd
+import unittest
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.input import update_inputs, follow_inputs
+
+HEADER = """# initial_energy
+# total_energy =       23758.206
+# t_series
+#########################################################
+#           step    tempk     radg       etot      velet qscore     rmsd
+#unit       step    tempk     radg       etot      velet qscore     rmsd      local         go      repul  stack_rna      hbond      elect      afmcc     afmfit      stage
+#########################################################
+"""
+
+def record(i):
+    return f"#all           {i}   298.00    38.41   -1     679.46  0.664     0.00   {i}    -1       0.76    3655.32    1736.39     249.66  0.8183924    1208.90      -0.63\n"
+
+class TestUpdateInputs(unittest.TestCase):
+
+    def setUp(self):
+        self.path = '.data_test'
+
+        # Create temporary dir
+        if (not os.path.exists(self.path)):
+            os.mkdir(self.path)
+
+        self.ts = f"{self.path}/output_k1.ts"
+        with open(self.ts, "w") as f:
+            f.write(HEADER)
+            for i in range(2005):
+                f.write(record(i))
+            # Line still being written
+            f.write(record(2005)[:40])
+
+    def tearDown(self):
+        os.system(f"rm -rf {self.path}")
+
+    def test_update_inputs(self):
+        n = update_inputs(self.path, 2, 3)
+        self.assertEqual(n, 4)
+        df = pd.read_csv(f"{self.path}/Live_Trajectory.csv")
+        self.assertEqual(list(df['frame']), [2001, 2002, 2003, 2004])
+
+        # Complete the line and append new records
+        with open(self.ts, "a") as f:
+            f.write(record(2005)[40:])
+            f.write(record(2006))
+        n = update_inputs(self.path, 2, 3)
+        self.assertEqual(n, 2)
+        df = pd.read_csv(f"{self.path}/Live_Trajectory.csv")
+        self.assertEqual(list(df['frame']), [2001, 2002, 2003, 2004, 2005, 2006])
+        self.assertEqual(list(df['step']), list(df['frame']))
+        self.assertTrue(df['baseP'].unique() == [2])
+
+    def test_update_inputs_bases(self):
+        # Records without bases are held until they are available
+        with open(f"{self.path}/bases_k1.csv", "w") as f:
+            f.write("base_pair,base_stack,frame,kapa\n")
+            for i in range(2003):
+                f.write(f"5,10,{i},1\n")
+        n = update_inputs(self.path)
+        self.assertEqual(n, 2)
+        with open(f"{self.path}/bases_k1.csv", "a") as f:
+            for i in range(2003, 2010):
+                f.write(f"5,10,{i},1\n")
+        n = update_inputs(self.path)
+        self.assertEqual(n, 2)
+        df = pd.read_csv(f"{self.path}/Live_Trajectory.csv")
+        self.assertEqual(list(df['frame']), [2001, 2002, 2003, 2004])
+        self.assertTrue(df['baseP'].unique() == [5])
+
+    def test_update_inputs_files(self):
+        # The files written next to the time series are not read
+        for ext in ['data', 'pdb', 'dcd', 'ninfo']:
+            with open(f"{self.path}/output_k1.{ext}", "w") as f:
+                f.write("not a time series\n")
+        n = update_inputs(self.path, 2, 3)
+        self.assertEqual(n, 4)
+
+        # Compressed time series, and a header not written yet
+        with gzip.open(f"{self.path}/output_k2.ts.gz", "wt") as f:
+            f.write(HEADER)
+            for i in range(2003):
+                f.write(record(i))
+        open(f"{self.path}/output_k3.ts", "w").close()
+        n = update_inputs(self.path, 2, 3)
+        self.assertEqual(n, 2)
+        df = pd.read_csv(f"{self.path}/Live_Trajectory.csv")
+        self.assertEqual(list(df['kapa']), [1, 1, 1, 1, 2, 2])
+        self.assertEqual(list(df['frame']), [2001, 2002, 2003, 2004, 2001, 2002])
+        self.assertEqual(update_inputs(self.path, 2, 3), 0)
+
+        # A corrupted time series is reported
+        with open(f"{self.path}/output_k3.ts", "w") as f:
+            f.write(HEADER)
+            f.write("#all 1 2 3\n")
+        with self.assertRaises(ValueError):
+            update_inputs(self.path, 2, 3)
+
+    def test_update_inputs_replica(self):
+        update_inputs(self.path, 2, 3)
+        # A replica adds a column to the rows already written
+        with open(f"{self.path}/output_k1_r1.ts", "w") as f:
+            f.write(HEADER)
+            for i in range(2003):
+                f.write(record(i))
+        n = update_inputs(self.path, 2, 3)
+        self.assertEqual(n, 2)
+        df = pd.read_csv(f"{self.path}/Live_Trajectory.csv")
+        self.assertEqual(len(df), 6)
+        self.assertEqual(list(df['replica']), [0, 0, 0, 0, 1, 1])
+        self.assertEqual(list(df['frame']), [2001, 2002, 2003, 2004, 2001, 2002])
+        self.assertFalse(df.isna().any().any())
+
+    def test_follow_inputs(self):
+        calls = []
+        follow_inputs(self.path, 2, 3, interval=0, iterations=2, callback=calls.append)
+        self.assertEqual(calls, [f"{self.path}/Live_Trajectory.csv"])
+
+if __name__ == "__main__":
+    unittest.main()
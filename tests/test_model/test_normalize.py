@@ -5,6 +5,7 @@ import unittest
 import sys
 sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
 from hornet.model import normalize
+from hornet.storage import compact_table, write_table, read_table
 
 class TestNormalize(unittest.TestCase):
     
@@ -35,5 +36,29 @@ class TestNormalize(unittest.TestCase):
         df_result = normalize(self.df, n_residues)
         self.assertTrue(expected_df.equals(df_result))
 
+    def test_normalize_compact(self):
+        # Compact parquet tables keep integer kappas, whose product with a
+        # realistic number of beads does not fit in 16 bits
+        path = '.data_test'
+        if not os.path.exists(path):
+            os.mkdir(path)
+        try:
+            df = pd.DataFrame({
+                'etot': [-1500., -1600.], 'local': [700., 800.], 'go': [-300., -400.], 'repul': [10., 20.],
+                'stack': [-50., -60.], 'hbond': [-70., -80.], 'elect': [90., 100.],
+                'afmfit': [1500., 1700.], 'afmcc': [0.8, 0.9], 'frame': [2001, 2002],
+                'baseP': [40, 41], 'baseS': [60, 61], 'kapa': [14, 22]})
+            write_table(compact_table(df), f"{path}/Full_Trajectory.parquet", 'parquet')
+            df_compact = read_table(f"{path}/Full_Trajectory.parquet")
+            expected = normalize(df.astype('float64'), 800)
+            df_result = normalize(df_compact, 800)
+        finally:
+            os.system(f"rm -rf {path}")
+        self.assertTrue((df_result['afmfit'] > 0).all())
+        self.assertTrue(np.allclose(df_result['afmfit'], expected['afmfit'], rtol=1e-6))
+        # 16-bit kappas are also normalized in floating point
+        df_int16 = normalize(df.astype({'kapa': 'int16'}), 800)
+        self.assertTrue(np.allclose(df_int16['afmfit'], expected['afmfit']))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
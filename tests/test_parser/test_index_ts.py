@@ -0,0 +1,33 @@
+import os
+import unittest
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.parser import index_ts, read_frames, read_ts
+
+class TestIndexTs(unittest.TestCase):
+
+    def setUp(self):
+        self.original = os.path.dirname(os.path.realpath(__file__)) + "/../test_data/en_allk14.txt"
+        self.df = read_ts(self.original)
+
+    def test_index_ts(self):
+        index = index_ts(self.original, block_size=4096)
+        self.assertEqual(len(index), len(self.df))
+        with open(self.original, 'rb') as f:
+            f.seek(index[10])
+            self.assertTrue(f.readline().startswith(b'#all'))
+
+    def test_read_frames(self):
+        index = index_ts(self.original)
+        frames = [7, 0, 1, 2, 500, len(self.df) - 1]
+        df = read_frames(self.original, frames, index)
+        self.assertEqual(list(df.index), sorted(frames))
+        self.assertTrue(df.equals(self.df.loc[sorted(frames)]))
+
+    def test_read_frames_out_of_range(self):
+        index = index_ts(self.original)
+        with self.assertRaises(IndexError):
+            read_frames(self.original, [len(self.df)], index)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,28 @@
+import os
+import pandas as pd
+import unittest
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.parser import iter_ts, read_ts
+
+class TestIterTs(unittest.TestCase):
+
+    def setUp(self):
+        self.original = os.path.dirname(os.path.realpath(__file__)) + "/../test_data/en_allk14.txt"
+
+    def test_iter_ts(self):
+        # The chunks hold the same records as the whole file
+        df = read_ts(self.original)
+        chunks = list(iter_ts(self.original, block_size=4096))
+        self.assertTrue(len(chunks) > 1)
+        self.assertTrue(df.equals(pd.concat(chunks).reset_index(drop=True)))
+        self.assertEqual(chunks[-1].index[-1], len(df) - 1)
+
+    def test_iter_ts_cuts(self):
+        cuts = [('frame', '>', 2000), ('etot', '<', 0), ('go', '<', 0)]
+        df = read_ts(self.original, cuts=cuts)
+        df_chunks = pd.concat(iter_ts(self.original, block_size=4096, cuts=cuts))
+        self.assertTrue(df.equals(df_chunks))
+
+if __name__ == '__main__':
+    unittest.main()
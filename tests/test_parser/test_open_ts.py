@@ -0,0 +1,52 @@
+import os
+import gzip
+import lzma
+import unittest
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.parser import open_ts, read_ts, split_ts
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+class TestOpenTs(unittest.TestCase):
+
+    def setUp(self):
+        self.path = '.data_test'
+        self.original = os.path.dirname(os.path.realpath(__file__)) + "/../test_data/en_allk14.txt"
+        if (not os.path.exists(self.path)):
+            os.mkdir(self.path)
+        with open(self.original, 'rb') as f:
+            self.content = f.read()
+        with gzip.open(f"{self.path}/en_allk14.txt.gz", 'wb') as f:
+            f.write(self.content)
+        with lzma.open(f"{self.path}/en_allk14.txt.xz", 'wb') as f:
+            f.write(self.content)
+
+    def tearDown(self):
+        os.system(f"rm -rf {self.path}")
+
+    def test_open_ts(self):
+        for ext in ['.gz', '.xz']:
+            with open_ts(f"{self.path}/en_allk14.txt{ext}") as f:
+                self.assertEqual(f.read(), self.content)
+
+    def test_read_ts_compressed(self):
+        df = read_ts(self.original)
+        for ext in ['.gz', '.xz']:
+            filename = f"{self.path}/en_allk14.txt{ext}"
+            # Compressed files are parsed in a single range
+            self.assertEqual(len(split_ts(filename, 3)[1]), 1)
+            self.assertTrue(df.equals(read_ts(filename, block_size=4096, workers=3)))
+
+    @unittest.skipIf(zstandard is None, "zstandard is not installed")
+    def test_read_ts_zstd(self):
+        filename = f"{self.path}/en_allk14.txt.zst"
+        with open(filename, 'wb') as f:
+            f.write(zstandard.ZstdCompressor().compress(self.content))
+        self.assertTrue(read_ts(self.original).equals(read_ts(filename, block_size=4096)))
+
+if __name__ == '__main__':
+    unittest.main()
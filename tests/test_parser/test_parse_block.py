@@ -0,0 +1,39 @@
+import unittest
+import numpy as np
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.parser import parse_block
+
+class TestParseBlock(unittest.TestCase):
+
+    def test_parse_block(self):
+        block = (b"       0   1.5   2.5\n"
+                 b"#all    0   1.5   2.5\n"
+                 b"#all    1   -3.25   4\n")
+        values, last_record = parse_block(block, 3)
+        self.assertEqual(values.dtype, np.float64)
+        self.assertTrue(np.array_equal(values, [[0, 1.5, 2.5], [1, -3.25, 4]]))
+        self.assertTrue(last_record)
+
+    def test_parse_block_overflow(self):
+        block = (b"#all    0   1.5   2.5\n"
+                 b"#all    1   *****   4\n"
+                 b"#all    2   5.5   6.5")
+        values, last_record = parse_block(block, 3)
+        self.assertTrue(np.array_equal(values, [[0, 1.5, 2.5], [2, 5.5, 6.5]]))
+        self.assertTrue(last_record)
+
+    def test_parse_block_no_records(self):
+        values, last_record = parse_block(b"#\n  1  2  3\n", 3)
+        self.assertEqual(values.shape, (0, 3))
+        self.assertFalse(last_record)
+        values, last_record = parse_block(b"  1  2  3\n", 3)
+        self.assertIsNone(last_record)
+
+    def test_parse_block_malformed(self):
+        with self.assertRaises(ValueError):
+            parse_block(b"#all    0   1.5\n", 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import io
+import unittest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.parser import read_header
+
+HEADER = b"""# initial_energy
+# total_energy =       23758.206
+# t_series
+#########################################################
+#           step    tempk     radg       etot      velet qscore     rmsd
+#unit       step    tempk     radg       etot      velet qscore     rmsd      local         go      repul  stack_rna      hbond      elect      afmcc     afmfit      stage
+#########################################################
+"""
+
+class TestReadHeader(unittest.TestCase):
+
+    def test_read_header(self):
+        ts_file = io.BytesIO(HEADER)
+        columns = read_header(ts_file)
+        self.assertEqual(columns, [
+            'step', 'tempk', 'radg', 'etot', 'velet', ' qscore', 'rmsd_C', 'local',
+            'go', 'repul', 'stack', 'hbond', 'elect', 'afmcc', 'afmfit', 'stage'])
+        self.assertTrue(ts_file.readline().startswith(b'####'))
+
+    def test_read_header_no_unit(self):
+        with self.assertRaises(ValueError):
+            read_header(io.BytesIO(b"# initial_energy\n#all 1 2 3\n"))
+
+if __name__ == '__main__':
+    unittest.main()
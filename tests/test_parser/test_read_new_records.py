@@ -0,0 +1,62 @@
+import os, gzip
+import unittest
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.parser import read_new_records, read_ts
+
+class TestReadNewRecords(unittest.TestCase):
+
+    def setUp(self):
+        self.path = '.data_test'
+        self.original = os.path.dirname(os.path.realpath(__file__)) + "/../test_data/en_allk14.txt"
+        if (not os.path.exists(self.path)):
+            os.mkdir(self.path)
+        with open(self.original, 'rb') as f:
+            self.data = f.read()
+
+    def tearDown(self):
+        os.system(f"rm -rf {self.path}")
+
+    def test_read_new_records(self):
+        df, offsets, end = read_new_records(self.original, block_size=4096)
+        # The last record is kept
+        self.assertEqual(len(df), len(read_ts(self.original)) + 1)
+        self.assertEqual(end, len(self.data))
+        self.assertTrue(all(self.data[o:o+4] == b'#all' for o in offsets[:100]))
+
+    def test_read_new_records_offset(self):
+        df, offsets, end = read_new_records(self.original)
+        df_new, _, end_new = read_new_records(self.original, offsets[10])
+        self.assertTrue(df_new.equals(df.iloc[10:].reset_index(drop=True)))
+        self.assertEqual(end_new, end)
+
+    def test_read_new_records_partial(self):
+        df, offsets, _ = read_new_records(self.original)
+        partial = f"{self.path}/output_k14.ts"
+        with open(partial, 'wb') as f:
+            f.write(self.data[:offsets[50] + 20])
+        df_partial, _, end = read_new_records(partial)
+        self.assertEqual(len(df_partial), 50)
+        self.assertTrue(end <= offsets[50])
+
+    def test_read_new_records_compressed(self):
+        df, offsets, end = read_new_records(self.original)
+        compressed = f"{self.path}/output_k14.ts.gz"
+        with gzip.open(compressed, 'wb') as f:
+            f.write(self.data)
+        df_gz, offsets_gz, end_gz = read_new_records(compressed, offsets[10], block_size=4096)
+        self.assertTrue(df_gz.equals(df.iloc[10:].reset_index(drop=True)))
+        self.assertTrue((offsets_gz == offsets[10:]).all())
+        self.assertEqual(end_gz, end)
+
+        # Stream still being written
+        with open(compressed, 'rb') as f:
+            stream = f.read()
+        with open(compressed, 'wb') as f:
+            f.write(stream[:len(stream)//2])
+        df_gz, _, end_gz = read_new_records(compressed, block_size=4096)
+        self.assertTrue(0 < len(df_gz) < len(df))
+        self.assertTrue(df_gz.equals(df.iloc[:len(df_gz)]))
+
+if __name__ == '__main__':
+    unittest.main()
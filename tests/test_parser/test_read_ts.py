@@ -0,0 +1,92 @@
+import os
+import numpy as np
+import pandas as pd
+import unittest
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.parser import read_ts, iter_ts
+
+class TestReadTs(unittest.TestCase):
+
+    def setUp(self):
+        self.path = '.data_test'
+        self.original = os.path.dirname(os.path.realpath(__file__)) + "/../test_data/en_allk14.txt"
+
+        # Create temporary dir
+        if (not os.path.exists(self.path)):
+            os.mkdir(self.path)
+
+        file1 = open(f"{self.path}/en_allk1.txt", "w")
+        file1.write(
+"""# initial_energy
+# total_energy =       23758.206
+# t_series
+#########################################################
+#           step    tempk     radg       etot      velet qscore     rmsd
+#unit       step    tempk     radg       etot      velet qscore     rmsd      local         go      repul  stack_rna      hbond      elect      afmcc     afmfit      stage
+#########################################################
+               0   298.00    38.41   23758.21     679.46  0.664     0.00
+#all           0   298.00    38.41   23758.21     679.46  0.664     0.00   12186.94    4720.03       0.76    3655.32    1736.39     249.66  0.8183924    1208.90      -0.63
+#all         100   298.00    38.44    3272.43    7736.82  0.605     1.76    6409.90    -209.32       4.33   -2329.18   -2045.66  *******  0.8221521    1183.88      -0.71
+#all         200   298.00    38.48    2413.87    7170.94  0.532     2.61    5705.19    -162.49       4.54   -2170.61   -2359.37     261.15  0.8293005    1136.29      -1.66
+#""")
+        file1.close()
+
+    def tearDown(self):
+        os.system(f"rm -rf {self.path}")
+
+    def test_read_ts(self):
+        df = read_ts(f"{self.path}/en_allk1.txt")
+        self.assertIsInstance(df, pd.DataFrame)
+        self.assertEqual(len(df), 2)
+        self.assertEqual(list(df['step']), [0, 200])
+        self.assertEqual(df.columns[5], ' qscore')
+        self.assertTrue((df.dtypes == np.float64).all())
+
+    def test_read_ts_last_record(self):
+        # The last '#' line of the file is discarded
+        df = read_ts(self.original)
+        self.assertEqual(len(df), 10001)
+        self.assertEqual(df['step'].iloc[-1], 999900)
+
+    def test_read_ts_block_size(self):
+        df = read_ts(self.original)
+        df_blocks = read_ts(self.original, block_size=4096)
+        self.assertTrue(df.equals(df_blocks))
+
+    def test_read_ts_workers(self):
+        df = read_ts(self.original)
+        df_parallel = read_ts(self.original, workers=3)
+        self.assertTrue(df.equals(df_parallel))
+
+    def test_read_ts_cuts(self):
+        # The cuts match filtering the whole file, keeping the frames as index
+        cuts = [('frame', '>', 2000), ('etot', '<', 0), ('go', '<', 0), ('kapa', '<', 50)]
+        df = read_ts(self.original)
+        df = df[(df.index > 2000) & (df['etot'] < 0) & (df['go'] < 0)]
+        for workers in [1, 3]:
+            df_cut = read_ts(self.original, block_size=4096, workers=workers, cuts=cuts)
+            pd.testing.assert_frame_equal(df_cut, df, check_index_type=False)
+
+    def test_read_ts_truncated(self):
+        # A last line cut while being written is dropped, as the last line is
+        with open(f"{self.path}/en_allk1.txt") as f:
+            content = f.read()
+        lines = content.split("\n")[:-1]
+        with open(f"{self.path}/en_allk2.txt", "w") as f:
+            f.write("\n".join(lines) + "\n" + lines[-1][:40])
+        for block_size in [64, 1 << 20]:
+            df = read_ts(f"{self.path}/en_allk2.txt", block_size=block_size)
+            self.assertEqual(len(df), 2)
+            self.assertEqual(list(df['step']), [0, 200])
+            df = pd.concat(iter_ts(f"{self.path}/en_allk2.txt", block_size=block_size))
+            self.assertEqual(list(df['step']), [0, 200])
+
+        # Malformed records in the middle of the file are still errors
+        with open(f"{self.path}/en_allk3.txt", "w") as f:
+            f.write("\n".join(lines[:-1] + [lines[-1][:40]] + lines[-1:]) + "\n#")
+        with self.assertRaises(ValueError):
+            read_ts(f"{self.path}/en_allk3.txt")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import os
+import unittest
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.parser import split_ts, parse_range
+
+class TestSplitTs(unittest.TestCase):
+
+    def setUp(self):
+        self.original = os.path.dirname(os.path.realpath(__file__)) + "/../test_data/en_allk14.txt"
+
+    def test_split_ts(self):
+        columns, ranges = split_ts(self.original, 4)
+        self.assertEqual(len(columns), 16)
+        self.assertEqual(len(ranges), 4)
+        self.assertEqual(ranges[-1][1], os.path.getsize(self.original))
+        with open(self.original, 'rb') as ts_file:
+            for start, end in ranges:
+                ts_file.seek(start - 1)
+                self.assertEqual(ts_file.read(1), b'\n')
+
+    def test_split_ts_records(self):
+        # Ranges cover all of the records exactly once
+        columns, ranges = split_ts(self.original, 7)
+        n_records = sum(len(parse_range(self.original, start, end, len(columns))[0]) for start, end in ranges)
+        self.assertEqual(n_records, 10002)
+
+    def test_split_ts_more_ranges_than_lines(self):
+        columns, ranges = split_ts(self.original, 100000)
+        self.assertTrue(len(ranges) < 100000)
+        for (_, end), (start, _) in zip(ranges[:-1], ranges[1:]):
+            self.assertEqual(end, start)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../scripts")
+from follow_inputs import args
+
+class TestFollowInputs(unittest.TestCase):
+
+    # Test help option
+    @patch('follow_inputs.help')
+    def test_help_option(self, mock_help):
+        argslist = ['follow_inputs.py', '-h']
+        with self.assertRaises(SystemExit) as cm:
+            args(argslist)
+        self.assertEqual(cm.exception.code, 0)
+        mock_help.assert_called()
+
+    # Test no input directory provided
+    @patch('follow_inputs.help')
+    def test_no_input_provided(self, mock_help):
+        argslist = ['follow_inputs.py', '-i', '10']
+        with self.assertRaises(SystemExit) as cm:
+            args(argslist)
+        self.assertEqual(cm.exception.code, 1)
+        mock_help.assert_called()
+
+    # Test default values
+    def test_defaults(self):
+        argslist = ['follow_inputs.py', 'project']
+        path, bp, bs, prefix, interval, iterations, model, residues = args(argslist)
+        self.assertEqual(path.split("/")[-1], 'project')
+        self.assertEqual((bp, bs), (-1, -1))
+        self.assertEqual(prefix, 'output_k')
+        self.assertEqual(interval, 60)
+        self.assertIsNone(iterations)
+        self.assertIsNone(model)
+
+    # Test all options
+    def test_options(self):
+        argslist = ['follow_inputs.py', 'project', '88', '192', '-p', 'en_allk', '-i', '5',
+                    '-n', '3', '-m', 'model', '-r', '268']
+        path, bp, bs, prefix, interval, iterations, model, residues = args(argslist)
+        self.assertEqual((bp, bs), (88, 192))
+        self.assertEqual(prefix, 'en_allk')
+        self.assertEqual(interval, 5)
+        self.assertEqual(iterations, 3)
+        self.assertEqual(model.split("/")[-1], 'model')
+        self.assertEqual(residues, 268)
+
+    # Test model without residues
+    def test_model_without_residues(self):
+        argslist = ['follow_inputs.py', 'project', '-m', 'model']
+        with self.assertRaises(ValueError):
+            args(argslist)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,7 +6,7 @@ import os
 import sys
 sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
 sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../scripts")
-from prepare_inputs import args, prepare_inputs
+from prepare_inputs import args, prepare_inputs, prepare_batch
 
 class TestPrepareInputs(unittest.TestCase):
 
@@ -49,10 +49,13 @@ class TestPrepareInputs(unittest.TestCase):
     # Test input file provided
     def test_input_file_provided(self):
         argslist = ['prepare_inputs.py', 'file.txt']
-        input_file, bp, bs = args(argslist)
+        input_file, bp, bs, workers, fmt, cache, compact, drop_unused, max_memory, frame_index = args(argslist)
         self.assertTrue(input_file.split("/")[-1], 'file.txt')
         self.assertEqual(bp, -1)
         self.assertEqual(bs, -1)
+        self.assertEqual(workers, 1)
+        self.assertEqual(fmt, 'csv')
+        self.assertFalse(cache)
         
     # Test no input file provided
     @patch('prepare_inputs.help')
@@ -67,7 +70,7 @@ class TestPrepareInputs(unittest.TestCase):
     @patch('prepare_inputs.help')
     def test_bp_and_bs_input_provided(self, mock_help):
         argslist = ['prepare_inputs.py', 'file.txt', '1', '2']
-        input_file, bp, bs = args(argslist)
+        input_file, bp, bs, workers, fmt, cache, compact, drop_unused, max_memory, frame_index = args(argslist)
         self.assertEqual(input_file.split("/")[-1], 'file.txt')
         self.assertEqual(bp, 1)
         self.assertEqual(bs, 2)
@@ -83,20 +86,135 @@ class TestPrepareInputs(unittest.TestCase):
         
     def test_prepare_inputs_averaged(self):
         argslist = ['prepare_inputs.py', self.input_path, '88', '192']
-        input_file, bp, bs = args(argslist)
+        input_file, bp, bs, workers, fmt, cache, compact, drop_unused, max_memory, frame_index = args(argslist)
 
-        prepare_inputs(input_file, bp, bs)
+        prepare_inputs(input_file, bp, bs, workers, fmt, cache)
 
         self.assertTrue(os.path.exists(f"{self.input_path}/Full_Trajectory.csv"))
         
     def test_prepare_inputs(self):
         argslist = ['prepare_inputs.py', self.input_path]
-        input_file, bp, bs = args(argslist)
+        input_file, bp, bs, workers, fmt, cache, compact, drop_unused, max_memory, frame_index = args(argslist)
 
-        prepare_inputs(input_file, bp, bs)
+        prepare_inputs(input_file, bp, bs, workers, fmt, cache)
 
         self.assertTrue(os.path.exists(f"{self.input_path}/Full_Trajectory.csv"))
         self.assertTrue(len(pd.read_csv(f"{self.input_path}/Full_Trajectory.csv")) == len(pd.read_csv(self.full_trajectory)))
-        
+
+    # Test workers provided
+    def test_workers_provided(self):
+        argslist = ['prepare_inputs.py', 'file.txt', '--workers', '4', '1', '2']
+        input_file, bp, bs, workers, fmt, cache, compact, drop_unused, max_memory, frame_index = args(argslist)
+        self.assertEqual(input_file.split("/")[-1], 'file.txt')
+        self.assertEqual(bp, 1)
+        self.assertEqual(bs, 2)
+        self.assertEqual(workers, 4)
+
+    # Test invalid workers
+    def test_invalid_workers(self):
+        argslist = ['prepare_inputs.py', 'file.txt', '-w', 'four']
+        with self.assertRaises(ValueError):
+            args(argslist)
+
+    def test_prepare_inputs_workers(self):
+        argslist = ['prepare_inputs.py', self.input_path, '-w', '2']
+        input_file, bp, bs, workers, fmt, cache, compact, drop_unused, max_memory, frame_index = args(argslist)
+
+        prepare_inputs(input_file, bp, bs, workers, fmt, cache)
+
+        self.assertTrue(os.path.exists(f"{self.input_path}/Full_Trajectory.csv"))
+        self.assertTrue(len(pd.read_csv(f"{self.input_path}/Full_Trajectory.csv")) == len(pd.read_csv(self.full_trajectory)))
+
+    # Test invalid format
+    def test_invalid_format(self):
+        argslist = ['prepare_inputs.py', 'file.txt', '--format', 'xlsx']
+        with self.assertRaises(ValueError):
+            args(argslist)
+
+    def test_prepare_inputs_parquet(self):
+        argslist = ['prepare_inputs.py', self.input_path, '-f', 'parquet']
+        input_file, bp, bs, workers, fmt, cache, compact, drop_unused, max_memory, frame_index = args(argslist)
+
+        prepare_inputs(input_file, bp, bs, workers, fmt, cache)
+
+        self.assertTrue(os.path.exists(f"{self.input_path}/Full_Trajectory.parquet"))
+        self.assertTrue(len(pd.read_parquet(f"{self.input_path}/Full_Trajectory.parquet")) == len(pd.read_csv(self.full_trajectory)))
+
+    def test_prepare_inputs_cache(self):
+        argslist = ['prepare_inputs.py', self.input_path, '--cache']
+        input_file, bp, bs, workers, fmt, cache, compact, drop_unused, max_memory, frame_index = args(argslist)
+        self.assertTrue(cache)
+
+        prepare_inputs(input_file, bp, bs, workers, fmt, cache)
+        self.assertTrue(os.path.exists(f"{self.input_path}/.hornet_cache/index.json"))
+        df = pd.read_csv(f"{self.input_path}/Full_Trajectory.csv")
+
+        # Second run uses the cached kappas
+        prepare_inputs(input_file, bp, bs, workers, fmt, cache)
+        df_cached = pd.read_csv(f"{self.input_path}/Full_Trajectory.csv")
+        self.assertTrue(df.equals(df_cached))
+
+    def test_prepare_inputs_compact(self):
+        argslist = ['prepare_inputs.py', self.input_path, '-f', 'parquet', '--compact', '-d']
+        input_file, bp, bs, workers, fmt, cache, compact, drop_unused, max_memory, frame_index = args(argslist)
+        self.assertTrue(compact)
+        self.assertTrue(drop_unused)
+
+        prepare_inputs(input_file, bp, bs, workers, fmt, cache, compact=compact, drop_unused=drop_unused)
+        df = pd.read_parquet(f"{self.input_path}/Full_Trajectory.parquet")
+        self.assertEqual(len(df), len(pd.read_csv(self.full_trajectory)))
+        self.assertEqual(df['etot'].dtype, 'float32')
+        self.assertEqual(df['kapa'].dtype, 'int32')
+        self.assertNotIn('velet', df.columns)
+
+    # Test invalid memory budget
+    def test_invalid_max_memory(self):
+        argslist = ['prepare_inputs.py', 'file.txt', '--max-memory', 'lots']
+        with self.assertRaises(ValueError):
+            args(argslist)
+
+    def test_prepare_inputs_max_memory(self):
+        prepare_inputs(self.input_path)
+        with open(f"{self.input_path}/Full_Trajectory.csv") as f:
+            expected = f.read()
+
+        argslist = ['prepare_inputs.py', self.input_path, '-m', '512K']
+        input_file, bp, bs, workers, fmt, cache, compact, drop_unused, max_memory, frame_index = args(argslist)
+        self.assertEqual(max_memory, '512K')
+        prepare_inputs(input_file, bp, bs, workers, fmt, cache, max_memory=max_memory)
+        with open(f"{self.input_path}/Full_Trajectory.csv") as f:
+            self.assertEqual(f.read(), expected)
+
+    def test_prepare_inputs_index(self):
+        argslist = ['prepare_inputs.py', self.input_path, '--index']
+        input_file, bp, bs, workers, fmt, cache, compact, drop_unused, max_memory, frame_index = args(argslist)
+        self.assertTrue(frame_index)
+
+        prepare_inputs(input_file, bp, bs, workers, fmt, cache, frame_index=frame_index)
+        self.assertTrue(os.path.exists(f"{self.input_path}/en_allk14.txt.frames.npy"))
+        self.assertTrue(os.path.exists(f"{self.input_path}/en_allk22.txt.frames.npy"))
+
+    def test_batch_provided(self):
+        argslist = ['prepare_inputs.py', '--batch', 'P*,other', '88', '192']
+        path, bp, bs, workers, fmt, cache, compact, drop_unused, max_memory, frame_index = args(argslist)
+        self.assertEqual([p.split("/")[-1] for p in path], ['P*', 'other'])
+        self.assertEqual(bp, 88)
+        self.assertEqual(bs, 192)
+
+    def test_prepare_batch(self):
+        for project in ['P1', 'P2']:
+            os.makedirs(f"{self.input_path}/{project}")
+            os.system(f"cp {self.input_path}/*.txt {self.input_path}/*.csv {self.input_path}/{project}")
+        os.makedirs(f"{self.input_path}/P3")
+        argslist = ['prepare_inputs.py', '-b', f"{self.input_path}/P*", '-w', '2']
+        path, bp, bs, workers, fmt, cache, compact, drop_unused, max_memory, frame_index = args(argslist)
+
+        # The empty project fails without stopping the others
+        failed = prepare_batch(path, bp, bs, workers, fmt, cache)
+        self.assertEqual([p.split("/")[-1] for p in failed], ['P3'])
+        for project in ['P1', 'P2']:
+            df = pd.read_csv(f"{self.input_path}/{project}/Full_Trajectory.csv")
+            self.assertEqual(len(df), len(pd.read_csv(self.full_trajectory)))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -52,8 +52,53 @@ class TestUmlAnalysis(unittest.TestCase):
     # Test input file provided
     def test_input_file_provided(self):
         argslist = ['uml_analysis.py', 'file.txt']
-        input_file = args(argslist)
+        input_file, n_components, n_clusters, variance, headless, elbow, sample, workers, max_memory, model_file, cache = args(argslist)
         self.assertEqual(input_file, 'file.txt')
+        self.assertIsNone(n_components)
+        self.assertIsNone(n_clusters)
+        self.assertFalse(headless)
+
+    # Test headless options
+    def test_auto_options(self):
+        argslist = ['uml_analysis.py', 'file.txt', '-a', '-c', '4', '--variance', '0.7']
+        input_file, n_components, n_clusters, variance, headless, elbow, sample, workers, max_memory, model_file, cache = args(argslist)
+        self.assertEqual(input_file, 'file.txt')
+        self.assertIsNone(n_components)
+        self.assertEqual(n_clusters, 4)
+        self.assertEqual(variance, 0.7)
+        self.assertTrue(headless)
+
+    # Test elbow options
+    def test_elbow_options(self):
+        argslist = ['uml_analysis.py', 'file.txt', '-e', 'bisecting', '--sample', '5000']
+        elbow, sample, workers = args(argslist + ['-w', '4'])[-6:-3]
+        self.assertEqual(elbow, 'bisecting')
+        self.assertEqual(sample, 5000)
+        self.assertEqual(workers, 4)
+        self.assertEqual(args(['uml_analysis.py', 'file.txt'])[-6:], ('full', None, 1, None, None, False))
+        with self.assertRaises(ValueError):
+            args(['uml_analysis.py', 'file.txt', '-e', 'fast'])
+
+    # Test memory budget
+    def test_max_memory(self):
+        self.assertEqual(args(['uml_analysis.py', 'file.txt', '-m', '8G'])[-3], '8G')
+        with self.assertRaises(ValueError):
+            args(['uml_analysis.py', 'file.txt', '--max-memory', 'lots'])
+
+    # Test apply option
+    def test_apply(self):
+        self.assertEqual(args(['uml_analysis.py', 'file.txt', '--apply', 'UML_model.npz'])[-2], 'UML_model.npz')
+
+    # Test cache option
+    def test_cache(self):
+        input_file, *options, cache = args(['uml_analysis.py', '-k', 'file.txt'])
+        self.assertEqual(input_file, 'file.txt')
+        self.assertTrue(cache)
+
+    # Test invalid variance
+    def test_invalid_variance(self):
+        with self.assertRaises(ValueError):
+            args(['uml_analysis.py', 'file.txt', '-v', '80'])
         
     # Test no input file provided
     @patch('uml_analysis.help')
@@ -67,7 +112,7 @@ class TestUmlAnalysis(unittest.TestCase):
     @patch('hornet.uml.input', create=True)
     def test_uml_analysis(self, mocked_input):
         argslist = ['uml_analysis.py', self.file_path]
-        input_file = args(argslist)
+        input_file = args(argslist)[0]
 
         n_components_mock = '8'
         n_clusters_mock = '3'
@@ -84,5 +129,17 @@ class TestUmlAnalysis(unittest.TestCase):
         self.assertTrue(len(pd.read_csv(f"{self.input_path}/Select_Cluster.csv")) == len(pd.read_csv(self.select_cluster)))
         self.assertTrue(len(pd.read_csv(f"{self.input_path}/Final_Cohort.csv")) == len(pd.read_csv(self.final_cohort)))
         
+    def test_uml_analysis_auto(self):
+        argslist = ['uml_analysis.py', self.file_path, '--auto', '-n', '8', '-c', '3']
+        input_file, n_components, n_clusters, variance, headless, elbow, sample, workers, max_memory, model_file, cache = args(argslist)
+
+        # No input is asked for
+        with patch("hornet.uml.plt.show") as show_patch:
+            uml_analysis(input_file, n_components=n_components, n_clusters=n_clusters, variance=variance, headless=headless)
+            self.assertFalse(show_patch.called)
+
+        self.assertTrue(len(pd.read_csv(f"{self.input_path}/Select_Cluster.csv")) == len(pd.read_csv(self.select_cluster)))
+        self.assertTrue(len(pd.read_csv(f"{self.input_path}/Final_Cohort.csv")) == len(pd.read_csv(self.final_cohort)))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
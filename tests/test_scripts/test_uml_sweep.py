@@ -0,0 +1,55 @@
+import sys
+import unittest
+from unittest.mock import patch
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../scripts")
+from uml_sweep import args
+
+class TestUmlSweep(unittest.TestCase):
+
+    # Test help option
+    @patch('uml_sweep.help')
+    def test_help_option(self, mock_help):
+        argslist = ['uml_sweep.py', '-h']
+        with self.assertRaises(SystemExit) as cm:
+            args(argslist)
+        self.assertEqual(cm.exception.code, 0)
+        mock_help.assert_called()
+
+    # Test default grid
+    def test_input_file_provided(self):
+        argslist = ['uml_sweep.py', 'file.txt']
+        self.assertEqual(args(argslist), ('file.txt', [8], [3], [1.], [1.], 1))
+
+    # Test grid options
+    def test_grid_options(self):
+        argslist = ['uml_sweep.py', 'file.txt', '-n', '6,8', '--clusters', '2,3,4', '-e', '0.5,1',
+                    '--cohort-sigmas', '1.5', '-w', '2']
+        input_file, components, clusters, energy_sigmas, cohort_sigmas, workers = args(argslist)
+        self.assertEqual(components, [6, 8])
+        self.assertEqual(clusters, [2, 3, 4])
+        self.assertEqual(energy_sigmas, [0.5, 1.])
+        self.assertEqual(cohort_sigmas, [1.5])
+        self.assertEqual(workers, 2)
+
+    # Test invalid lists
+    def test_invalid_lists(self):
+        with self.assertRaises(ValueError):
+            args(['uml_sweep.py', 'file.txt', '-n', '6,eight'])
+        with self.assertRaises(ValueError):
+            args(['uml_sweep.py', 'file.txt', '-e', '0,1'])
+        with self.assertRaises(ValueError):
+            args(['uml_sweep.py', 'file.txt', '-k', '1,-1'])
+
+    # Test no input file provided
+    @patch('uml_sweep.help')
+    def test_no_input_file_provided(self, mock_help):
+        with self.assertRaises(SystemExit) as cm:
+            args(['uml_sweep.py'])
+        self.assertEqual(cm.exception.code, 1)
+        mock_help.assert_called()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,3 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
\ No newline at end of file
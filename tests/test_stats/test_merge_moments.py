@@ -0,0 +1,45 @@
+import os
+import numpy as np
+import pandas as pd
+import unittest
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.stats import moments, merge_moments, mean_std
+
+class TestMergeMoments(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.df = pd.DataFrame({'etot': rng.normal(-6000., 50., 300), 'kapa': np.repeat([1, 2, 3], 100)})
+
+    def test_merge_moments(self):
+        merged = merge_moments(moments(self.df).values())
+        mean, std = mean_std(merged, 'etot')
+        self.assertAlmostEqual(mean, self.df['etot'].mean(), places=6)
+        self.assertAlmostEqual(std, self.df['etot'].std(), places=6)
+        self.assertEqual(merged['etot'][0], 300)
+        self.assertEqual(merged['etot'][3], self.df['etot'].min())
+        self.assertEqual(merged['etot'][4], self.df['etot'].max())
+
+    def test_merge_chunks(self):
+        # Merging the chunks of a shard gives the statistics of the whole shard
+        whole = moments(self.df)
+        chunks = [moments(self.df.iloc[i:i+70]) for i in range(0, 300, 70)]
+        for key in whole:
+            merged = merge_moments([c[key] for c in chunks if key in c])
+            np.testing.assert_allclose(merged['etot'], whole[key]['etot'])
+
+    def test_merge_precision(self):
+        # Large values with a small spread keep their standard deviation
+        rng = np.random.default_rng(1)
+        df = pd.DataFrame({'etot': rng.normal(-1e8, 0.01, 3000), 'kapa': np.repeat([1, 2, 3], 1000)})
+        chunks = [moments(df.iloc[i:i+70], by=None)['all'] for i in range(0, 3000, 70)]
+        mean, std = mean_std(merge_moments(chunks), 'etot')
+        self.assertAlmostEqual(mean, df['etot'].mean(), places=4)
+        self.assertAlmostEqual(std/df['etot'].std(), 1., places=6)
+
+    def test_merge_empty(self):
+        self.assertEqual(merge_moments([]), {})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import os
+import numpy as np
+import pandas as pd
+import unittest
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.stats import moments, mean_std, save_moments, load_moments
+
+class TestMoments(unittest.TestCase):
+
+    def setUp(self):
+        self.path = '.data_test'
+        if (not os.path.exists(self.path)):
+            os.mkdir(self.path)
+        self.df = pd.DataFrame({
+            'etot': [1., 2., 4., 8., 16.], 'frame': [0, 1, 2, 0, 1], 'kapa': [1, 1, 1, 2, 2], 'name': list('abcde')})
+
+    def tearDown(self):
+        os.system(f"rm -rf {self.path}")
+
+    def test_moments(self):
+        shards = moments(self.df)
+        self.assertEqual(sorted(shards.keys()), ['1', '2'])
+        self.assertNotIn('name', shards['1'])
+        np.testing.assert_allclose(shards['1']['etot'], [3., 7/3, 42/9, 1., 4.])
+        np.testing.assert_allclose(shards['2']['etot'], [2., 12., 32., 8., 16.])
+
+    def test_mean_std(self):
+        shards = moments(self.df, by=None)
+        mean, std = mean_std(shards['all'], 'etot')
+        self.assertAlmostEqual(mean, self.df['etot'].mean())
+        self.assertAlmostEqual(std, self.df['etot'].std())
+
+    def test_load_moments(self):
+        file = f"{self.path}/Full_Trajectory.csv"
+        self.df.to_csv(file, index=False)
+        self.assertIsNone(load_moments(file))
+        save_moments(file, moments(self.df))
+        self.assertTrue(os.path.exists(f"{self.path}/Full_Trajectory_stats.json"))
+        self.assertEqual(load_moments(file), moments(self.df))
+
+        # Statistics older than the table are ignored
+        os.utime(file, (os.path.getmtime(file) + 10,)*2)
+        self.assertIsNone(load_moments(file))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import os
+import pandas as pd
+import unittest
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.storage import append_csv
+
+class TestAppendCsv(unittest.TestCase):
+
+    def setUp(self):
+        self.path = '.data_test'
+        if (not os.path.exists(self.path)):
+            os.mkdir(self.path)
+        self.filename = f"{self.path}/data.csv"
+
+    def tearDown(self):
+        os.system(f"rm -rf {self.path}")
+
+    def test_append_csv(self):
+        append_csv(self.filename, pd.DataFrame({'frame': [1, 2], 'etot': [-1.5, -2.5]}))
+        # Columns in another order, or missing
+        append_csv(self.filename, pd.DataFrame({'etot': [-3.5], 'frame': [3]}))
+        append_csv(self.filename, pd.DataFrame({'frame': [4]}))
+        df = pd.read_csv(self.filename)
+        self.assertEqual(list(df.columns), ['frame', 'etot'])
+        self.assertEqual(list(df['frame']), [1, 2, 3, 4])
+        self.assertEqual(list(df['etot'][:3]), [-1.5, -2.5, -3.5])
+        self.assertTrue(pd.isna(df['etot'][3]))
+
+    def test_append_csv_new_column(self):
+        append_csv(self.filename, pd.DataFrame({'frame': [1, 2], 'etot': [-1.5, -2.5]}))
+        append_csv(self.filename, pd.DataFrame({'frame': [3], 'replica': [1], 'etot': [-3.5]}), fill={'replica': 0})
+        df = pd.read_csv(self.filename)
+        self.assertEqual(list(df.columns), ['frame', 'etot', 'replica'])
+        self.assertEqual(list(df['replica']), [0, 0, 1])
+        self.assertEqual(list(df['etot']), [-1.5, -2.5, -3.5])
+
+if __name__ == '__main__':
+    unittest.main()
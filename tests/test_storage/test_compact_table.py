@@ -0,0 +1,37 @@
+import os
+import numpy as np
+import pandas as pd
+import unittest
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.storage import compact_table
+
+class TestCompactTable(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'step': [0., 100.], 'tempk': [298., 298.], 'velet': [679.46, 7736.82],
+            'etot': [-1.5, -2.5], 'afmcc': [0.8183924, 0.8221521], 'frame': [0., 1.],
+            'kapa': [14., 14.], 'baseP': [5., np.nan], 'other': ['a', 'b']})
+
+    def test_compact_table(self):
+        df = compact_table(self.df)
+        self.assertEqual(df['etot'].dtype, np.float32)
+        self.assertEqual(df['frame'].dtype, np.int32)
+        self.assertEqual(df['kapa'].dtype, np.int32)
+        self.assertEqual(df['step'].dtype, np.int64)
+        # Columns out of the schema, and integers with NaN, keep their types
+        self.assertEqual(df['afmcc'].dtype, np.float64)
+        self.assertEqual(df['baseP'].dtype, np.float64)
+        self.assertEqual(df['other'].dtype, object)
+        self.assertEqual(list(df.columns), list(self.df.columns))
+
+    def test_compact_table_drop_unused(self):
+        df = compact_table(self.df, drop_unused=True)
+        self.assertNotIn('velet', df.columns)
+        self.assertNotIn('tempk', df.columns)
+        self.assertNotIn('step', df.columns)
+        self.assertIn('etot', df.columns)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import os
+import pandas as pd
+import unittest
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.storage import detect_format
+
+class TestDetectFormat(unittest.TestCase):
+
+    def setUp(self):
+        self.path = '.data_test'
+        if (not os.path.exists(self.path)):
+            os.mkdir(self.path)
+        self.df = pd.DataFrame({'frame': [1, 2, 3], 'etot': [-1.5, -2.5, -3.5]})
+
+    def tearDown(self):
+        os.system(f"rm -rf {self.path}")
+
+    def test_detect_csv(self):
+        self.df.to_csv(f"{self.path}/data.csv", index=False)
+        self.assertEqual(detect_format(f"{self.path}/data.csv"), 'csv')
+
+    def test_detect_parquet(self):
+        # Detection does not rely on the extension
+        self.df.to_parquet(f"{self.path}/data.csv")
+        self.assertEqual(detect_format(f"{self.path}/data.csv"), 'parquet')
+
+    def test_detect_feather(self):
+        self.df.to_feather(f"{self.path}/data.feather")
+        self.assertEqual(detect_format(f"{self.path}/data.feather"), 'feather')
+
+    def test_missing_file(self):
+        with self.assertRaises(FileNotFoundError):
+            detect_format(f"{self.path}/missing.csv")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import os
+import pandas as pd
+import unittest
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.storage import iter_table, read_table, write_table
+
+class TestIterTable(unittest.TestCase):
+
+    def setUp(self):
+        self.path = '.data_test'
+        if (not os.path.exists(self.path)):
+            os.mkdir(self.path)
+        self.df = pd.DataFrame({
+            'frame': [1, 2, 3, 4, 5],
+            'etot': [-1.5, -2.5, -3.5, -4.5, -5.5],
+            'kapa': [14, 14, 22, 22, 22]})
+
+    def tearDown(self):
+        os.system(f"rm -rf {self.path}")
+
+    def test_iter_table(self):
+        # The chunks put together are the table, indexed by position
+        for fmt in ['csv', 'parquet', 'feather']:
+            write_table(self.df, f"{self.path}/data.{fmt}", fmt)
+            chunks = list(iter_table(f"{self.path}/data.{fmt}", rows=2))
+            self.assertEqual([len(df) for df in chunks], [2, 2, 1])
+            self.assertTrue(pd.concat(chunks).equals(read_table(f"{self.path}/data.{fmt}")))
+
+    def test_iter_table_columns(self):
+        for fmt in ['csv', 'parquet', 'feather']:
+            write_table(self.df, f"{self.path}/data.{fmt}", fmt)
+            df = next(iter_table(f"{self.path}/data.{fmt}", columns=['kapa', 'frame', 'rmsd'], rows=3))
+            self.assertEqual(list(df.columns), ['frame', 'kapa'])
+            self.assertEqual(len(df), 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import os
+import pandas as pd
+import unittest
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.storage import read_table, write_table
+
+class TestReadTable(unittest.TestCase):
+
+    def setUp(self):
+        self.path = '.data_test'
+        if (not os.path.exists(self.path)):
+            os.mkdir(self.path)
+        self.df = pd.DataFrame({
+            'frame': [1, 2, 3],
+            'etot': [-1.5, -2.5, -3.5],
+            'kapa': [14, 14, 22]})
+
+    def tearDown(self):
+        os.system(f"rm -rf {self.path}")
+
+    def test_read_table(self):
+        for fmt in ['csv', 'parquet', 'feather']:
+            write_table(self.df, f"{self.path}/data.{fmt}", fmt)
+            df = read_table(f"{self.path}/data.{fmt}")
+            self.assertTrue(df.equals(self.df))
+
+    def test_read_table_columns(self):
+        # Missing columns are ignored and the file order is kept
+        for fmt in ['csv', 'parquet', 'feather']:
+            write_table(self.df, f"{self.path}/data.{fmt}", fmt)
+            df = read_table(f"{self.path}/data.{fmt}", columns=['kapa', 'frame', 'rmsd'])
+            self.assertEqual(list(df.columns), ['frame', 'kapa'])
+            self.assertEqual(len(df), 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import os
+import pandas as pd
+import unittest
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.storage import write_table
+
+class TestWriteTable(unittest.TestCase):
+
+    def setUp(self):
+        self.path = '.data_test'
+        if (not os.path.exists(self.path)):
+            os.mkdir(self.path)
+        self.df = pd.DataFrame({'frame': [1, 2, 3], 'etot': [-1.5, -2.5, -3.5]}, index=[5, 6, 7])
+
+    def tearDown(self):
+        os.system(f"rm -rf {self.path}")
+
+    def test_write_table(self):
+        write_table(self.df, f"{self.path}/data.csv")
+        self.assertTrue(pd.read_csv(f"{self.path}/data.csv").equals(self.df.reset_index(drop=True)))
+        write_table(self.df, f"{self.path}/data.parquet", 'parquet')
+        self.assertTrue(pd.read_parquet(f"{self.path}/data.parquet").equals(self.df.reset_index(drop=True)))
+        write_table(self.df, f"{self.path}/data.feather", 'feather')
+        self.assertTrue(pd.read_feather(f"{self.path}/data.feather").equals(self.df.reset_index(drop=True)))
+
+    def test_write_table_invalid_format(self):
+        with self.assertRaises(ValueError):
+            write_table(self.df, f"{self.path}/data.xlsx", 'xlsx')
+
+if __name__ == '__main__':
+    unittest.main()
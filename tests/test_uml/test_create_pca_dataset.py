@@ -1,11 +1,14 @@
 import unittest
 from unittest import mock
 import os
+import numpy as np
 import pandas as pd
 from sklearn.decomposition import PCA
+from sklearn.preprocessing import StandardScaler
 import sys
 sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
-from hornet.uml import create_pca_dataset
+from hornet.uml import create_pca_dataset, PCA_COLUMNS
+from hornet.cache import open_stages
 
 class TestCreatePcaDataset(unittest.TestCase):
 
@@ -113,5 +116,38 @@ class TestCreatePcaDataset(unittest.TestCase):
         # Testing if the returned number of components is correct
         self.assertEqual(n_components, n_components_mock)
 
+    @mock.patch('hornet.uml.input', create=True)
+    def test_create_pca_dataset_headless(self, mocked_input):
+        with mock.patch("hornet.uml.plt.show") as show_patch:
+            pca_ana, pca_std, pca, scores_pca, PCA_variance, n_components = create_pca_dataset(
+                self.df, self.output_dir, variance=0.99, headless=True)
+            self.assertFalse(show_patch.called)
+        self.assertFalse(mocked_input.called)
+
+        # The components cover the variance
+        self.assertGreaterEqual(PCA_variance['PCA'].sum(), 99.)
+        self.assertLess(PCA_variance['PCA'].iloc[:-1].sum(), 99.)
+        self.assertEqual(scores_pca.shape, (12, n_components))
+
+    @mock.patch('hornet.uml.input', create=True)
+    def test_create_pca_dataset_override(self, mocked_input):
+        with mock.patch("hornet.uml.plt.show") as show_patch:
+            n_components = create_pca_dataset(self.df, self.output_dir, n_components=3)[-1]
+        self.assertFalse(mocked_input.called)
+        self.assertEqual(n_components, 3)
+        with self.assertRaises(ValueError):
+            create_pca_dataset(self.df, self.output_dir, n_components=20, headless=True)
+
+    def test_create_pca_dataset_scaling(self):
+        # The standardization is returned, also when it is read from the cache
+        expected = StandardScaler().fit(self.df[PCA_COLUMNS])
+        self.df.to_csv(f"{self.output_dir}/data.csv", index=False)
+        for i in range(2):
+            scaling = {}
+            stages = open_stages(self.output_dir, f"{self.output_dir}/data.csv")
+            create_pca_dataset(self.df, self.output_dir, n_components=3, headless=True, stages=stages, scaling=scaling)
+            self.assertTrue(np.allclose(scaling['mean'], expected.mean_))
+            self.assertTrue(np.allclose(scaling['scale'], expected.scale_))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
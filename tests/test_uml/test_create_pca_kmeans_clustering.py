@@ -146,5 +146,17 @@ class TestCreatePcaKmeansClustering(unittest.TestCase):
         self.assertTrue(len(unique_clusters) == n_clusters_mock)
         #self.assertEqual(cluster_position, expected_position)
 
+    @mock.patch('hornet.uml.input', create=True)
+    def test_create_pca_kmeans_clustering_headless(self, mocked_input):
+        with mock.patch("hornet.uml.plt.show") as show_patch:
+            df_result, km = create_pca_kmeans_clustering(self.df, self.data, self.df, self.output_dir, headless=True)
+            self.assertFalse(show_patch.called)
+        self.assertFalse(mocked_input.called)
+        self.assertEqual(len(df_result['Segment k-means PCA'].unique()), km.n_clusters)
+
+        # An explicit number of clusters is used without asking
+        df_result, km = create_pca_kmeans_clustering(self.df, self.data, self.df, self.output_dir, N_CLUSTERS=4, headless=True)
+        self.assertEqual(km.n_clusters, 4)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,71 @@
+import unittest
+import os
+import numpy as np
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.uml import elbow_curve, bisecting_wcss, sample_rows, find_knee
+
+class TestElbowCurve(unittest.TestCase):
+
+    def setUp(self):
+        import warnings
+        warnings.filterwarnings(action='ignore', category=FutureWarning)
+
+        # Three well separated blobs
+        rng = np.random.default_rng(0)
+        centers = np.array([[0, 0], [10, 0], [0, 10]])
+        self.X = np.concatenate([c + rng.normal(size=(200, 2)) for c in centers])
+        self.x_range = range(1, 8)
+
+    def test_elbow_curve_full(self):
+        wcss, band = elbow_curve(self.X, self.x_range)
+        self.assertIsNone(band)
+        self.assertEqual(len(wcss), len(self.x_range))
+        self.assertAlmostEqual(wcss[0], ((self.X - self.X.mean(axis=0))**2).sum(), places=3)
+        self.assertEqual(find_knee(self.x_range, wcss), 3)
+
+    def test_elbow_curve_bisecting(self):
+        wcss, band = elbow_curve(self.X, self.x_range, 'bisecting')
+        self.assertIsNone(band)
+        self.assertTrue(all(np.diff(wcss) <= 0))
+        self.assertEqual(find_knee(self.x_range, wcss), 3)
+
+    def test_elbow_curve_minibatch(self):
+        wcss, band = elbow_curve(self.X, self.x_range, 'minibatch', sample=300)
+        self.assertEqual(len(band), len(self.x_range))
+        self.assertEqual(find_knee(self.x_range, wcss), 3)
+
+        # The sample is reproducible
+        self.assertEqual(elbow_curve(self.X, self.x_range, 'minibatch', sample=300)[0], wcss)
+
+    def test_elbow_curve_sample(self):
+        # The WCSS of a sample is scaled to the size of the data
+        wcss = elbow_curve(self.X, self.x_range, sample=300)[0]
+        wcss_full = elbow_curve(self.X, self.x_range)[0]
+        self.assertLess(abs(wcss[0]/wcss_full[0] - 1), 0.1)
+
+    def test_elbow_curve_workers(self):
+        # The parallel sweep gives the same curve
+        for method in ['full', 'minibatch']:
+            wcss, band = elbow_curve(self.X, self.x_range, method, sample=300)
+            wcss_pool, band_pool = elbow_curve(self.X, self.x_range, method, sample=300, workers=2, threads=1)
+            np.testing.assert_allclose(wcss_pool, wcss)
+            self.assertEqual(band is None, band_pool is None)
+
+    def test_elbow_curve_invalid(self):
+        with self.assertRaises(ValueError):
+            elbow_curve(self.X, self.x_range, 'fast')
+
+    def test_bisecting_wcss_small(self):
+        # Runs out of clusters to split
+        wcss = bisecting_wcss(self.X[:3], 5)
+        self.assertEqual(len(wcss), 5)
+        self.assertEqual(wcss[-1], 0)
+
+    def test_sample_rows(self):
+        self.assertIs(sample_rows(self.X), self.X)
+        self.assertEqual(sample_rows(self.X, 10).shape, (10, 2))
+        self.assertTrue((sample_rows(self.X, 10, seed=1) == sample_rows(self.X, 10, seed=1)).all())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,6 +5,7 @@ import unittest
 import sys
 sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
 from hornet.uml import energy_filter
+from hornet.stats import moments, merge_moments
 
 class TestEnergyFilter(unittest.TestCase):
 
@@ -34,5 +35,11 @@ class TestEnergyFilter(unittest.TestCase):
         filtered_df = energy_filter(self.df)
         self.assertTrue(filtered_df.reset_index(drop=True).equals(self.expected_output))
 
+    def test_energy_filter_partial_stats(self):
+        # The columns without statistics are computed from the data
+        stats = merge_moments(moments(self.df[['repul', 'hbond']], by=None).values())
+        filtered_df = energy_filter(self.df, stats)
+        self.assertTrue(filtered_df.reset_index(drop=True).equals(self.expected_output))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
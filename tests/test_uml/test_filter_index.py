@@ -0,0 +1,45 @@
+import os
+import pandas as pd
+import numpy as np
+import unittest
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.uml import filter_index, energy_filter, ENERGY_RULES
+
+class TestFilterIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'repul': [1, 2, 3, 4, 5, 6],
+            'afmcc': [6, 5, 4, 3, 2, 1],
+            'name': ['a', 'b', 'c', 'd', 'e', 'f']},
+            index=[10, 11, 12, 13, 14, 15])
+
+    def test_filter_index(self):
+        # The second step uses the statistics of the entries kept by the first
+        steps = [[('repul', '<', 0.)], [('afmcc', '>', 0.)]]
+        index = filter_index(self.df, steps)
+        self.assertTrue(np.array_equal(index, [0]))
+
+    def test_combined_rules(self):
+        # The rules of a step are combined, whatever their operators
+        steps = [[('repul', '>', -1.), ('afmcc', '>=', 0.)]]
+        index = filter_index(self.df, steps)
+        self.assertTrue(np.array_equal(index, [1, 2]))
+
+    def test_stats(self):
+        # Given statistics are used by the first step only
+        stats = {'repul': [6, 60., 700., 1., 6.]}
+        index = filter_index(self.df, [[('repul', '<', 0.)]], stats)
+        self.assertTrue(np.array_equal(index, np.arange(6)))
+
+    def test_energy_rules(self):
+        # The thresholds can be changed, and the labels of the entries are kept
+        df = pd.DataFrame({c: [1., 2., 3., 4., 5.] for c, op, k in ENERGY_RULES[0] + ENERGY_RULES[1]})
+        rules = [[('repul', '<', 0.)], ENERGY_RULES[1]]
+        filtered = energy_filter(df, rules=rules)
+        self.assertEqual(list(filtered.index), [0, 1])
+        self.assertEqual(len(energy_filter(df)), 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import os
+import numpy as np
+import unittest
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.uml import save_uml_model, load_uml_model, ENERGY_RULES, COHORT_RULES, PCA_COLUMNS
+
+class TestSaveUMLModel(unittest.TestCase):
+
+    def setUp(self):
+        self.path = '.data_test'
+        if (not os.path.exists(self.path)):
+            os.mkdir(self.path)
+        n = len(PCA_COLUMNS)
+        self.model = {
+            'scaler_mean': np.arange(n), 'scaler_scale': np.ones(n), 'pca_mean': np.zeros(n),
+            'components': np.eye(3, n), 'variance': [0.5, 0.3, 0.1], 'centers': np.ones((2, 3)), 'cluster': 1,
+            'energy_rules': ENERGY_RULES, 'energy_thresholds': [np.arange(5), [1., 2.]],
+            'cohort_rules': COHORT_RULES, 'cohort_thresholds': [[1., 2., 3.], [4., 5., 6.]]}
+
+    def tearDown(self):
+        os.system(f"rm -rf {self.path}")
+
+    def test_save_uml_model(self):
+        filename = f"{self.path}/UML_model.npz"
+        save_uml_model(filename, self.model)
+        model = load_uml_model(filename)
+        self.assertEqual(model['cluster'], 1)
+        self.assertEqual(model['columns'], PCA_COLUMNS)
+        self.assertEqual(model['energy_rules'], ENERGY_RULES)
+        self.assertEqual(model['cohort_rules'], COHORT_RULES)
+        self.assertTrue(np.array_equal(model['components'], np.eye(3, len(PCA_COLUMNS))))
+        self.assertTrue(np.array_equal(model['energy_thresholds'][0], np.arange(5)))
+
+    def test_version(self):
+        # Models saved with another layout are rejected
+        filename = f"{self.path}/UML_model.npz"
+        save_uml_model(filename, self.model)
+        with np.load(filename) as data:
+            arrays = dict(data)
+        arrays['meta'] = str(arrays['meta']).replace('"version": 1', '"version": 0')
+        np.savez(filename, **arrays)
+        with self.assertRaises(ValueError):
+            load_uml_model(filename)
+
+if __name__ == '__main__':
+    unittest.main()
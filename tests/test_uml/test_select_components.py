@@ -0,0 +1,30 @@
+import unittest
+import os
+import numpy as np
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.uml import select_components, find_knee
+
+class TestSelectComponents(unittest.TestCase):
+
+    def test_select_components(self):
+        ratios = np.array([0.4, 0.2, 0.15, 0.1, 0.1, 0.05])
+        self.assertEqual(select_components(ratios, 0.7), 3)
+        self.assertEqual(select_components(ratios, 0.8), 4)
+        self.assertEqual(select_components(ratios, 0.75), 3)
+        self.assertEqual(select_components(ratios, 1.0), 6)
+
+    def test_select_components_invalid(self):
+        with self.assertRaises(ValueError):
+            select_components([0.5, 0.5], 80)
+
+    def test_find_knee(self):
+        x = range(1, 10)
+        wcss = [1000, 400, 150, 120, 100, 90, 80, 72, 65]
+        self.assertEqual(find_knee(x, wcss), 3)
+
+    def test_find_knee_flat(self):
+        self.assertEqual(find_knee(range(1, 5), [1, 1, 1, 1]), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,7 +6,7 @@ import pandas as pd
 from sklearn.cluster import KMeans
 import sys
 sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
-from hornet.uml import uml_analysis
+from hornet.uml import uml_analysis, filter_steps
 
 class TestUMLAnalysis(unittest.TestCase):
 
@@ -49,5 +49,38 @@ class TestUMLAnalysis(unittest.TestCase):
         self.assertEqual(len(df_cluster), len(self.expected_cluster))
         self.assertEqual(len(df_cohort), len(self.expected_cohort))
 
+    @mock.patch('hornet.uml.input', create=True)
+    def test_parquet(self, mocked_input):
+        mocked_input.side_effect = ['8', '3']
+        input_file = f"{self.folder}/Full_Trajectory.parquet"
+        pd.read_csv(self.input_file).to_parquet(input_file)
+
+        # Outputs follow the format of the input file
+        with mock.patch("hornet.uml.plt.show") as show_patch:
+            uml_analysis(input_file)
+
+        df_filtered = pd.read_parquet(f"{self.folder}/Filtered_Data.parquet")
+        df_cluster = pd.read_parquet(f"{self.folder}/Select_Cluster.parquet")
+        df_cohort = pd.read_parquet(f"{self.folder}/Final_Cohort.parquet")
+
+        self.assertEqual(len(df_filtered), len(self.expected_filtered))
+        self.assertEqual(len(df_cluster), len(self.expected_cluster))
+        self.assertEqual(len(df_cohort), len(self.expected_cohort))
+
+    def test_cache(self):
+        # A rerun with another number of clusters reuses the earlier stages,
+        # and only the cohort is filtered again
+        with mock.patch("hornet.uml.plt.show") as show_patch:
+            uml_analysis(self.input_file, n_components=8, n_clusters=3, headless=True, cache=True)
+            expected = pd.read_csv(f"{self.folder}/Final_Cohort.csv")
+            uml_analysis(self.input_file, n_components=8, n_clusters=4, headless=True, cache=True)
+            with mock.patch("hornet.uml.filter_steps", wraps=filter_steps) as filter_patch, \
+                 mock.patch("hornet.uml.elbow_curve") as elbow_patch:
+                uml_analysis(self.input_file, n_components=8, n_clusters=3, headless=True, cache=True)
+                self.assertEqual(filter_patch.call_count, 1)
+                self.assertFalse(elbow_patch.called)
+
+        self.assertTrue(pd.read_csv(f"{self.folder}/Final_Cohort.csv").equals(expected))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
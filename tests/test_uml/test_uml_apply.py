@@ -0,0 +1,57 @@
+import unittest
+from unittest import mock
+import os
+import pandas as pd
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.uml import uml_analysis, uml_apply
+
+class TestUMLApply(unittest.TestCase):
+
+    def setUp(self):
+        import warnings
+        warnings.filterwarnings(action='ignore', category=FutureWarning)
+
+        data_path = os.path.dirname(os.path.realpath(__file__)) + "/../test_data"
+        original_file = f"{data_path}/Full_Trajectory.csv"
+        self.folder = ".data_test"
+        self.input_file = f"{self.folder}/Full_Trajectory.csv"
+
+        if not os.path.exists(self.folder):
+            os.makedirs(self.folder)
+
+        os.system(f"cp {original_file} {self.folder}")
+        with mock.patch("hornet.uml.plt.show") as show_patch:
+            uml_analysis(self.input_file, n_components=8, n_clusters=3, headless=True)
+
+    def tearDown(self):
+        os.system(f"rm -r {self.folder}")
+
+    def test_uml_apply(self):
+        # The fitted trajectory is classified as it was, without refitting
+        extra_file = f"{self.folder}/Extra.csv"
+        os.system(f"cp {self.input_file} {extra_file}")
+        with mock.patch("hornet.uml.KMeans") as kmeans_patch:
+            uml_apply(extra_file, f"{self.folder}/UML_model.npz", max_memory='5M')
+            self.assertFalse(kmeans_patch.called)
+
+        for output in ['Filtered_Data', 'Select_Cluster', 'Final_Cohort']:
+            expected = pd.read_csv(f"{self.folder}/{output}.csv")
+            df = pd.read_csv(f"{self.folder}/Extra_{output}.csv")
+            self.assertEqual(list(df.columns), list(expected.columns))
+            self.assertTrue(df[['kapa', 'frame']].equals(expected[['kapa', 'frame']]))
+
+    def test_uml_apply_subset(self):
+        # Entries of a new trajectory are classified independently of each other
+        df = pd.read_csv(self.input_file)
+        df.iloc[::2].to_parquet(f"{self.folder}/Half.parquet")
+        uml_apply(f"{self.folder}/Half.parquet", f"{self.folder}/UML_model.npz")
+
+        cohort = pd.read_csv(f"{self.folder}/Final_Cohort.csv")
+        half = pd.read_parquet(f"{self.folder}/Half_Final_Cohort.parquet")
+        keys = ['kapa', 'frame']
+        expected = cohort.merge(df.iloc[::2][keys], on=keys)
+        self.assertTrue(half[keys].reset_index(drop=True).equals(expected[keys]))
+
+if __name__ == '__main__':
+    unittest.main()
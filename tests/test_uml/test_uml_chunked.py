@@ -0,0 +1,55 @@
+import unittest
+from unittest import mock
+import os
+import pandas as pd
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.uml import uml_chunked, uml_analysis
+
+class TestUMLChunked(unittest.TestCase):
+
+    def setUp(self):
+        import warnings
+        warnings.filterwarnings(action='ignore', category=FutureWarning)
+
+        data_path = os.path.dirname(os.path.realpath(__file__)) + "/../test_data"
+        original_file = f"{data_path}/Full_Trajectory.csv"
+        self.folder = ".data_test"
+        self.input_file = f"{self.folder}/Full_Trajectory.csv"
+        self.expected_filtered = pd.read_csv(f"{data_path}/Filtered_Data.csv")
+        self.expected_cohort = pd.read_csv(f"{data_path}/Final_Cohort.csv")
+
+        if not os.path.exists(self.folder):
+            os.makedirs(self.folder)
+
+        os.system(f"cp {original_file} {self.folder}")
+
+    def tearDown(self):
+        os.system(f"rm -r {self.folder}")
+
+    def test_uml_chunked(self):
+        with mock.patch("hornet.uml.plt.show") as show_patch:
+            uml_chunked(self.input_file, self.folder, 'csv', 8, 3, headless=True, rows=3000)
+
+        # The filters are exact, and the clusters are close enough to give the same cohort
+        df_filtered = pd.read_csv(f"{self.folder}/Filtered_Data.csv")
+        df_cluster = pd.read_csv(f"{self.folder}/Select_Cluster.csv")
+        df_cohort = pd.read_csv(f"{self.folder}/Final_Cohort.csv")
+        self.assertTrue(df_filtered['index'].equals(self.expected_filtered['index']))
+        self.assertEqual(list(df_cluster.columns), list(df_cohort.columns))
+        self.assertEqual(len(df_cluster['Segment'].unique()), 1)
+        keys = ['kapa', 'frame']
+        self.assertEqual(len(df_cohort.merge(self.expected_cohort[keys], on=keys)), len(self.expected_cohort))
+
+    def test_max_memory(self):
+        # The chunked mode is used with a memory budget, in the input format
+        input_file = f"{self.folder}/Full_Trajectory.parquet"
+        pd.read_csv(self.input_file).to_parquet(input_file)
+        with mock.patch("hornet.uml.plt.show") as show_patch:
+            uml_analysis(input_file, n_components=8, n_clusters=3, headless=True, max_memory='10M')
+
+        self.assertEqual(len(pd.read_parquet(f"{self.folder}/Filtered_Data.parquet")), len(self.expected_filtered))
+        self.assertEqual(len(pd.read_parquet(f"{self.folder}/Final_Cohort.parquet")), len(self.expected_cohort))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+import os
+import pandas as pd
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../src")
+from hornet.uml import uml_sweep, scale_rules, COHORT_RULES
+
+class TestUMLSweep(unittest.TestCase):
+
+    def setUp(self):
+        import warnings
+        warnings.filterwarnings(action='ignore', category=FutureWarning)
+
+        data_path = os.path.dirname(os.path.realpath(__file__)) + "/../test_data"
+        self.folder = ".data_test"
+        self.input_file = f"{self.folder}/Full_Trajectory.csv"
+        self.expected_cluster = pd.read_csv(f"{data_path}/Select_Cluster.csv")
+        self.expected_cohort = pd.read_csv(f"{data_path}/Final_Cohort.csv")
+
+        if not os.path.exists(self.folder):
+            os.makedirs(self.folder)
+
+        os.system(f"cp {data_path}/Full_Trajectory.csv {self.folder}")
+
+    def tearDown(self):
+        os.system(f"rm -r {self.folder}")
+
+    def test_uml_sweep(self):
+        summary, overlaps = uml_sweep(self.input_file, components=[6, 8], clusters=[3, 4], energy_sigmas=[1., 1.5],
+                                      cohort_sigmas=[1., 0.5])
+        self.assertEqual(len(summary), 16)
+        self.assertEqual(overlaps.shape, (16, 16))
+        self.assertTrue(os.path.exists(f"{self.folder}/UML_sweep.csv"))
+        self.assertTrue(os.path.exists(f"{self.folder}/UML_sweep_overlap.csv"))
+
+        # The default settings give the cohort of uml_analysis, and are the reference
+        name = 'energy1.0_cohort1.0_n8_c3'
+        default = summary[summary['point'] == name].iloc[0]
+        self.assertEqual(default['cluster_size'], len(self.expected_cluster))
+        self.assertEqual(default['cohort'], len(self.expected_cohort))
+        self.assertEqual(default['overlap'], 1.)
+        self.assertEqual(overlaps.loc[name, name], 1.)
+
+        # The data are filtered once per energy sigma, and the cohort sigmas
+        # only change the cohort of a clustering
+        self.assertEqual(summary.groupby('energy_sigma')['filtered'].nunique().max(), 1)
+        same = summary.groupby(['energy_sigma', 'components', 'clusters'])
+        self.assertEqual(same['cluster_size'].nunique().max(), 1)
+        self.assertEqual(same['filtered'].nunique().max(), 1)
+        narrow = summary[(summary['point'] == 'energy1.0_cohort0.5_n8_c3')].iloc[0]
+        self.assertEqual(narrow['cluster_size'], default['cluster_size'])
+        self.assertNotEqual(narrow['cohort'], default['cohort'])
+
+    def test_parallel(self):
+        serial, serial_overlaps = uml_sweep(self.input_file, components=[8], clusters=[2, 3], cohort_sigmas=[1., 0.5])
+        parallel, parallel_overlaps = uml_sweep(self.input_file, components=[8], clusters=[2, 3],
+                                                cohort_sigmas=[1., 0.5], workers=2)
+        self.assertTrue(serial[['cluster_size', 'cohort']].equals(parallel[['cluster_size', 'cohort']]))
+        self.assertTrue(serial_overlaps.equals(parallel_overlaps))
+        # The arrays shared with the processes are removed
+        self.assertEqual(sorted(os.listdir(self.folder)),
+                         ['Full_Trajectory.csv', 'UML_sweep.csv', 'UML_sweep_overlap.csv'])
+
+    def test_scale_rules(self):
+        rules = scale_rules(COHORT_RULES, 2.)
+        self.assertEqual(rules[0][0], ('go', '<', 0.))
+        self.assertEqual(rules[1][0], ('etot', '<', -2.))
+
+if __name__ == '__main__':
+    unittest.main()